@@ -1 +1,39 @@
-from .aurora import Aurora
+# Nanoleaf Aurora client
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+#
+# Everything is imported on first use, so "import nanoleaf" costs almost nothing and
+# scripts only pay for the parts they touch (requests, aiohttp and NumPy are all slow to import).
+
+import importlib
+
+# Public name -> module it lives in
+_EXPORTS = {"Aurora": ".aurora",
+            "AsyncAurora": ".async_aurora",
+            "AuroraGroup": ".group",
+            "ExtControlStream": ".stream",
+            "FrameRenderer": ".render",
+            "AuroraError": ".exceptions",
+            "CircuitBreaker": ".policy",
+            "RetryPolicy": ".policy",
+            "PanelLayout": ".layout",
+            "CustomEffect": ".animation",
+            "find_auroras": ".setup",
+            "generate_auth_token": ".setup",
+            "generate_auth_tokens": ".setup"}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+    value = getattr(importlib.import_module(module, __name__), name)
+    # Later lookups find it directly instead of coming back here
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,8 @@
+import sys
+from .cli import main
+
+# Lets "python -m nanoleaf" run the command line tool
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+sys.exit(main())
@@ -0,0 +1,157 @@
+import itertools
+from array import array
+
+# Builder for custom and static effects, serializing their animData
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+# Values per frame in animData: R G B W T
+_FRAME_WIDTH = 5
+
+# Decimal strings of every value used so far; looking them up is several times faster than str()
+_NUMBERS = [str(i) for i in range(256)]
+
+
+def _cover(largest: int):
+    """Extends the string table so it holds every value up to largest"""
+    if largest >= len(_NUMBERS):
+        _NUMBERS.extend(str(i) for i in range(len(_NUMBERS), largest + 1))
+
+
+def _values(values, typecode: str, what: str) -> array:
+    """Packs a sequence (or numpy array) into an array of the given type, rejecting out of range values"""
+    if hasattr(values, "ravel"):
+        values = values.ravel().tolist()
+    try:
+        return array(typecode, values)
+    except OverflowError:
+        limit = 255 if typecode == "B" else 65535
+        raise ValueError(what + " must be between 0 and " + str(limit)) from None
+    except TypeError:
+        raise ValueError(what + " must be whole numbers") from None
+
+
+class CustomEffect(object):
+    def __init__(self, name: str, panel_ids=None, loop: bool = True, static: bool = False):
+        """Builds a custom (animated) or static effect from per-panel keyframes.
+
+        name - Name of the effect on the device
+        panel_ids - If set, only these panels may be given frames, e.g. the ids from aurora.panel_positions
+        loop - Whether the animation repeats
+        static - Builds a static effect, where every panel holds a single color
+
+        Upload it with aurora.effect_set_raw(effect.to_dict())."""
+        self.name = name
+        self.loop = loop and not static
+        self.static = static
+        self.panel_ids = None if panel_ids is None else frozenset(panel_ids)
+        self._frames = {}
+
+    def __repr__(self):
+        return "<CustomEffect(" + self.name + ", " + str(len(self._frames)) + " panels)>"
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __check_panel(self, panel_id: int):
+        if self.panel_ids is not None and panel_id not in self.panel_ids:
+            raise ValueError("Panel " + str(panel_id) + " is not part of the layout")
+
+    ###########################################
+    # Frame methods
+    ###########################################
+
+    def set_frames(self, panel_id: int, colors, transitions=10):
+        """Replaces every frame of one panel.
+
+        colors - A sequence or iterator of (R, G, B) values (0-255), or an (n, 3) numpy array
+        transitions - Time to fade into each frame in tenths of a second (0-65535),
+                      either one value for every frame or one per frame"""
+        self.__check_panel(panel_id)
+        if not hasattr(colors, "ravel"):
+            colors = itertools.chain.from_iterable(colors)
+        rgb = array("H", _values(colors, "B", "Colors"))
+        if len(rgb) % 3:
+            raise ValueError("Colors must have three values (R, G, B) per frame")
+        count = len(rgb) // 3
+        if isinstance(transitions, int):
+            times = _values([transitions], "H", "Transitions") * count
+        else:
+            times = _values(transitions, "H", "Transitions")
+            if len(times) != count:
+                raise ValueError("Need one transition per frame: got " + str(len(times))
+                                 + " for " + str(count) + " frames")
+        if self.static and count != 1:
+            raise ValueError("Static effects have exactly one frame per panel")
+        _cover(max(times, default=0))
+
+        # Interleave into R G B W T with strided copies instead of a per-frame loop
+        frames = array("H", [0]) * (count * _FRAME_WIDTH)
+        frames[0::_FRAME_WIDTH] = rgb[0::3]
+        frames[1::_FRAME_WIDTH] = rgb[1::3]
+        frames[2::_FRAME_WIDTH] = rgb[2::3]
+        frames[4::_FRAME_WIDTH] = times
+        self._frames[panel_id] = frames
+
+    def add_frame(self, panel_id: int, rgb, transition: int = 10):
+        """Appends one frame to a panel.
+
+        rgb - (R, G, B) values (0-255)
+        transition - Time to fade into the frame in tenths of a second"""
+        self.__check_panel(panel_id)
+        color = _values(rgb, "B", "Colors")
+        if len(color) != 3:
+            raise ValueError("Colors must have three values (R, G, B) per frame")
+        frame = array("H", color)
+        frame.extend((0,))
+        frame.extend(_values([transition], "H", "Transitions"))
+        _cover(frame[-1])
+        frames = self._frames.setdefault(panel_id, array("H"))
+        if self.static and frames:
+            raise ValueError("Static effects have exactly one frame per panel")
+        frames.extend(frame)
+
+    def set_all(self, panel_ids, colors, transitions=10):
+        """Gives every listed panel the same frames. Takes the same colors and transitions as set_frames."""
+        panel_ids = list(panel_ids)
+        if not panel_ids:
+            return
+        self.set_frames(panel_ids[0], colors, transitions)
+        for panel_id in panel_ids[1:]:
+            self.__check_panel(panel_id)
+            self._frames[panel_id] = array("H", self._frames[panel_ids[0]])
+
+    def remove(self, panel_id: int):
+        """Drops every frame of one panel"""
+        self._frames.pop(panel_id, None)
+
+    ###########################################
+    # Serialization methods
+    ###########################################
+
+    def iter_anim_data(self):
+        """Yields the animData string in pieces, one per panel, so large effects can be written out as they're built"""
+        yield str(len(self._frames))
+        for panel_id, frames in self._frames.items():
+            yield " " + str(panel_id) + " " + str(len(frames) // _FRAME_WIDTH) + " "
+            yield " ".join(map(_NUMBERS.__getitem__, frames))
+
+    def anim_data(self) -> str:
+        """Returns the animData string: numPanels, then panelId numFrames R G B W T ... for each panel"""
+        return "".join(self.iter_anim_data())
+
+    def write_anim_data(self, f):
+        """Writes the animData string to a text file object"""
+        for piece in self.iter_anim_data():
+            f.write(piece)
+
+    def to_dict(self, command: str = "add") -> dict:
+        """Returns the effect as a write command for aurora.effect_set_raw().
+
+        command - "add" stores the effect on the device, "display" only shows it"""
+        return {"command": command,
+                "animName": self.name,
+                "animType": "static" if self.static else "custom",
+                "animData": self.anim_data(),
+                "loop": self.loop,
+                "palette": []}
@@ -0,0 +1,488 @@
+import asyncio
+import random
+from .aurora import _check_for_errors, _hsb_to_rgb, _rgb_to_state
+from .effects import EffectLibrary
+from .layout import PanelLayout
+from .policy import CircuitBreaker, RetryPolicy, DEFAULT_TIMEOUT, send_request_async
+from .state import CACHED_PREFIXES, StateCache, build_state
+from .transport import Response, TransportError
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Asyncio interface for an Aurora light
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+
+class AsyncAurora(object):
+    """Awaitable version of Aurora for driving many devices from one event loop.
+
+    Every Aurora property is available as a coroutine method of the same name (e.g. await aurora.brightness()),
+    and every property setter as a set_ method (e.g. await aurora.set_brightness(50)).
+    Requires the aiohttp package (pip install nanoleaf[async])."""
+
+    def __init__(self, ip_address: str, auth_token: str, timeout=DEFAULT_TIMEOUT, pool_size: int = 1,
+                 cache_ttl: float = 0, retry: RetryPolicy = None, circuit_breaker: CircuitBreaker = None,
+                 effect_library: EffectLibrary = None, port: int = 16021):
+        """Prepares a connection to the Aurora at the given IP address using the given auth token.
+
+        Failed requests raise an exceptions.AuroraError subclass.
+        timeout - Seconds to wait for the device, either a single value or a (connect, read) tuple
+        pool_size - Number of keep-alive connections held open to the device
+        cache_ttl - Seconds that state, layout and effect reads are served from one cached info request
+        retry - RetryPolicy for GETs and state changes that failed; defaults to RetryPolicy()
+        circuit_breaker - CircuitBreaker that fails fast while the device is down; defaults to CircuitBreaker()
+        effect_library - If set, effect definitions are cached in this EffectLibrary instead of re-downloaded
+        port - Port of the device's API"""
+        if aiohttp is None:
+            raise ImportError("AsyncAurora requires aiohttp. Install it with: pip install nanoleaf[async]")
+        self.baseUrl = "http://" + ip_address + ":" + str(port) + "/api/v1/" + auth_token + "/"
+        self.ip_address = ip_address
+        self.auth_token = auth_token
+        self.port = port
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retry = RetryPolicy() if retry is None else retry
+        self.circuit_breaker = CircuitBreaker() if circuit_breaker is None else circuit_breaker
+        self.effect_library = effect_library
+        self._session = None
+        self._state = StateCache(cache_ttl)
+        self._layout = None
+        self._refresh_lock = asyncio.Lock()
+
+    def __repr__(self):
+        return "<AsyncAurora(" + self.ip_address + ")>"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Closes the connections held open to the device"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def __client_timeout(self):
+        if isinstance(self.timeout, tuple):
+            return aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+        return aiohttp.ClientTimeout(total=self.timeout)
+
+    def __get_session(self):
+        # The session has to be created inside the running event loop, so it is made on first use
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.__client_timeout())
+        return self._session
+
+    async def __request(self, method: str, endpoint: str = "", data: dict = None):
+        r = await send_request_async(lambda: self.__send(method, endpoint, data), self.retry,
+                                     self.circuit_breaker, self.ip_address, method, endpoint, data)
+        if method == "PUT" and 200 <= r.status_code < 300:
+            self._state.apply(endpoint, data)
+        return _check_for_errors(self.ip_address, r.status_code, r.text)
+
+    async def __send(self, method: str, endpoint: str, data: dict) -> Response:
+        try:
+            async with self.__get_session().request(method, self.baseUrl + endpoint, json=data) as r:
+                return Response(r.status, await r.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TransportError(repr(e) + " (" + self.ip_address + ")") from e
+
+    async def __put(self, endpoint, data: dict):
+        return await self.__request("PUT", endpoint, data)
+
+    async def __get(self, endpoint: str = ""):
+        # Only endpoints covered by the info snapshot are worth a refresh; the rest go straight to the device
+        if self._state.ttl > 0 and endpoint.startswith(CACHED_PREFIXES):
+            if not self._state.fresh:
+                # Concurrent reads wait for a single refresh instead of each starting their own
+                async with self._refresh_lock:
+                    if not self._state.fresh:
+                        await self.refresh()
+            found, value = self._state.lookup(endpoint)
+            if found:
+                return value
+        return await self.__request("GET", endpoint)
+
+    async def __delete(self, endpoint: str = ""):
+        return await self.__request("DELETE", endpoint)
+
+    ###########################################
+    # General functionality methods
+    ###########################################
+
+    async def info(self):
+        """Returns the full Aurora Info request.
+
+        Useful for debugging since it's just a fat dump."""
+        return await self.refresh()
+
+    async def refresh(self) -> dict:
+        """Fetches the full device state in one request and caches it for cache_ttl seconds.
+
+        Returns the full Aurora Info request."""
+        info = await self.__request("GET")
+        self._state.store(info)
+        return info
+
+    def invalidate(self):
+        """Drops the cached device state so the next read goes to the device"""
+        self._state.invalidate()
+
+    async def color_mode(self):
+        """Returns the current color mode."""
+        return await self.__get("state/colorMode")
+
+    async def identify(self):
+        """Briefly flash the panels on and off"""
+        await self.__put("identify", {})
+
+    async def firmware(self):
+        """Returns the firmware version of the device"""
+        return await self.__get("firmwareVersion")
+
+    async def model(self):
+        """Returns the model number of the device. (Always returns 'NL22')"""
+        return await self.__get("model")
+
+    async def serial_number(self):
+        """Returns the serial number of the device"""
+        return await self.__get("serialNo")
+
+    async def delete_user(self):
+        """CAUTION: Revokes your auth token from the device."""
+        await self.__delete()
+
+    ###########################################
+    # Batched state methods
+    ###########################################
+
+    async def set_state(self, on: bool = None, brightness=None, hue=None, saturation=None, color_temperature=None,
+                        brightness_increment=None, hue_increment=None, saturation_increment=None,
+                        color_temperature_increment=None, duration=None):
+        """Changes any combination of state attributes with a single request.
+
+        Each attribute takes either a value or an increment (negative lowers it).
+        duration - Seconds to fade the brightness over"""
+        data = build_state(on, brightness, hue, saturation, color_temperature,
+                           brightness_increment, hue_increment, saturation_increment,
+                           color_temperature_increment, duration)
+        if data:
+            await self.__put("state", data)
+
+    ###########################################
+    # On / Off methods
+    ###########################################
+
+    async def on(self):
+        """Returns True if the device is on, False if it's off"""
+        return await self.__get("state/on/value")
+
+    async def set_on(self, value: bool):
+        """Turns the device on/off. True = on, False = off"""
+        data = {"on": value}
+        await self.__put("state", data)
+
+    async def off(self):
+        """Returns True if the device is off, False if it's on"""
+        return not await self.on()
+
+    async def set_off(self, value: bool):
+        """Turns the device on/off. True = off, False = on"""
+        await self.set_on(not value)
+
+    async def on_toggle(self):
+        """Switches the on/off state of the device"""
+        await self.set_on(not await self.on())
+
+    ###########################################
+    # Brightness methods
+    ###########################################
+
+    async def brightness(self):
+        """Returns the brightness of the device (0-100)"""
+        return await self.__get("state/brightness/value")
+
+    async def set_brightness(self, level):
+        """Sets the brightness to the given level (0-100)"""
+        data = {"brightness": {"value": level}}
+        await self.__put("state", data)
+
+    async def brightness_min(self):
+        """Returns the minimum brightness possible. (This always returns 0)"""
+        return await self.__get("state/brightness/min")
+
+    async def brightness_max(self):
+        """Returns the maximum brightness possible. (This always returns 100)"""
+        return await self.__get("state/brightness/max")
+
+    async def brightness_raise(self, level):
+        """Raise the brightness of the device by a relative amount (negative lowers brightness)"""
+        data = {"brightness": {"increment": level}}
+        await self.__put("state", data)
+
+    async def brightness_lower(self, level):
+        """Lower the brightness of the device by a relative amount (negative raises brightness)"""
+        await self.brightness_raise(-level)
+
+    ###########################################
+    # Hue methods
+    ###########################################
+
+    async def hue(self):
+        """Returns the hue of the device (0-360)"""
+        return await self.__get("state/hue/value")
+
+    async def set_hue(self, level):
+        """Sets the hue to the given level (0-360)"""
+        data = {"hue": {"value": level}}
+        await self.__put("state", data)
+
+    async def hue_min(self):
+        """Returns the minimum hue possible. (This always returns 0)"""
+        return await self.__get("state/hue/min")
+
+    async def hue_max(self):
+        """Returns the maximum hue possible. (This always returns 360)"""
+        return await self.__get("state/hue/max")
+
+    async def hue_raise(self, level):
+        """Raise the hue of the device by a relative amount (negative lowers hue)"""
+        data = {"hue": {"increment": level}}
+        await self.__put("state", data)
+
+    async def hue_lower(self, level):
+        """Lower the hue of the device by a relative amount (negative raises hue)"""
+        await self.hue_raise(-level)
+
+    ###########################################
+    # Saturation methods
+    ###########################################
+
+    async def saturation(self):
+        """Returns the saturation of the device (0-100)"""
+        return await self.__get("state/sat/value")
+
+    async def set_saturation(self, level):
+        """Sets the saturation to the given level (0-100)"""
+        data = {"sat": {"value": level}}
+        await self.__put("state", data)
+
+    async def saturation_min(self):
+        """Returns the minimum saturation possible. (This always returns 0)"""
+        return await self.__get("state/sat/min")
+
+    async def saturation_max(self):
+        """Returns the maximum saturation possible. (This always returns 100)"""
+        return await self.__get("state/sat/max")
+
+    async def saturation_raise(self, level):
+        """Raise the saturation of the device by a relative amount (negative lowers saturation)"""
+        data = {"sat": {"increment": level}}
+        await self.__put("state", data)
+
+    async def saturation_lower(self, level):
+        """Lower the saturation of the device by a relative amount (negative raises saturation)"""
+        await self.saturation_raise(-level)
+
+    ###########################################
+    # Color Temperature methods
+    ###########################################
+
+    async def color_temperature(self):
+        """Returns the color temperature of the device (0-100)"""
+        return await self.__get("state/ct/value")
+
+    async def set_color_temperature(self, level):
+        """Sets the color temperature to the given level (0-100)"""
+        data = {"ct": {"value": level}}
+        await self.__put("state", data)
+
+    async def color_temperature_min(self):
+        """Returns the minimum color temperature possible. (This always returns 1200)"""
+        # BUG: Firmware 1.5.0 returns the wrong value.
+        return 1200
+
+    async def color_temperature_max(self):
+        """Returns the maximum color temperature possible. (This always returns 6500)"""
+        # BUG: Firmware 1.5.0 returns the wrong value.
+        return 6500
+
+    async def color_temperature_raise(self, level):
+        """Raise the color temperature of the device by a relative amount (negative lowers color temperature)"""
+        data = {"ct": {"increment": level}}
+        await self.__put("state", data)
+
+    async def color_temperature_lower(self, level):
+        """Lower the color temperature of the device by a relative amount (negative raises color temperature)"""
+        await self.color_temperature_raise(-level)
+
+    ###########################################
+    # Color RGB/HSB methods
+    ###########################################
+
+    async def rgb(self):
+        """The color of the device, as represented by 0-255 RGB values"""
+        hue, saturation, brightness = await asyncio.gather(self.hue(), self.saturation(), self.brightness())
+        return _hsb_to_rgb(hue, saturation, brightness)
+
+    async def set_rgb(self, color):
+        """Set the color of the device, as represented by either a hex string or a list of 0-255 RGB values"""
+        data = _rgb_to_state(color)
+        if data is None:
+            return
+        await self.__put("state", data)
+
+    ###########################################
+    # Layout methods
+    ###########################################
+
+    async def orientation(self):
+        """Returns the orientation of the device (0-360)"""
+        return await self.__get("panelLayout/globalOrientation/value")
+
+    async def orientation_min(self):
+        """Returns the minimum orientation possible. (This always returns 0)"""
+        return await self.__get("panelLayout/globalOrientation/min")
+
+    async def orientation_max(self):
+        """Returns the maximum orientation possible. (This always returns 360)"""
+        return await self.__get("panelLayout/globalOrientation/max")
+
+    async def panel_count(self):
+        """Returns the number of panels connected to the device"""
+        return await self.__get("panelLayout/layout/numPanels")
+
+    async def panel_length(self):
+        """Returns the length of a single panel. (This always returns 150)"""
+        return await self.__get("panelLayout/layout/sideLength")
+
+    async def panel_positions(self):
+        """Returns a list of all panels with their attributes represented in a dict.
+
+        panelId - Unique identifier for this panel
+        x - X-coordinate
+        y - Y-coordinate
+        o - Rotational orientation
+        """
+        return await self.__get("panelLayout/layout/positionData")
+
+    async def layout(self) -> PanelLayout:
+        """Returns the panel layout as a PanelLayout, for neighbor and spatial queries.
+
+        The PanelLayout is only rebuilt when the layout or orientation has changed."""
+        panel_layout = await self.__get("panelLayout")
+        if panel_layout is None:
+            return None
+        layout = panel_layout.get("layout") or {}
+        orientation = (panel_layout.get("globalOrientation") or {}).get("value", 0)
+        if self._layout is None or not self._layout.matches(layout, orientation):
+            self._layout = PanelLayout(layout, orientation)
+        return self._layout
+
+    ###########################################
+    # Effect methods
+    ###########################################
+
+    _reserved_effect_names = ["*Static*", "*Dynamic*", "*Solid*"]
+
+    async def effect(self):
+        """Returns the active effect"""
+        return await self.__get("effects/select")
+
+    async def set_effect(self, effect_name: str):
+        """Sets the active effect to the name specified"""
+        data = {"select": effect_name}
+        await self.__put("effects", data)
+
+    async def effects_list(self):
+        """Returns a list of all effects stored on the device"""
+        names = await self.__get("effects/effectsList")
+        if self.effect_library is not None and names is not None:
+            self.effect_library.sync(names)
+        return names
+
+    async def effect_random(self) -> str:
+        """Sets the active effect to a new random effect stored on the device.
+
+        Returns the name of the new effect."""
+        effects = await self.__get("effects")
+        effect_list = effects["effectsList"]
+        active_effect = effects["select"]
+        if active_effect not in self._reserved_effect_names and active_effect in effect_list:
+            effect_list.remove(active_effect)
+        new_effect = random.choice(effect_list)
+        await self.set_effect(new_effect)
+        return new_effect
+
+    async def effect_set_raw(self, effect_data: dict):
+        """Sends a raw dict containing effect data to the device.
+
+        The dict given must match the json structure specified in the API docs.
+        Adding an effect that the effect library already holds unchanged only selects it.
+        Returns the device's response, if it sent one."""
+        if (self.effect_library is not None and effect_data.get("command") == "add"
+                and self.effect_library.holds(effect_data)):
+            # Adding an effect also displays it, which a select does without re-sending the definition
+            await self.__put("effects", {"select": effect_data["animName"]})
+            return None
+        data = {"write": effect_data}
+        response = await self.__put("effects", data)
+        if self.effect_library is not None:
+            self.effect_library.record_write(effect_data)
+        return response
+
+    async def effect_details(self, name: str) -> dict:
+        """Returns the dict containing details for the effect specified"""
+        if self.effect_library is not None:
+            details = self.effect_library.get(name)
+            if details is not None:
+                return details
+        data = {"write": {"command": "request",
+                          "animName": name}}
+        details = await self.__put("effects", data)
+        if self.effect_library is not None and details is not None:
+            self.effect_library.store(details)
+        return details
+
+    async def effect_details_all(self) -> dict:
+        """Returns a dict containing details for all effects on the device.
+
+        With an effect library, only effects that aren't cached yet, or were cached too long ago, are downloaded."""
+        data = {"write": {"command": "requestAll"}}
+        if self.effect_library is None:
+            return await self.__put("effects", data)
+        names = await self.__get("effects/effectsList")
+        with self.effect_library.batch():
+            missing = self.effect_library.sync(names)
+            if len(missing) * 2 > len(names):
+                # Fetching most of the effects one by one costs more than one full download
+                details = await self.__put("effects", data)
+                self.effect_library.store_all(details["animations"])
+                return details
+            # Cached effects come straight from the library; only the missing ones are requested
+            animations = [await self.effect_details(name) for name in names]
+        return {"animations": [details for details in animations if details is not None]}
+
+    async def effect_delete(self, name: str):
+        """Removed the specified effect from the device"""
+        data = {"write": {"command": "delete",
+                          "animName": name}}
+        await self.__put("effects", data)
+        if self.effect_library is not None:
+            self.effect_library.remove(name)
+
+    async def effect_rename(self, old_name: str, new_name: str):
+        """Renames the specified effect saved on the device to a new name"""
+        data = {"write": {"command": "rename",
+                          "animName": old_name,
+                          "newName": new_name}}
+        await self.__put("effects", data)
+        if self.effect_library is not None:
+            self.effect_library.rename(old_name, new_name)
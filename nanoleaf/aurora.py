@@ -1,70 +1,245 @@
-import requests
 import random
-import colorsys
-import re
+import json
+import contextlib
+import time
+from . import color
+from .effects import EffectLibrary
+from .exceptions import AuroraError, STATUS_ERRORS
+from .layout import PanelLayout
+from .metrics import RequestInfo
+from .policy import CircuitBreaker, RetryPolicy, DEFAULT_TIMEOUT, send_request
+from .state import CACHED_PREFIXES, StateCache, build_state, merge_state
+from .scheduler import StateScheduler, DEFAULT_RATE
+from .transport import TransportError, TRANSPORTS
 
 # Primary interface for an Aurora light
 # For instructions or bug reports, please visit
 # https://github.com/software-2/nanoleaf
 
+# Message for each error status the device is known to send
+_STATUS_MESSAGES = {400: "Bad request!",
+                    401: "Not authorized! This is an invalid token for this Aurora",
+                    403: "Forbidden!",
+                    404: "Resource not found!",
+                    422: "Unprocessible Entity",
+                    500: "Internal Server Error"}
+
+
+def _check_for_errors(ip_address: str, status_code: int, text: str):
+    """Returns the decoded body of a response from the device, or raises the matching AuroraError"""
+    if status_code == 200:
+        if text == "":  # BUG: Delete User returns 200, not 204 like it should, as of firmware 1.5.0
+            return None
+        return json.loads(text)
+    elif status_code == 204:
+        return None
+    elif status_code in STATUS_ERRORS:
+        raise STATUS_ERRORS[status_code]("Error " + str(status_code) + ": " + _STATUS_MESSAGES[status_code]
+                                          + " (" + ip_address + ")", ip_address, status_code)
+    raise AuroraError("ERROR! UNKNOWN ERROR " + str(status_code)
+                      + ". Please post an issue on the GitHub page: https://github.com/software-2/nanoleaf/issues",
+                      ip_address, status_code)
+
+
+def _hsb_to_rgb(hue, saturation, brightness):
+    """Converts device hue (0-360), saturation and brightness (0-100) to a list of 0-255 RGB values"""
+    if hue is None or saturation is None or brightness is None:
+        return None
+    return list(color.hsb_to_rgb([hue], [saturation], [brightness])[0])
+
+
+def _rgb_to_state(rgb):
+    """Validates a hex string or a list of 0-255 RGB values and converts it to a state payload.
+
+    Returns None after reporting the error if the color is invalid."""
+    try:
+        red, green, blue = rgb
+    except ValueError:
+        try:
+            (red, green, blue), = color.hex_to_rgb([rgb])
+        except ValueError:
+            if isinstance(rgb, str):
+                print("Error: Color must be in valid hex format.")
+            else:
+                print("Error: Color must have one hex value or three 0-255 values.")
+            return None
+    if not 0 <= red <= 255:
+        print("Error: Red value out of range! (0-255)")
+        return None
+    if not 0 <= green <= 255:
+        print("Error: Green value out of range! (0-255)")
+        return None
+    if not 0 <= blue <= 255:
+        print("Error: Blue value out of range! (0-255)")
+        return None
+
+    (hue,), (saturation,), (brightness,) = color.rgb_to_hsb([(red, green, blue)])
+    return {"hue": {"value": hue}, "sat": {"value": saturation}, "brightness": {"value": brightness}}
+
 
 class Aurora(object):
-    def __init__(self, ip_address: str, auth_token: str):
-        self.baseUrl = "http://" + ip_address + ":16021/api/v1/" + auth_token + "/"
+    def __init__(self, ip_address: str, auth_token: str, timeout=DEFAULT_TIMEOUT, pool_size: int = 1,
+                 cache_ttl: float = 0, max_rate: float = None, retry: RetryPolicy = None,
+                 circuit_breaker: CircuitBreaker = None, effect_library: EffectLibrary = None, port: int = 16021,
+                 transport="http"):
+        """Connects to the Aurora at the given IP address using the given auth token.
+
+        Failed requests raise an exceptions.AuroraError subclass.
+        timeout - Seconds to wait for the device, either a single value or a (connect, read) tuple
+        pool_size - Number of keep-alive connections held open to the device
+        cache_ttl - Seconds that state, layout and effect reads are served from one cached info request
+        max_rate - If set, state changes are coalesced and sent at most this many times per second
+        retry - RetryPolicy for GETs and state changes that failed; defaults to RetryPolicy()
+        circuit_breaker - CircuitBreaker that fails fast while the device is down; defaults to CircuitBreaker()
+        effect_library - If set, effect definitions are cached in this EffectLibrary instead of re-downloaded
+        port - Port of the device's API
+        transport - "http" (the standard library, the default), "requests", or an object with the same
+                    request() and close() methods as transport.HTTPTransport"""
+        self.baseUrl = "http://" + ip_address + ":" + str(port) + "/api/v1/" + auth_token + "/"
         self.ip_address = ip_address
         self.auth_token = auth_token
+        self.port = port
+        self.timeout = timeout
+        self._path = "/api/v1/" + auth_token + "/"
+        if isinstance(transport, str):
+            transport = TRANSPORTS[transport](ip_address, port, pool_size)
+        self._transport = transport
+        self._state = StateCache(cache_ttl)
+        self._batch = None
+        self._layout = None
+        self._before_hooks = ()
+        self._after_hooks = ()
+        self.retry = RetryPolicy() if retry is None else retry
+        self.circuit_breaker = CircuitBreaker() if circuit_breaker is None else circuit_breaker
+        self.effect_library = effect_library
+        self._scheduler = None
+        self._ramps = None
+        if max_rate is not None:
+            self._scheduler = StateScheduler(self.__send_state, max_rate)
 
     def __repr__(self):
         return "<Aurora(" + self.ip_address + ")>"
 
-    def __put(self, endpoint, data: dict) -> requests.request:
-        url = self.baseUrl + endpoint
-        try:
-            r = requests.put(url, json=data)
-        except requests.exceptions.RequestException as e:
-            print(e)
-            return
-        return self.__check_for_errors(r)
+    def __enter__(self):
+        return self
 
-    def __get(self, endpoint: str = "") -> requests.request:
-        url = self.baseUrl + endpoint
-        try:
-            r = requests.get(url)
-        except requests.exceptions.RequestException as e:
-            print(e)
-            return
-        return self.__check_for_errors(r)
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-    def __delete(self, endpoint: str = "") -> requests.request:
-        url = self.baseUrl + endpoint
+    def close(self):
+        """Sends any coalesced state changes and closes the connections held open to the device.
+
+        Raises the error of a coalesced write that failed in the background, after everything is closed."""
+        scheduler, self._scheduler = self._scheduler, None
+        ramps, self._ramps = self._ramps, None
         try:
-            r = requests.delete(url)
-        except requests.exceptions.RequestException as e:
-            print(e)
-            return
+            if scheduler is not None:
+                scheduler.close()
+        finally:
+            try:
+                if ramps is not None:
+                    ramps.close()
+            finally:
+                self._transport.close()
+
+    def flush(self):
+        """Sends any coalesced state changes right away.
+
+        Raises the error of a coalesced write or fade step that failed in the background since the last flush."""
+        for scheduler in (self._scheduler, self._ramps):
+            if scheduler is not None:
+                scheduler.flush()
+                scheduler.raise_error()
+
+    def add_request_hook(self, before=None, after=None):
+        """Registers functions to call around every request sent to the device.
+
+        before - Called as before(aurora, method, endpoint, data) just before sending
+        after - Called as after(info) with a metrics.RequestInfo once the request finishes or fails
+        Without any hooks, requests aren't timed or measured at all."""
+        if before is not None:
+            self._before_hooks += (before,)
+        if after is not None:
+            self._after_hooks += (after,)
+
+    def remove_request_hook(self, hook):
+        """Unregisters a function added with add_request_hook"""
+        self._before_hooks = tuple(h for h in self._before_hooks if h is not hook)
+        self._after_hooks = tuple(h for h in self._after_hooks if h is not hook)
+
+    def __after_request(self, method: str, endpoint: str, r, start: float, error=None):
+        duration = time.perf_counter() - start
+        if r is None:
+            info = RequestInfo(self.ip_address, method, endpoint, None, 0, 0, duration, error)
+        else:
+            info = RequestInfo(self.ip_address, method, endpoint, r.status_code,
+                               r.bytes_sent, len(r.content), duration, None)
+        for hook in self._after_hooks:
+            hook(info)
+
+    def __request(self, method: str, endpoint: str = "", data: dict = None):
+        r = send_request(lambda: self.__send(method, endpoint, data), self.retry, self.circuit_breaker,
+                         self.ip_address, method, endpoint, data)
+        if method == "PUT" and 200 <= r.status_code < 300:
+            self._state.apply(endpoint, data)
         return self.__check_for_errors(r)
 
-    def __check_for_errors(self, r: requests.request) -> requests.request:
-        if r.status_code == 200:
-            if r.text == "":  # BUG: Delete User returns 200, not 204 like it should, as of firmware 1.5.0
-                return None
-            return r.json()
-        elif r.status_code == 204:
+    def __send(self, method: str, endpoint: str, data: dict):
+        path = self._path + endpoint
+        if not (self._before_hooks or self._after_hooks):
+            return self._transport.request(method, path, data, self.timeout)
+        for hook in self._before_hooks:
+            hook(self, method, endpoint, data)
+        start = time.perf_counter()
+        try:
+            r = self._transport.request(method, path, data, self.timeout)
+        except TransportError as e:
+            self.__after_request(method, endpoint, None, start, e)
+            raise
+        self.__after_request(method, endpoint, r, start)
+        return r
+
+    def __put(self, endpoint, data: dict):
+        if endpoint == "state" and self._batch is not None:
+            merge_state(self._batch, data)
             return None
-        elif r.status_code == 403:
-            print("Error 400: Bad request! (" + self.ip_address + ")")
-        elif r.status_code == 401:
-            print("Error 401: Not authorized! This is an invalid token for this Aurora (" + self.ip_address + ")")
-        elif r.status_code == 404:
-            print("Error 404: Resource not found! (" + self.ip_address + ")")
-        elif r.status_code == 422:
-            print("Error 422: Unprocessible Entity (" + self.ip_address + ")")
-        elif r.status_code == 500:
-            print("Error 500: Internal Server Error (" + self.ip_address + ")")
-        else:
-            print("ERROR! UNKNOWN ERROR " + str(r.status_code)
-                  + ". Please post an issue on the GitHub page: https://github.com/software-2/nanoleaf/issues")
-        return None
+        if endpoint == "state" and self._scheduler is not None:
+            self._scheduler.submit(data)
+            return None
+        if endpoint == "state" and self._ramps is not None:
+            # A value set directly replaces a fade that is still running on the same attribute
+            self._ramps.cancel(data)
+        return self.__request("PUT", endpoint, data)
+
+    def __send_state(self, data: dict):
+        self.__request("PUT", "state", data)
+
+    def __ramp(self, attribute: str, start, target, duration: float):
+        if start is None:
+            return
+        if self._scheduler is not None:
+            self._scheduler.ramp(attribute, start, target, duration)
+            return
+        # Fade steps get their own scheduler, so every other write still goes straight to the device
+        if self._ramps is None:
+            self._ramps = StateScheduler(self.__send_state, DEFAULT_RATE)
+        self._ramps.ramp(attribute, start, target, duration)
+
+    def __get(self, endpoint: str = ""):
+        # Only endpoints covered by the info snapshot are worth a refresh; the rest go straight to the device
+        if self._state.ttl > 0 and endpoint.startswith(CACHED_PREFIXES):
+            if not self._state.fresh:
+                self.refresh()
+            found, value = self._state.lookup(endpoint)
+            if found:
+                return value
+        return self.__request("GET", endpoint)
+
+    def __delete(self, endpoint: str = ""):
+        return self.__request("DELETE", endpoint)
+
+    def __check_for_errors(self, r):
+        return _check_for_errors(self.ip_address, r.status_code, r.text)
 
     ###########################################
     # General functionality methods
@@ -75,7 +250,19 @@ class Aurora(object):
         """Returns the full Aurora Info request. 
         
         Useful for debugging since it's just a fat dump."""
-        return self.__get()
+        return self.refresh()
+
+    def refresh(self) -> dict:
+        """Fetches the full device state in one request and caches it for cache_ttl seconds.
+
+        Returns the full Aurora Info request."""
+        info = self.__request("GET")
+        self._state.store(info)
+        return info
+
+    def invalidate(self):
+        """Drops the cached device state so the next read goes to the device"""
+        self._state.invalidate()
 
     @property
     def color_mode(self):
@@ -105,6 +292,45 @@ class Aurora(object):
         """CAUTION: Revokes your auth token from the device."""
         self.__delete()
 
+    ###########################################
+    # Batched state methods
+    ###########################################
+
+    def set_state(self, on: bool = None, brightness=None, hue=None, saturation=None, color_temperature=None,
+                  brightness_increment=None, hue_increment=None, saturation_increment=None,
+                  color_temperature_increment=None, duration=None):
+        """Changes any combination of state attributes with a single request.
+
+        Each attribute takes either a value or an increment (negative lowers it).
+        duration - Seconds to fade the brightness over"""
+        data = build_state(on, brightness, hue, saturation, color_temperature,
+                           brightness_increment, hue_increment, saturation_increment,
+                           color_temperature_increment, duration)
+        if data:
+            self.__put("state", data)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Buffers every state change made inside the with block and sends them as one request at the end.
+
+        with my_aurora.batch():
+            my_aurora.on = True
+            my_aurora.brightness = 100
+            my_aurora.hue = 240
+        """
+        if self._batch is not None:
+            # Already inside a batch, the outer one sends everything
+            yield self
+            return
+        self._batch = {}
+        try:
+            yield self
+        finally:
+            data = self._batch
+            self._batch = None
+        if data:
+            self.__put("state", data)
+
     ###########################################
     # On / Off methods
     ###########################################
@@ -168,6 +394,11 @@ class Aurora(object):
         """Lower the brightness of the device by a relative amount (negative raises brightness)"""
         self.brightness_raise(-level)
 
+    def brightness_fade(self, level, duration: int):
+        """Fades the brightness to the given level (0-100) over the given number of seconds"""
+        data = {"brightness": {"value": level, "duration": duration}}
+        self.__put("state", data)
+
     ###########################################
     # Hue methods
     ###########################################
@@ -202,6 +433,13 @@ class Aurora(object):
         """Lower the hue of the device by a relative amount (negative raises hue)"""
         self.hue_raise(-level)
 
+    def hue_fade(self, level, duration: float):
+        """Fades the hue to the given level (0-360) over the given number of seconds.
+
+        Steps are sent in the background at max_rate (10 per second if max_rate wasn't set).
+        flush() raises the error of a step that failed."""
+        self.__ramp("hue", self.hue, level, duration)
+
     ###########################################
     # Saturation methods
     ###########################################
@@ -236,6 +474,13 @@ class Aurora(object):
         """Lower the saturation of the device by a relative amount (negative raises saturation)"""
         self.saturation_raise(-level)
 
+    def saturation_fade(self, level, duration: float):
+        """Fades the saturation to the given level (0-100) over the given number of seconds.
+
+        Steps are sent in the background at max_rate (10 per second if max_rate wasn't set).
+        flush() raises the error of a step that failed."""
+        self.__ramp("sat", self.saturation, level, duration)
+
     ###########################################
     # Color Temperature methods
     ###########################################
@@ -274,6 +519,13 @@ class Aurora(object):
         """Lower the color temperature of the device by a relative amount (negative raises color temperature)"""
         self.color_temperature_raise(-level)
 
+    def color_temperature_fade(self, level, duration: float):
+        """Fades the color temperature to the given level over the given number of seconds.
+
+        Steps are sent in the background at max_rate (10 per second if max_rate wasn't set).
+        flush() raises the error of a step that failed."""
+        self.__ramp("ct", self.color_temperature, level, duration)
+
     ###########################################
     # Color RGB/HSB methods
     ###########################################
@@ -283,48 +535,14 @@ class Aurora(object):
     @property
     def rgb(self):
         """The color of the device, as represented by 0-255 RGB values"""
-        hue = self.hue
-        saturation = self.saturation
-        brightness = self.brightness
-        if hue is None or saturation is None or brightness is None:
-            return None
-        rgb = colorsys.hsv_to_rgb(hue / 360, saturation / 100, brightness / 100)
-        return [int(rgb[0] * 255), int(rgb[1] * 255), int(rgb[2] * 255)]
+        return _hsb_to_rgb(self.hue, self.saturation, self.brightness)
 
     @rgb.setter
     def rgb(self, color):
         """Set the color of the device, as represented by either a hex string or a list of 0-255 RGB values"""
-        try:
-            red, green, blue = color
-        except ValueError:
-            try:
-                hexcolor = color
-                reg_match = re.match("^([A-Fa-f0-9]{6})$", hexcolor)
-                if reg_match:
-                    red = int(hexcolor[:2], 16)
-                    green = int(hexcolor[2:-2], 16)
-                    blue = int(hexcolor[-2:], 16)
-                else:
-                    print("Error: Color must be in valid hex format.")
-                    return
-            except ValueError:
-                print("Error: Color must have one hex value or three 0-255 values.")
-                return
-        if not 0 <= red <= 255:
-            print("Error: Red value out of range! (0-255)")
-            return
-        if not 0 <= green <= 255:
-            print("Error: Green value out of range! (0-255)")
-            return
-        if not 0 <= blue <= 255:
-            print("Error: Blue value out of range! (0-255)")
+        data = _rgb_to_state(color)
+        if data is None:
             return
-
-        hsv = colorsys.rgb_to_hsv(red / 255, green / 255, blue / 255)
-        hue = int(hsv[0] * 360)
-        saturation = int(hsv[1] * 100)
-        brightness = int(hsv[2] * 100)
-        data = {"hue": {"value": hue}, "sat": {"value": saturation}, "brightness": {"value": brightness}}
         self.__put("state", data)
 
     ###########################################
@@ -367,6 +585,20 @@ class Aurora(object):
         """
         return self.__get("panelLayout/layout/positionData")
 
+    @property
+    def layout(self) -> PanelLayout:
+        """Returns the panel layout as a PanelLayout, for neighbor and spatial queries.
+
+        The PanelLayout is only rebuilt when the layout or orientation has changed."""
+        panel_layout = self.__get("panelLayout")
+        if panel_layout is None:
+            return None
+        layout = panel_layout.get("layout") or {}
+        orientation = (panel_layout.get("globalOrientation") or {}).get("value", 0)
+        if self._layout is None or not self._layout.matches(layout, orientation):
+            self._layout = PanelLayout(layout, orientation)
+        return self._layout
+
     ###########################################
     # Effect methods
     ###########################################
@@ -387,16 +619,20 @@ class Aurora(object):
     @property
     def effects_list(self):
         """Returns a list of all effects stored on the device"""
-        return self.__get("effects/effectsList")
+        names = self.__get("effects/effectsList")
+        if self.effect_library is not None and names is not None:
+            self.effect_library.sync(names)
+        return names
 
     def effect_random(self) -> str:
         """Sets the active effect to a new random effect stored on the device.
         
         Returns the name of the new effect."""
-        effect_list = self.effects_list
-        active_effect = self.effect
-        if active_effect not in self._reserved_effect_names:
-            effect_list.remove(self.effect)
+        effects = self.__get("effects")
+        effect_list = effects["effectsList"]
+        active_effect = effects["select"]
+        if active_effect not in self._reserved_effect_names and active_effect in effect_list:
+            effect_list.remove(active_effect)
         new_effect = random.choice(effect_list)
         self.effect = new_effect
         return new_effect
@@ -404,26 +640,59 @@ class Aurora(object):
     def effect_set_raw(self, effect_data: dict):
         """Sends a raw dict containing effect data to the device.
 
-        The dict given must match the json structure specified in the API docs."""
+        The dict given must match the json structure specified in the API docs.
+        Adding an effect that the effect library already holds unchanged only selects it.
+        Returns the device's response, if it sent one."""
+        if (self.effect_library is not None and effect_data.get("command") == "add"
+                and self.effect_library.holds(effect_data)):
+            # Adding an effect also displays it, which a select does without re-sending the definition
+            self.__put("effects", {"select": effect_data["animName"]})
+            return None
         data = {"write": effect_data}
-        self.__put("effects", data)
+        response = self.__put("effects", data)
+        if self.effect_library is not None:
+            self.effect_library.record_write(effect_data)
+        return response
 
     def effect_details(self, name: str) -> dict:
         """Returns the dict containing details for the effect specified"""
+        if self.effect_library is not None:
+            details = self.effect_library.get(name)
+            if details is not None:
+                return details
         data = {"write": {"command": "request",
                           "animName": name}}
-        return self.__put("effects", data)
+        details = self.__put("effects", data)
+        if self.effect_library is not None and details is not None:
+            self.effect_library.store(details)
+        return details
 
     def effect_details_all(self) -> dict:
-        """Returns a dict containing details for all effects on the device"""
+        """Returns a dict containing details for all effects on the device.
+
+        With an effect library, only effects that aren't cached yet, or were cached too long ago, are downloaded."""
         data = {"write": {"command": "requestAll"}}
-        return self.__put("effects", data)
+        if self.effect_library is None:
+            return self.__put("effects", data)
+        names = self.__get("effects/effectsList")
+        with self.effect_library.batch():
+            missing = self.effect_library.sync(names)
+            if len(missing) * 2 > len(names):
+                # Fetching most of the effects one by one costs more than one full download
+                details = self.__put("effects", data)
+                self.effect_library.store_all(details["animations"])
+                return details
+            # Cached effects come straight from the library; only the missing ones are requested
+            animations = [self.effect_details(name) for name in names]
+        return {"animations": [details for details in animations if details is not None]}
 
     def effect_delete(self, name: str):
         """Removed the specified effect from the device"""
         data = {"write": {"command": "delete",
                           "animName": name}}
         self.__put("effects", data)
+        if self.effect_library is not None:
+            self.effect_library.remove(name)
 
     def effect_rename(self, old_name: str, new_name: str):
         """Renames the specified effect saved on the device to a new name"""
@@ -431,3 +700,5 @@ class Aurora(object):
                           "animName": old_name,
                           "newName": new_name}}
         self.__put("effects", data)
+        if self.effect_library is not None:
+            self.effect_library.rename(old_name, new_name)
@@ -0,0 +1,215 @@
+import argparse
+import json
+import sys
+from . import daemon
+
+# The nanoleaf command line tool
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+#
+# Commands go to the daemon when one is running, so they skip loading the library and connecting to the devices.
+# Without a daemon they run in this process instead, with the same results.
+
+STATE_LEVELS = ("brightness", "hue", "saturation", "color_temperature")
+
+
+def _add_level(state: dict, name: str, text: str):
+    # "+10" and "-10" raise and lower the level, anything else sets it
+    try:
+        value = int(text)
+    except ValueError:
+        raise ValueError(name + " must be a whole number, or +N / -N to change it") from None
+    if text.startswith(("+", "-")):
+        state[name + "_increment"] = value
+    else:
+        state[name] = value
+
+
+def _state(args) -> dict:
+    state = {}
+    if args.on is not None:
+        state["on"] = args.on
+    for name in STATE_LEVELS:
+        text = getattr(args, name)
+        if text is not None:
+            _add_level(state, name, text)
+    if args.duration is not None:
+        state["duration"] = args.duration
+    if args.rgb is not None:
+        state["rgb"] = [int(value) for value in args.rgb.split(",")] if "," in args.rgb else args.rgb
+    if args.effect is not None:
+        state["effect"] = args.effect
+    if not state:
+        raise ValueError("Nothing to set. See nanoleaf set --help.")
+    return state
+
+
+def _read_json(path: str):
+    if path == "-":
+        return json.load(sys.stdin)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_json(path: str, value):
+    if path == "-":
+        print(json.dumps(value, indent=2))
+        return
+    with open(path, "w") as f:
+        json.dump(value, f, indent=2)
+
+
+def _request(args) -> dict:
+    """Returns the request for the command in args, as understood by Fleet.handle()"""
+    devices = getattr(args, "device", None)
+    if args.command == "list":
+        return {"command": "list"}
+    if args.command == "discover":
+        return {"command": "discover", "seek_time": args.seek_time, "expected_count": args.expected}
+    if args.command == "pair":
+        return {"command": "pair", "devices": args.devices, "deadline": args.deadline}
+    if args.command == "get":
+        return {"command": "get", "devices": devices, "attributes": args.attributes}
+    if args.command == "set":
+        return {"command": "set", "devices": devices, "state": _state(args)}
+    if args.command == "effects":
+        return {"command": "effects", "devices": devices, "select": args.select, "shuffle": args.random}
+    if args.scene_command == "apply":
+        return {"command": "scene_apply", "scene": _read_json(args.file)}
+    return {"command": "scene_save", "devices": devices}
+
+
+def _fleet(args, **kwargs):
+    from .fleet import Fleet
+    if args.registry is not None:
+        kwargs["path"] = args.registry
+    return Fleet(**kwargs)
+
+
+def _run(args, request: dict) -> dict:
+    # Discovery and pairing take seconds and print progress, so they always run here
+    if not args.no_daemon and request["command"] not in ("discover", "pair"):
+        # None only means nothing is listening; once the daemon has the command, running it here too could
+        # apply it twice, so its errors are reported instead
+        response = daemon.send(request, args.socket, args.timeout)
+        if response is not None:
+            return response
+    with _fleet(args) as fleet:
+        return fleet.handle(request)
+
+
+def _daemon(args) -> int:
+    if args.action == "status":
+        response = daemon.send({"command": "ping"}, args.socket, args.timeout)
+        if response is None:
+            print("No daemon is running at " + args.socket)
+            return 1
+        print("Daemon running at " + args.socket + " (pid " + str(response["result"]) + ")")
+        return 0
+    if args.action == "stop":
+        if daemon.send({"command": "shutdown"}, args.socket, args.timeout) is None:
+            print("No daemon is running at " + args.socket)
+            return 1
+        return 0
+
+    with _fleet(args, cache_ttl=args.cache_ttl) as fleet:
+        server = daemon.FleetDaemon(fleet, args.socket)
+        try:
+            server.start()
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print("Listening on " + args.socket)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="nanoleaf", description="Control the Nanoleaf Auroras on your network.")
+    parser.add_argument("--registry", help="device registry file (default: ~/.nanoleaf/devices.json)")
+    parser.add_argument("--socket", default=daemon.DEFAULT_SOCKET, help="daemon socket (default: %(default)s)")
+    parser.add_argument("--no-daemon", action="store_true", help="run the command here even if a daemon is running")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for the daemon")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    targets = argparse.ArgumentParser(add_help=False)
+    targets.add_argument("-d", "--device", action="append",
+                         help="device id or IP address to control, may be repeated (default: every paired Aurora)")
+
+    commands.add_parser("list", help="show the Auroras in the registry")
+
+    discover = commands.add_parser("discover", help="search the network and add the Auroras found to the registry")
+    discover.add_argument("--seek-time", type=float, default=10, help="longest time to search, in seconds")
+    discover.add_argument("--expected", type=int, help="stop once this many Auroras have been found")
+
+    pair = commands.add_parser("pair", help="generate auth tokens (hold each power button for 5-7 seconds)")
+    pair.add_argument("devices", nargs="*", help="device ids or IP addresses (default: every unpaired Aurora)")
+    pair.add_argument("--deadline", type=float, default=120, help="seconds to keep trying")
+
+    get = commands.add_parser("get", parents=[targets], help="read the state of Auroras")
+    get.add_argument("attributes", nargs="*", help="attributes to read (default: on, brightness, hue, saturation, "
+                                                   "color_temperature, color_mode and effect)")
+
+    set_ = commands.add_parser("set", parents=[targets], help="change the state of Auroras")
+    power = set_.add_mutually_exclusive_group()
+    power.add_argument("--on", dest="on", action="store_const", const=True, help="turn on")
+    power.add_argument("--off", dest="on", action="store_const", const=False, help="turn off")
+    set_.add_argument("--brightness", metavar="N", help="0-100, or +N / -N to raise or lower it")
+    set_.add_argument("--hue", metavar="N", help="0-360, or +N / -N")
+    set_.add_argument("--saturation", metavar="N", help="0-100, or +N / -N")
+    set_.add_argument("--ct", dest="color_temperature", metavar="N", help="color temperature, or +N / -N")
+    set_.add_argument("--duration", type=float, help="seconds to fade the brightness over")
+    set_.add_argument("--rgb", help="color as a hex string (FF8800) or R,G,B")
+    set_.add_argument("--effect", help="effect to select")
+
+    effects = commands.add_parser("effects", parents=[targets], help="list or select effects")
+    choice = effects.add_mutually_exclusive_group()
+    choice.add_argument("--select", metavar="NAME", help="select this effect")
+    choice.add_argument("--random", action="store_true", help="select a random effect on each Aurora")
+
+    scene = commands.add_parser("scene", help="apply or save scenes")
+    scene_commands = scene.add_subparsers(dest="scene_command", metavar="action")
+    scene_commands.required = True
+    apply = scene_commands.add_parser("apply", help="apply a scene file (- reads standard input)")
+    apply.add_argument("file")
+    save = scene_commands.add_parser("save", parents=[targets], help="save what the Auroras show now as a scene")
+    save.add_argument("file", help="file to write (- writes to standard output)")
+
+    daemon_parser = commands.add_parser("daemon", help="run or control the background daemon")
+    daemon_parser.add_argument("action", nargs="?", choices=["run", "status", "stop"], default="run")
+    daemon_parser.add_argument("--cache-ttl", type=float, default=1,
+                               help="seconds that device state is served from cache (default: %(default)s)")
+    return parser
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == "daemon":
+            return _daemon(args)
+        response = _run(args, _request(args))
+    except Exception as e:
+        print("Error: " + (str(e) or type(e).__name__), file=sys.stderr)
+        return 1
+
+    if "error" in response:
+        print("Error: " + response["error"], file=sys.stderr)
+        return 1
+    errors = response.get("errors", {})
+    for device_id, message in sorted(errors.items()):
+        print(device_id + ": " + message, file=sys.stderr)
+    result = response.get("result")
+    if args.command == "scene":
+        if args.scene_command == "save":
+            _write_json(args.file, result)
+    elif args.command != "set" and (result or not errors):
+        print(json.dumps(result, indent=2))
+    return 0 if response["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import colorsys
+import importlib.util
+import math
+import re
+import sys
+
+# NumPy is slow to import, so it is only loaded by the first batch big enough to use it
+numpy = None
+
+# Bulk color conversions between RGB, hex, HSB and color temperature
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+#
+# Every function takes a whole batch of colors at once. With NumPy installed, batches are
+# converted in a few array operations and returned as NumPy arrays; otherwise they are
+# converted one at a time with colorsys and returned as lists. Both give identical values,
+# using the same rounding as Aurora.rgb.
+
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+
+# Below this many colors the per-call cost of NumPy outweighs the savings
+_NUMPY_MIN_BATCH = 16
+
+_HEX_PATTERN = re.compile("^([A-Fa-f0-9]{6})$")
+
+
+def _load_numpy():
+    global numpy
+    if numpy is None:
+        import numpy
+
+
+def _use_numpy(count: int) -> bool:
+    if HAVE_NUMPY and count >= _NUMPY_MIN_BATCH:
+        _load_numpy()
+        return True
+    return False
+
+
+def _is_array(values) -> bool:
+    # A NumPy array can only exist if something has imported NumPy already
+    module = sys.modules.get("numpy")
+    if module is not None and isinstance(values, module.ndarray):
+        _load_numpy()
+        return True
+    return False
+
+
+def hex_to_rgb(colors):
+    """Converts a list of 6-digit hex strings (e.g. "FF8000") to a list of 0-255 (R, G, B) values.
+
+    Raises ValueError if any string is not valid hex."""
+    colors = list(colors)
+    # Anything that isn't a string falls through to the loop below, which reports it
+    if _use_numpy(len(colors)) and all(isinstance(color, str) for color in colors):
+        joined = "".join(colors)
+        try:
+            raw = bytes.fromhex(joined)
+        except ValueError:
+            raw = b""
+        # fromhex skips whitespace, so the length check also catches it
+        if len(joined) == 6 * len(colors) and len(raw) == 3 * len(colors):
+            return numpy.frombuffer(raw, dtype=numpy.uint8).reshape(-1, 3).astype(numpy.int64)
+    rgb = []
+    for color in colors:
+        if not isinstance(color, str) or not _HEX_PATTERN.match(color):
+            raise ValueError("Color must be in valid hex format: " + repr(color))
+        rgb.append((int(color[:2], 16), int(color[2:4], 16), int(color[4:], 16)))
+    return rgb
+
+
+def rgb_to_hsb(colors):
+    """Converts a list of 0-255 (R, G, B) values to device hue (0-360), saturation and brightness (0-100).
+
+    Returns a (hues, saturations, brightnesses) tuple of integer sequences.
+    Raises ValueError if any value is out of range."""
+    if _is_array(colors):
+        count = len(colors)
+    else:
+        colors = list(colors)
+        count = len(colors)
+    if _use_numpy(count):
+        return _rgb_to_hsb_numpy(numpy.asarray(colors, dtype=numpy.float64).reshape(-1, 3))
+    hues, saturations, brightnesses = [], [], []
+    for red, green, blue in colors:
+        if not (0 <= red <= 255 and 0 <= green <= 255 and 0 <= blue <= 255):
+            raise ValueError("RGB values must be in range (0-255): " + repr((red, green, blue)))
+        hsv = colorsys.rgb_to_hsv(red / 255, green / 255, blue / 255)
+        hues.append(int(hsv[0] * 360))
+        saturations.append(int(hsv[1] * 100))
+        brightnesses.append(int(hsv[2] * 100))
+    return hues, saturations, brightnesses
+
+
+def _rgb_to_hsb_numpy(rgb):
+    if rgb.size and (rgb.min() < 0 or rgb.max() > 255):
+        raise ValueError("RGB values must be in range (0-255)")
+    # Same arithmetic as colorsys.rgb_to_hsv, so the results match it exactly
+    rgb = rgb / 255
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = rgb.max(axis=1)
+    minc = rgb.min(axis=1)
+    rangec = maxc - minc
+    grey = rangec == 0
+    safe_range = numpy.where(grey, 1.0, rangec)
+    safe_max = numpy.where(maxc == 0, 1.0, maxc)
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+    h = numpy.where(r == maxc, bc - gc, numpy.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = numpy.where(grey, 0.0, (h / 6.0) % 1.0)
+    s = numpy.where(grey, 0.0, rangec / safe_max)
+    return ((h * 360).astype(numpy.int64),
+            (s * 100).astype(numpy.int64),
+            (maxc * 100).astype(numpy.int64))
+
+
+def hex_to_hsb(colors):
+    """Converts a list of 6-digit hex strings to device hue, saturation and brightness sequences"""
+    return rgb_to_hsb(hex_to_rgb(colors))
+
+
+def hsb_to_rgb(hues, saturations, brightnesses):
+    """Converts device hue (0-360), saturation and brightness (0-100) sequences to 0-255 (R, G, B) values"""
+    if _is_array(hues):
+        count = len(hues)
+    else:
+        hues, saturations, brightnesses = list(hues), list(saturations), list(brightnesses)
+        count = len(hues)
+    if _use_numpy(count):
+        return _hsb_to_rgb_numpy(numpy.asarray(hues, dtype=numpy.float64) / 360,
+                                 numpy.asarray(saturations, dtype=numpy.float64) / 100,
+                                 numpy.asarray(brightnesses, dtype=numpy.float64) / 100)
+    rgb = []
+    for hue, saturation, brightness in zip(hues, saturations, brightnesses):
+        color = colorsys.hsv_to_rgb(hue / 360, saturation / 100, brightness / 100)
+        rgb.append((int(color[0] * 255), int(color[1] * 255), int(color[2] * 255)))
+    return rgb
+
+
+def _hsb_to_rgb_numpy(h, s, v):
+    # Same arithmetic as colorsys.hsv_to_rgb, so the results match it exactly
+    i = (h * 6.0).astype(numpy.int64)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+    sector = [i == n for n in range(6)]
+    r = numpy.select(sector, [v, q, p, p, t, v])
+    g = numpy.select(sector, [t, v, v, q, p, p])
+    b = numpy.select(sector, [p, p, t, v, v, q])
+    rgb = numpy.stack([r, g, b], axis=1)
+    grey = s == 0.0
+    rgb[grey] = v[grey, None]
+    return (rgb * 255).astype(numpy.int64)
+
+
+def kelvin_to_rgb(kelvins):
+    """Approximates the 0-255 (R, G, B) color of a list of color temperatures (1000-40000 Kelvin)"""
+    if _is_array(kelvins):
+        count = len(kelvins)
+    else:
+        kelvins = list(kelvins)
+        count = len(kelvins)
+    if _use_numpy(count):
+        temp = numpy.clip(numpy.asarray(kelvins, dtype=numpy.float64), 1000, 40000) / 100
+        warm = temp <= 66
+        hot = numpy.where(warm, 61.0, temp - 60)
+        red = numpy.where(warm, 255.0, 329.698727446 * hot ** -0.1332047592)
+        green = numpy.where(warm, 99.4708025861 * numpy.log(temp) - 161.1195681661,
+                            288.1221695283 * hot ** -0.0755148492)
+        cool = numpy.where(temp <= 19, 20.0, temp - 10)
+        blue = numpy.where(temp >= 66, 255.0,
+                           numpy.where(temp <= 19, 0.0, 138.5177312231 * numpy.log(cool) - 305.0447927307))
+        rgb = numpy.stack([red, green, blue], axis=1)
+        return numpy.clip(rgb, 0, 255).astype(numpy.int64)
+    return [_kelvin_to_rgb(kelvin) for kelvin in kelvins]
+
+
+def _kelvin_to_rgb(kelvin):
+    temp = min(max(kelvin, 1000), 40000) / 100
+    if temp <= 66:
+        red = 255.0
+        green = 99.4708025861 * math.log(temp) - 161.1195681661
+    else:
+        red = 329.698727446 * (temp - 60) ** -0.1332047592
+        green = 288.1221695283 * (temp - 60) ** -0.0755148492
+    if temp >= 66:
+        blue = 255.0
+    elif temp <= 19:
+        blue = 0.0
+    else:
+        blue = 138.5177312231 * math.log(temp - 10) - 305.0447927307
+    return tuple(int(min(max(c, 0), 255)) for c in (red, green, blue))
+
+
+def kelvin_to_hsb(kelvins):
+    """Converts a list of color temperatures to device hue, saturation and brightness sequences"""
+    return rgb_to_hsb(kelvin_to_rgb(kelvins))
@@ -0,0 +1,150 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+
+# Local daemon that keeps a Fleet warm for the command line tool, reached over a Unix socket
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+DEFAULT_SOCKET = os.path.join(os.path.expanduser("~"), ".nanoleaf", "daemon.sock")
+
+
+def send(request: dict, path: str = DEFAULT_SOCKET, timeout: float = 30):
+    """Sends one request to the daemon and returns its response, or None if no daemon is listening at path.
+
+    Once the daemon has accepted the request, it may already be running, so a missing answer raises
+    ConnectionError (and a timeout raises socket.timeout) instead of returning None."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    finally:
+        sock.close()
+    if not line:
+        raise ConnectionError("The daemon at " + path + " closed the connection without answering")
+    return json.loads(line)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # One JSON request per line, answered with one JSON response per line
+        for line in self.rfile:
+            try:
+                self.wfile.write(self.__answer(line))
+            except OSError:
+                # The client gave up waiting
+                return
+
+    def __answer(self, line: bytes) -> bytes:
+        # Every request gets an answer, so a client never has to guess whether its command ran
+        try:
+            request = json.loads(line)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict):
+            response = {"ok": False, "error": "Requests must be one JSON object per line"}
+        else:
+            try:
+                return json.dumps(self.server.daemon.handle(request)).encode("utf-8") + b"\n"
+            except Exception as e:
+                response = {"ok": False, "error": str(e) or type(e).__name__}
+        return json.dumps(response).encode("utf-8") + b"\n"
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class FleetDaemon(object):
+    def __init__(self, fleet, path: str = DEFAULT_SOCKET):
+        """Serves a Fleet's commands over a Unix socket, so each command line call skips connecting,
+        loading the registry and importing the library.
+
+        fleet - The fleet.Fleet to run commands on; its connections and cached state stay warm between calls
+        path - Path of the socket. Only the current user may connect to it."""
+        self.fleet = fleet
+        self.path = path
+        self._server = None
+        self._serving = False
+
+    def __repr__(self):
+        return "<FleetDaemon(" + self.path + ")>"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Opens the socket. Raises RuntimeError if another daemon is already listening on it."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            try:
+                running = send({"command": "ping"}, self.path, timeout=1) is not None
+            except (OSError, ValueError):
+                # Something accepted the connection, even if it didn't answer properly
+                running = True
+            if running:
+                raise RuntimeError("A daemon is already running at " + self.path)
+            # Left behind by a daemon that didn't shut down cleanly
+            os.unlink(self.path)
+        # The registry holds auth tokens, so nobody else may send commands
+        umask = os.umask(0o177)
+        try:
+            self._server = _Server(self.path, _Handler)
+        finally:
+            os.umask(umask)
+        self._server.daemon = self
+
+    def serve_forever(self):
+        """Answers requests until stop() is called or a client sends the shutdown command"""
+        if self._server is None:
+            self.start()
+        self._serving = True
+        try:
+            self._server.serve_forever()
+        finally:
+            self._serving = False
+            self.__close()
+
+    def stop(self):
+        """Stops answering requests and removes the socket"""
+        if self._serving:
+            # serve_forever() removes the socket once it returns
+            self._server.shutdown()
+        else:
+            self.__close()
+
+    def __close(self):
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def handle(self, request: dict) -> dict:
+        """Answers ping and shutdown itself and passes every other command on to the fleet"""
+        command = request.get("command")
+        if command == "ping":
+            return {"ok": True, "result": os.getpid()}
+        if command == "shutdown":
+            # shutdown() waits for serve_forever() to return, so it can't run on this handler's thread
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return {"ok": True, "result": os.getpid()}
+        return self.fleet.handle(request)
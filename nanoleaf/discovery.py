@@ -0,0 +1,202 @@
+import collections
+import select
+import socket
+import time
+
+# SSDP discovery engine that reports Auroras as soon as they answer
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+SSDP_IP = "239.255.255.250"
+SSDP_PORT = 1900
+SSDP_MX = 3
+SSDP_ST = "nanoleaf_aurora:light"
+
+_RECV_SIZE = 4096
+
+
+class DiscoveredAurora(collections.namedtuple("DiscoveredAurora", "ip_address device_id headers port")):
+    """An Aurora that answered a discovery request.
+
+    ip_address - IP address of the device, or None if it didn't report one (a known firmware 2.1.0 bug)
+    device_id - The nl-deviceid the device reported
+    headers - Every header of the response, with lowercase names
+    port - Port of the device's API"""
+    __slots__ = ()
+
+
+def search_request(search_target: str = SSDP_ST, mx: int = SSDP_MX) -> bytes:
+    """Returns an encoded M-SEARCH request for the given search target"""
+    req = ['M-SEARCH * HTTP/1.1',
+           'HOST: ' + SSDP_IP + ':' + str(SSDP_PORT),
+           'MAN: "ssdp:discover"',
+           'ST: ' + search_target,
+           'MX: ' + str(mx)]
+    return ('\r\n'.join(req) + '\r\n\r\n').encode('utf-8')
+
+
+def parse_response(data: bytes, search_target: str = SSDP_ST):
+    """Parses an SSDP response. Returns a DiscoveredAurora, or None if it isn't from an Aurora."""
+    text = data.decode("utf-8", "replace")
+    if search_target not in text:
+        return None
+    headers = {}
+    for line in text.split("\n"):
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    location = headers.get("location", "").replace("http://", "").rstrip("/")
+    ip_address, _, port = location.partition(":")
+    port = int(port) if port.isdigit() else 16021
+    return DiscoveredAurora(ip_address or None, headers.get("nl-deviceid"), headers, port)
+
+
+def interface_addresses() -> list:
+    """Returns the IPv4 addresses of this machine's network interfaces, or [""] for the default interface"""
+    try:
+        infos = socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET, socket.SOCK_DGRAM)
+    except socket.gaierror:
+        infos = []
+    addresses = []
+    for info in infos:
+        address = info[4][0]
+        if not address.startswith("127.") and address not in addresses:
+            addresses.append(address)
+    return addresses or [""]
+
+
+def _open_socket(interface: str) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, SSDP_MX)
+    if interface:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+    sock.bind((interface, 0))
+    sock.setblocking(False)
+    return sock
+
+
+class _Tracker(object):
+    """Drops repeated answers and decides when a search can stop early"""
+
+    def __init__(self, expected_count: int = None, device_ids=None):
+        self.expected_count = expected_count
+        self.missing = set(device_ids) if device_ids else None
+        self.seen = set()
+        self.found = 0
+
+    def add(self, aurora: DiscoveredAurora) -> bool:
+        key = aurora.device_id or aurora.ip_address
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        if aurora.ip_address is not None:
+            self.found += 1
+            if self.missing is not None:
+                self.missing.discard(aurora.device_id)
+        return True
+
+    @property
+    def done(self) -> bool:
+        if self.missing is not None:
+            return not self.missing
+        return self.expected_count is not None and self.found >= self.expected_count
+
+
+def discover(seek_time: float = 30, expected_count: int = None, device_ids=None,
+             interval: float = 1.0, interfaces: list = None, ssdp_address=(SSDP_IP, SSDP_PORT)):
+    """Searches the network for Auroras, yielding a DiscoveredAurora as soon as each one answers.
+
+    seek_time - Longest time to search, in seconds
+    expected_count - Stop as soon as this many Auroras with IP addresses have been found
+    device_ids - Stop as soon as every one of these nl-deviceids has been found
+    interval - Seconds between repeated M-SEARCH bursts, since single UDP packets are easily lost
+    interfaces - Local IPv4 addresses to search from. Defaults to every interface."""
+    tracker = _Tracker(expected_count, device_ids)
+    if tracker.done:
+        return
+    request = search_request()
+    sockets = [_open_socket(interface) for interface in (interfaces or interface_addresses())]
+    try:
+        deadline = time.monotonic() + seek_time
+        next_burst = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            if now >= next_burst:
+                for sock in sockets:
+                    sock.sendto(request, ssdp_address)
+                next_burst = now + interval
+            ready, _, _ = select.select(sockets, [], [], max(0.0, min(next_burst, deadline) - now))
+            for sock in ready:
+                try:
+                    data = sock.recv(_RECV_SIZE)
+                except BlockingIOError:
+                    continue
+                aurora = parse_response(data)
+                if aurora is not None and tracker.add(aurora):
+                    yield aurora
+                    if tracker.done:
+                        return
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+class _DiscoveryProtocol(object):
+    # Implements asyncio's datagram protocol without subclassing it, so discover() doesn't import asyncio
+    def __init__(self, queue):
+        self.queue = queue
+
+    def connection_made(self, transport):
+        pass
+
+    def datagram_received(self, data, addr):
+        aurora = parse_response(data)
+        if aurora is not None:
+            self.queue.put_nowait(aurora)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        pass
+
+
+async def discover_async(seek_time: float = 30, expected_count: int = None, device_ids=None,
+                         interval: float = 1.0, interfaces: list = None, ssdp_address=(SSDP_IP, SSDP_PORT)):
+    """Async iterator version of discover(), yielding each DiscoveredAurora as soon as it answers"""
+    import asyncio
+    tracker = _Tracker(expected_count, device_ids)
+    if tracker.done:
+        return
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    request = search_request()
+    transports = []
+    try:
+        for interface in interfaces or interface_addresses():
+            transport, _ = await loop.create_datagram_endpoint(lambda: _DiscoveryProtocol(queue),
+                                                               sock=_open_socket(interface))
+            transports.append(transport)
+        deadline = loop.time() + seek_time
+        next_burst = loop.time()
+        while True:
+            now = loop.time()
+            if now >= deadline:
+                return
+            if now >= next_burst:
+                for transport in transports:
+                    transport.sendto(request, ssdp_address)
+                next_burst = now + interval
+            try:
+                aurora = await asyncio.wait_for(queue.get(), max(0.0, min(next_burst, deadline) - now))
+            except asyncio.TimeoutError:
+                continue
+            if tracker.add(aurora):
+                yield aurora
+                if tracker.done:
+                    return
+    finally:
+        for transport in transports:
+            transport.close()
@@ -0,0 +1,202 @@
+import contextlib
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Local cache of the effect definitions stored on an Aurora
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+
+def effect_hash(definition: dict) -> str:
+    """Returns a hash of an effect definition that ignores key order and the write command"""
+    content = {key: value for key, value in definition.items() if key != "command"}
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+class EffectLibrary(object):
+    def __init__(self, path: str = None, max_age: float = 3600):
+        """Keeps parsed effect definitions for one device, keyed by name and content hash.
+
+        path - If set, the library is loaded from and saved to this JSON file so it survives restarts.
+               Use one file per device.
+        max_age - Seconds a definition is trusted after it was last read from or written to the device.
+                  Older ones are downloaded again, so effects edited from another app are picked up.
+                  None trusts them forever."""
+        self.path = path
+        self.max_age = max_age
+        self.effects = {}
+        self.hashes = {}
+        self.checked = {}
+        self._batching = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+        if path is not None:
+            self.load()
+
+    def __repr__(self):
+        return "<EffectLibrary(" + str(len(self.effects)) + " effects)>"
+
+    def __len__(self):
+        return len(self.effects)
+
+    def __contains__(self, name):
+        return name in self.effects
+
+    def load(self):
+        """Reloads the library from disk"""
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            saved = {}
+        if isinstance(saved, list):
+            # Libraries saved by older versions didn't record when each effect was checked
+            saved = {"effects": saved}
+        checked = saved.get("checked", {})
+        with self._lock:
+            self.effects = {}
+            self.hashes = {}
+            self.checked = {}
+            for definition in saved.get("effects", []):
+                self.__add(definition, checked.get(definition["animName"], 0))
+
+    def save(self):
+        """Writes the library to disk, if it has a path"""
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            saved = {"effects": list(self.effects.values()), "checked": dict(self.checked)}
+            self._dirty = False
+        # Write to a temporary file first so a crash never leaves a half-written library
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(saved, f)
+        os.replace(temporary, self.path)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Saves the library once when the block ends, instead of after every change inside it"""
+        with self._lock:
+            self._batching += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batching -= 1
+                changed = self._batching == 0 and self._dirty
+            if changed:
+                self.save()
+
+    def __changed(self):
+        with self._lock:
+            if self._batching:
+                self._dirty = True
+                return
+        self.save()
+
+    def __add(self, definition: dict, checked: float):
+        definition = copy.deepcopy({key: value for key, value in definition.items() if key != "command"})
+        self.effects[definition["animName"]] = definition
+        self.hashes[definition["animName"]] = effect_hash(definition)
+        self.checked[definition["animName"]] = checked
+
+    def __fresh(self, name: str) -> bool:
+        if name not in self.effects:
+            return False
+        return self.max_age is None or time.time() - self.checked[name] < self.max_age
+
+    ###########################################
+    # Effect methods
+    ###########################################
+
+    def get(self, name: str) -> dict:
+        """Returns a copy of the stored definition of the effect, or None if it isn't stored or is too old"""
+        with self._lock:
+            if not self.__fresh(name):
+                return None
+            return copy.deepcopy(self.effects[name])
+
+    def find(self, digest: str) -> str:
+        """Returns the name of a stored effect with the given content hash, or None"""
+        with self._lock:
+            return next((name for name, value in self.hashes.items() if value == digest), None)
+
+    def holds(self, definition: dict) -> bool:
+        """Returns True if an identical definition is stored under the same name and isn't too old"""
+        name = definition.get("animName")
+        with self._lock:
+            return self.__fresh(name) and self.hashes[name] == effect_hash(definition)
+
+    def store(self, definition: dict):
+        """Records the definition of one effect as the device has it, replacing any with the same name"""
+        with self._lock:
+            self.__add(definition, time.time())
+        self.__changed()
+
+    def store_all(self, definitions: list):
+        """Replaces the whole library with the given definitions"""
+        now = time.time()
+        with self._lock:
+            self.effects = {}
+            self.hashes = {}
+            self.checked = {}
+            for definition in definitions:
+                self.__add(definition, now)
+        self.__changed()
+
+    def clear(self):
+        """Forgets every effect, e.g. after effects were edited from another app"""
+        self.store_all([])
+
+    def remove(self, name: str):
+        """Forgets the effect with the given name"""
+        with self._lock:
+            self.effects.pop(name, None)
+            self.hashes.pop(name, None)
+            self.checked.pop(name, None)
+        self.__changed()
+
+    def rename(self, old_name: str, new_name: str):
+        """Moves a stored definition to a new name"""
+        with self._lock:
+            definition = self.effects.pop(old_name, None)
+            self.hashes.pop(old_name, None)
+            checked = self.checked.pop(old_name, 0)
+            if definition is not None:
+                definition["animName"] = new_name
+                self.__add(definition, checked)
+        self.__changed()
+
+    def sync(self, names: list) -> list:
+        """Drops effects missing from the device's name list and returns the names that need fetching.
+
+        Those are the effects that aren't stored yet, and the ones that are too old to trust."""
+        with self._lock:
+            present = set(names)
+            stale = [name for name in self.effects if name not in present]
+            for name in stale:
+                self.effects.pop(name)
+                self.hashes.pop(name)
+                self.checked.pop(name)
+            missing = [name for name in names if not self.__fresh(name)]
+        if stale:
+            self.__changed()
+        return missing
+
+    def record_write(self, write: dict):
+        """Applies a successful effects write command (add, delete or rename) to the library"""
+        command = write.get("command")
+        if command == "add" and write.get("animType") != "extControl":
+            self.store(write)
+        elif command == "delete":
+            self.remove(write.get("animName"))
+        elif command == "rename":
+            self.rename(write.get("animName"), write.get("newName"))
@@ -0,0 +1,239 @@
+import asyncio
+import collections
+import http.client
+import json
+import socket
+import threading
+from .async_aurora import AsyncAurora
+from .exceptions import AuroraError
+from .state import StateCache, STATE_EVENT, LAYOUT_EVENT, EFFECTS_EVENT, TOUCH_EVENT
+
+# Push-based updates from an Aurora's Server-Sent Events stream
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+ALL_EVENTS = (STATE_EVENT, LAYOUT_EVENT, EFFECTS_EVENT, TOUCH_EVENT)
+
+_CHUNK_SIZE = 4096
+
+
+def _iter_chunks(response: http.client.HTTPResponse):
+    # read() waits for the connection to close on streams without chunked encoding,
+    # so take whatever has arrived instead
+    while True:
+        chunk = response.read1(_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _interrupt(sock: socket.socket):
+    # Closing a response while another thread is blocked reading it deadlocks on the reader's
+    # buffer lock, so shut the socket down instead; the reader then sees the stream end
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class Event(collections.namedtuple("Event", "type events")):
+    """A batch of changes pushed by the device.
+
+    type - STATE_EVENT, LAYOUT_EVENT, EFFECTS_EVENT or TOUCH_EVENT
+    events - List of dicts describing each change, as sent by the device"""
+    __slots__ = ()
+
+
+class EventParser(object):
+    """Incrementally parses a Server-Sent Events byte stream into Events"""
+
+    def __init__(self):
+        self._buffer = b""
+        self._id = None
+        self._data = []
+
+    def feed(self, chunk: bytes) -> list:
+        """Adds the next chunk of the stream and returns every Event it completed"""
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        completed = []
+        for line in lines:
+            line = line.rstrip(b"\r").decode("utf-8", "replace")
+            if line == "":
+                event = self._dispatch()
+                if event is not None:
+                    completed.append(event)
+                continue
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "id":
+                self._id = value
+            elif field == "data":
+                self._data.append(value)
+        return completed
+
+    def _dispatch(self):
+        data, self._data = self._data, []
+        if not data or self._id is None:
+            return None
+        try:
+            event_type = int(self._id)
+            events = json.loads("\n".join(data)).get("events", [])
+        except (ValueError, AttributeError):
+            return None
+        return Event(event_type, events)
+
+
+class EventStream(object):
+    def __init__(self, aurora, event_types=ALL_EVENTS, callback=None, timeout: float = 5,
+                 retry_delay: float = 1, read_timeout: float = 60):
+        """Subscribes to the events an Aurora pushes, keeping a local mirror of its state up to date.
+
+        aurora - The Aurora to listen to (or an AsyncAurora, when only using listen_async)
+        event_types - Which of STATE_EVENT, LAYOUT_EVENT, EFFECTS_EVENT and TOUCH_EVENT to receive
+        callback - Called with each Event as it arrives when running in the background with start()
+        timeout - Seconds to wait when connecting
+        retry_delay - Seconds to wait before reconnecting after the stream drops
+        read_timeout - Seconds of silence after which the stream is treated as dropped and reconnected.
+                       A connection that died without being closed would otherwise go unnoticed forever."""
+        self.aurora = aurora
+        self.event_types = tuple(event_types)
+        self.callback = callback
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.read_timeout = read_timeout
+        query = "events?id=" + ",".join(str(t) for t in self.event_types)
+        self.url = aurora.baseUrl + query
+        self._path = "/api/v1/" + aurora.auth_token + "/" + query
+        self.mirror = StateCache(float("inf"))
+        self._socket = None
+        self._running = False
+        self._wake = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return "<EventStream(" + self.aurora.ip_address + ")>"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def get(self, endpoint: str):
+        """Returns a value from the mirror by its endpoint path (e.g. "state/brightness/value")"""
+        return self.mirror.lookup(endpoint)[1]
+
+    def _status_error(self, status: int) -> AuroraError:
+        return AuroraError("Error " + str(status) + " opening the event stream (" + self.aurora.ip_address + ")",
+                           self.aurora.ip_address, status)
+
+    def _resync(self):
+        # Anything pushed while disconnected is lost, so start over from a full snapshot
+        info = self.aurora.info
+        if info is not None:
+            self.mirror.store(info)
+
+    ###########################################
+    # Blocking / background methods
+    ###########################################
+
+    def __iter__(self):
+        """Yields each Event as it arrives, reconnecting whenever the stream drops, until stop() is called"""
+        self._running = True
+        self._wake.clear()
+        while self._running:
+            connection = http.client.HTTPConnection(self.aurora.ip_address, self.aurora.port, timeout=self.timeout)
+            try:
+                self._resync()
+                connection.connect()
+                # Keep a reference of our own: http.client lets go of the socket if the device sends Connection: close
+                self._socket = connection.sock
+                self._socket.settimeout(self.read_timeout)
+                if not self._running:
+                    break
+                connection.request("GET", self._path)
+                response = connection.getresponse()
+                if response.status != 200:
+                    raise self._status_error(response.status)
+                parser = EventParser()
+                for chunk in _iter_chunks(response):
+                    for event in parser.feed(chunk):
+                        self.mirror.apply_event(event.type, event.events)
+                        yield event
+            except (http.client.HTTPException, OSError, AuroraError, ValueError) as e:
+                # Shutting the socket down from stop() and hitting read_timeout (socket.timeout) surface here as well
+                if not self._running:
+                    break
+                print("Event stream dropped (" + self.aurora.ip_address + "): " + str(e))
+            finally:
+                self._socket = None
+                connection.close()
+            if self._running:
+                self._wake.wait(self.retry_delay)
+
+    def start(self):
+        """Starts listening on a background thread, passing every Event to the callback"""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self.__run, name="nanoleaf-events", daemon=True)
+        self._thread.start()
+
+    def __run(self):
+        for event in self:
+            if self.callback is not None:
+                self.callback(event)
+
+    def stop(self):
+        """Stops listening and closes the stream"""
+        self._running = False
+        self._wake.set()
+        sock = self._socket
+        if sock is not None:
+            _interrupt(sock)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(self.timeout)
+        self._thread = None
+
+    ###########################################
+    # Asyncio methods
+    ###########################################
+
+    async def listen_async(self):
+        """Async iterator yielding each Event as it arrives. Requires aiohttp.
+
+        Reconnects whenever the stream drops, until the loop is broken out of or stop() is called."""
+        if aiohttp is None:
+            raise ImportError("listen_async requires aiohttp. Install it with: pip install nanoleaf[async]")
+        self._running = True
+        timeout = aiohttp.ClientTimeout(sock_connect=self.timeout, sock_read=self.read_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while self._running:
+                try:
+                    if isinstance(self.aurora, AsyncAurora):
+                        info = await self.aurora.info()
+                    else:
+                        info = await asyncio.get_running_loop().run_in_executor(None, lambda: self.aurora.info)
+                    if info is not None:
+                        self.mirror.store(info)
+                    async with session.get(self.url) as response:
+                        if response.status != 200:
+                            raise self._status_error(response.status)
+                        parser = EventParser()
+                        async for chunk in response.content.iter_any():
+                            for event in parser.feed(chunk):
+                                self.mirror.apply_event(event.type, event.events)
+                                yield event
+                            if not self._running:
+                                return
+                except (aiohttp.ClientError, asyncio.TimeoutError, AuroraError) as e:
+                    print("Event stream dropped (" + self.aurora.ip_address + "): " + str(e))
+                if self._running:
+                    await asyncio.sleep(self.retry_delay)
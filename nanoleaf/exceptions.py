@@ -0,0 +1,56 @@
+# Exceptions raised when an Aurora request fails
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+
+class AuroraError(Exception):
+    """Base class for every error raised by a request to an Aurora.
+
+    ip_address - The device the request was sent to
+    status_code - The HTTP status the device answered with, or None if there was no answer"""
+
+    def __init__(self, message: str, ip_address: str = None, status_code: int = None):
+        super().__init__(message)
+        self.ip_address = ip_address
+        self.status_code = status_code
+
+
+class BadRequest(AuroraError):
+    """Error 400: The device couldn't parse the request"""
+
+
+class Unauthorized(AuroraError):
+    """Error 401: The auth token isn't valid for this device"""
+
+
+class Forbidden(AuroraError):
+    """Error 403: The device refused the request"""
+
+
+class ResourceNotFound(AuroraError):
+    """Error 404: The endpoint, or the effect named in the request, doesn't exist"""
+
+
+class UnprocessableEntity(AuroraError):
+    """Error 422: The request was understood, but a value in it is invalid"""
+
+
+class InternalServerError(AuroraError):
+    """Error 500: The device failed while handling the request"""
+
+
+class AuroraConnectionError(AuroraError):
+    """The request didn't get an answer: the device is unreachable or timed out"""
+
+
+class CircuitOpenError(AuroraConnectionError):
+    """The request wasn't sent because the device has failed too often recently"""
+
+
+# Exception raised for each error status the device is known to send
+STATUS_ERRORS = {400: BadRequest,
+                 401: Unauthorized,
+                 403: Forbidden,
+                 404: ResourceNotFound,
+                 422: UnprocessableEntity,
+                 500: InternalServerError}
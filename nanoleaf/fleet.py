@@ -0,0 +1,244 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .registry import DEFAULT_PATH, DeviceRegistry
+
+# Commands for every Aurora in the device registry, shared by the command line tool and its daemon
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+# Attributes that get() can read, in the order they're reported
+ATTRIBUTES = ("on", "brightness", "hue", "saturation", "color_temperature", "color_mode", "effect")
+
+# Keys of a state dict that are passed on to Aurora.set_state()
+_STATE_KEYS = ("on", "brightness", "hue", "saturation", "color_temperature",
+               "brightness_increment", "hue_increment", "saturation_increment", "color_temperature_increment",
+               "duration")
+
+
+def _check_state(state: dict):
+    unknown = set(state) - set(_STATE_KEYS) - {"effect", "rgb"}
+    if unknown:
+        raise ValueError("Unknown state: " + ", ".join(sorted(unknown)))
+
+
+def _apply_state(aurora, state: dict):
+    """Applies a state dict (set_state() arguments, plus effect and rgb) with as few requests as possible"""
+    values = {key: value for key, value in state.items() if key in _STATE_KEYS}
+    if values:
+        aurora.set_state(**values)
+    if state.get("rgb") is not None:
+        aurora.rgb = state["rgb"]
+    if state.get("effect") is not None:
+        aurora.effect = state["effect"]
+
+
+def _capture_state(aurora) -> dict:
+    """Returns a state dict that restores the device to what it shows now"""
+    info = aurora.info
+    state = info["state"]
+    captured = {"on": state["on"]["value"], "brightness": state["brightness"]["value"]}
+    if state.get("colorMode") == "hs":
+        captured["hue"] = state["hue"]["value"]
+        captured["saturation"] = state["sat"]["value"]
+    elif state.get("colorMode") == "ct":
+        captured["color_temperature"] = state["ct"]["value"]
+    else:
+        captured["effect"] = info["effects"]["select"]
+    return captured
+
+
+class Fleet(object):
+    def __init__(self, path: str = DEFAULT_PATH, cache_ttl: float = 1, max_workers: int = 16):
+        """Runs commands against the Auroras stored in a DeviceRegistry, all of them in parallel.
+
+        Auroras are connected on first use and kept, so a long-running Fleet (e.g. in the daemon) reuses
+        its keep-alive connections. The registry is reloaded whenever its file changes.
+        path - Path of the device registry
+        cache_ttl - Seconds that state reads are served from one cached info request, so reading
+                    several attributes costs one request
+        max_workers - Largest number of requests in flight at the same time"""
+        self.registry = DeviceRegistry(path)
+        self.cache_ttl = cache_ttl
+        self._auroras = {}
+        self._loaded = self.__modified()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._commands = {"list": self.list, "discover": self.discover, "pair": self.pair,
+                          "get": self.get, "set": self.set, "effects": self.effects,
+                          "scene_apply": self.scene_apply, "scene_save": self.scene_save}
+
+    def __repr__(self):
+        return "<Fleet(" + self.registry.path + ", " + str(len(self.registry)) + " devices)>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stops the worker threads and closes every connection"""
+        self._executor.shutdown(wait=True)
+        self.__disconnect()
+
+    def __disconnect(self):
+        for aurora in self._auroras.values():
+            aurora.close()
+        self._auroras = {}
+
+    def __modified(self):
+        try:
+            return os.stat(self.registry.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def __refresh(self):
+        # Pick up devices discovered or paired by another process
+        modified = self.__modified()
+        if modified != self._loaded:
+            self.registry.load()
+            self.__disconnect()
+            self._loaded = modified
+
+    def __resolve(self, devices) -> list:
+        """Returns the registry entries for the given device ids or IP addresses, or every paired device"""
+        if not devices:
+            paired = [device for device in self.registry if device.get("auth_token")]
+            if not paired:
+                raise ValueError("No paired Auroras. Run discover and pair first.")
+            return paired
+        by_ip = {device["ip_address"]: device for device in self.registry}
+        resolved = []
+        for name in devices:
+            device = self.registry.get(name) or by_ip.get(name)
+            if device is None:
+                raise ValueError("Unknown Aurora: " + name)
+            resolved.append(device)
+        return resolved
+
+    def __aurora(self, device: dict):
+        aurora = self._auroras.get(device["device_id"])
+        if aurora is None:
+            if not device.get("auth_token"):
+                raise ValueError("Not paired yet")
+            aurora = self.registry.aurora(device["device_id"], cache_ttl=self.cache_ttl)
+            self._auroras[device["device_id"]] = aurora
+        return aurora
+
+    def __map(self, function, devices) -> dict:
+        """Calls function(aurora, device) for every device in parallel.
+
+        Returns {"result": {device_id: value}, "errors": {device_id: message}}."""
+        futures = [(device, self._executor.submit(lambda d: function(self.__aurora(d), d), device))
+                   for device in devices]
+        result = {}
+        errors = {}
+        for device, future in futures:
+            try:
+                result[device["device_id"]] = future.result()
+            except Exception as e:
+                # One device failing, for whatever reason, never costs the others their results
+                errors[device["device_id"]] = str(e) or type(e).__name__
+        return {"result": result, "errors": errors}
+
+    ###########################################
+    # Commands
+    ###########################################
+
+    def handle(self, request: dict) -> dict:
+        """Runs a command given as {"command": name, ...arguments} and returns a JSON-ready response.
+
+        The response has ok, and either result and errors (per device) or error (for the whole command)."""
+        command = self._commands.get(request.get("command"))
+        if command is None:
+            return {"ok": False, "error": "Unknown command: " + str(request.get("command"))}
+        arguments = {key: value for key, value in request.items() if key != "command"}
+        try:
+            # Commands from several daemon clients take turns; each one still reaches its devices in parallel
+            with self._lock:
+                self.__refresh()
+                response = command(**arguments)
+        except Exception as e:
+            return {"ok": False, "error": str(e) or type(e).__name__}
+        response["ok"] = not response.get("errors")
+        return response
+
+    def list(self) -> dict:
+        """Returns every stored device, without its auth token"""
+        return {"result": [{"device_id": device["device_id"], "ip_address": device["ip_address"],
+                            "port": device.get("port", 16021), "paired": bool(device.get("auth_token")),
+                            "firmware": device.get("firmware"), "last_seen": device.get("last_seen")}
+                           for device in self.registry]}
+
+    def discover(self, seek_time: float = 10, expected_count: int = None) -> dict:
+        """Searches the network, stores every Aurora found and returns them"""
+        found = self.registry.update_from_discovery(seek_time, expected_count=expected_count)
+        self._loaded = self.__modified()
+        self.__disconnect()
+        return {"result": [device["device_id"] for device in found]}
+
+    def pair(self, devices: list = None, deadline: float = 120) -> dict:
+        """Generates auth tokens for the given devices, or every device that isn't paired yet, and stores them"""
+        from .setup import generate_auth_tokens
+        if devices:
+            pending = self.__resolve(devices)
+        else:
+            pending = [device for device in self.registry if not device.get("auth_token") and device["ip_address"]]
+        tokens = generate_auth_tokens([(device["ip_address"], device.get("port", 16021)) for device in pending],
+                                      deadline=deadline)
+        result = []
+        errors = {}
+        for device in pending:
+            token = tokens.get((device["ip_address"], device.get("port", 16021)))
+            if token is None:
+                errors[device["device_id"]] = "No auth token before the deadline"
+                continue
+            device["auth_token"] = token
+            result.append(device["device_id"])
+        self.registry.save()
+        self._loaded = self.__modified()
+        self.__disconnect()
+        return {"result": result, "errors": errors}
+
+    def get(self, devices: list = None, attributes: list = None) -> dict:
+        """Reads the given attributes (default: all of ATTRIBUTES) from every device"""
+        attributes = list(attributes or ATTRIBUTES)
+        unknown = set(attributes) - set(ATTRIBUTES) - {"rgb", "firmware", "model", "panel_count"}
+        if unknown:
+            raise ValueError("Unknown attribute: " + ", ".join(sorted(unknown)))
+        return self.__map(lambda aurora, device: {attribute: getattr(aurora, attribute) for attribute in attributes},
+                          self.__resolve(devices))
+
+    def set(self, state: dict, devices: list = None) -> dict:
+        """Changes the state of every device. state takes the arguments of Aurora.set_state(), plus effect and rgb."""
+        _check_state(state)
+        return self.__map(lambda aurora, device: _apply_state(aurora, state), self.__resolve(devices))
+
+    def effects(self, devices: list = None, select: str = None, shuffle: bool = False) -> dict:
+        """Lists the effects on every device, or selects one (shuffle picks a random one on each device)"""
+        if select is not None:
+            return self.__map(lambda aurora, device: setattr(aurora, "effect", select) or select,
+                              self.__resolve(devices))
+        if shuffle:
+            return self.__map(lambda aurora, device: aurora.effect_random(), self.__resolve(devices))
+        return self.__map(lambda aurora, device: aurora.effects_list, self.__resolve(devices))
+
+    def scene_apply(self, scene: dict) -> dict:
+        """Applies a scene: {device id or IP address: state dict}, where "*" is applied to every paired device first"""
+        base = scene.get("*")
+        targets = [name for name in scene if name != "*"]
+        states = {}
+        if base is not None:
+            for device in self.__resolve(None):
+                states[device["device_id"]] = dict(base)
+        for name, device in zip(targets, self.__resolve(targets)):
+            states.setdefault(device["device_id"], dict(base or {})).update(scene[name])
+        for state in states.values():
+            _check_state(state)
+        devices = [self.registry.get(device_id) for device_id in states]
+        return self.__map(lambda aurora, device: _apply_state(aurora, states[device["device_id"]]), devices)
+
+    def scene_save(self, devices: list = None) -> dict:
+        """Returns a scene that restores every device to what it shows now"""
+        return self.__map(lambda aurora, device: _capture_state(aurora), self.__resolve(devices))
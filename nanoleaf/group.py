@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+from .aurora import Aurora
+
+# Controls many Auroras at once
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+
+class GroupResult(dict):
+    """Maps each Aurora in a group to the value its call returned.
+
+    Auroras whose call raised an exception are left out and listed in errors instead."""
+
+    def __init__(self):
+        super().__init__()
+        self.errors = {}
+
+    @property
+    def ok(self) -> bool:
+        """Returns True if the call succeeded on every Aurora"""
+        return len(self.errors) == 0
+
+
+class AuroraGroup(object):
+    def __init__(self, auroras, max_workers: int = 16, **kwargs):
+        """Groups many Auroras so commands are sent to all of them in parallel.
+
+        auroras - Aurora instances, or (ip_address, auth_token) pairs to create them from.
+                  The address can also be an (ip_address, port) pair, as returned by setup.generate_auth_tokens.
+        max_workers - Largest number of requests in flight at the same time
+        Any other keyword arguments are passed on to the Auroras created from pairs."""
+        self.auroras = []
+        self._owned = []
+        for aurora in auroras:
+            if not isinstance(aurora, Aurora):
+                address, auth_token = aurora
+                if isinstance(address, tuple):
+                    aurora = Aurora(address[0], auth_token, port=address[1], **kwargs)
+                else:
+                    aurora = Aurora(address, auth_token, **kwargs)
+                self._owned.append(aurora)
+            self.auroras.append(aurora)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(self.auroras))))
+
+    def __repr__(self):
+        return "<AuroraGroup(" + ", ".join(a.ip_address for a in self.auroras) + ")>"
+
+    def __iter__(self):
+        return iter(self.auroras)
+
+    def __len__(self):
+        return len(self.auroras)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stops the worker threads and closes the Auroras the group created itself"""
+        self._executor.shutdown(wait=True)
+        for aurora in self._owned:
+            aurora.close()
+
+    ###########################################
+    # Fan-out methods
+    ###########################################
+
+    def map(self, function) -> GroupResult:
+        """Calls function(aurora) for every Aurora in parallel and waits for all of them"""
+        futures = [(aurora, self._executor.submit(function, aurora)) for aurora in self.auroras]
+        result = GroupResult()
+        for aurora, future in futures:
+            try:
+                result[aurora] = future.result()
+            except Exception as e:
+                result.errors[aurora] = e
+        return result
+
+    def call(self, method: str, *args, **kwargs) -> GroupResult:
+        """Calls the named Aurora method with the given arguments on every Aurora"""
+        return self.map(lambda aurora: getattr(aurora, method)(*args, **kwargs))
+
+    def set(self, attribute: str, value) -> GroupResult:
+        """Sets the named Aurora property to the given value on every Aurora"""
+        return self.map(lambda aurora: setattr(aurora, attribute, value))
+
+    def get(self, attribute: str) -> GroupResult:
+        """Reads the named Aurora property from every Aurora"""
+        return self.map(lambda aurora: getattr(aurora, attribute))
+
+    ###########################################
+    # Setter shortcuts
+    ###########################################
+
+    def set_on(self, value: bool) -> GroupResult:
+        """Turns every device on/off. True = on, False = off"""
+        return self.set("on", value)
+
+    def set_brightness(self, level) -> GroupResult:
+        """Sets the brightness of every device to the given level (0-100)"""
+        return self.set("brightness", level)
+
+    def set_hue(self, level) -> GroupResult:
+        """Sets the hue of every device to the given level (0-360)"""
+        return self.set("hue", level)
+
+    def set_saturation(self, level) -> GroupResult:
+        """Sets the saturation of every device to the given level (0-100)"""
+        return self.set("saturation", level)
+
+    def set_color_temperature(self, level) -> GroupResult:
+        """Sets the color temperature of every device to the given level"""
+        return self.set("color_temperature", level)
+
+    def set_rgb(self, color) -> GroupResult:
+        """Sets the color of every device, as represented by either a hex string or a list of 0-255 RGB values"""
+        return self.set("rgb", color)
+
+    def set_effect(self, effect_name: str) -> GroupResult:
+        """Sets the active effect of every device to the name specified"""
+        return self.set("effect", effect_name)
+
+    def effect_set_raw(self, effect_data: dict) -> GroupResult:
+        """Sends a raw dict containing effect data to every device"""
+        return self.call("effect_set_raw", effect_data)
+
+    def identify(self) -> GroupResult:
+        """Briefly flash the panels of every device"""
+        return self.call("identify")
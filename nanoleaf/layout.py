@@ -0,0 +1,170 @@
+import math
+from array import array
+
+# Indexed panel layout with neighbor and spatial queries
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+# Centers of two triangles sharing an edge are sideLength / sqrt(3) apart
+_NEIGHBOR_DISTANCE = 1 / math.sqrt(3)
+# Slack on that distance, since positionData is rounded to whole units
+_NEIGHBOR_TOLERANCE = 1.1
+
+
+class PanelLayout(object):
+    def __init__(self, layout: dict, orientation: float = 0):
+        """Builds the geometry of a panel layout once so it can be queried cheaply every frame.
+
+        layout - The panelLayout/layout dict of the device (numPanels, sideLength, positionData)
+        orientation - The globalOrientation value of the device (0-360)
+
+        Panels are addressed by panelId. Queries use the rotated coordinates: the device coordinates
+        turned counter-clockwise by orientation degrees about the center of the layout."""
+        positions = layout.get("positionData") or []
+        self.side_length = layout.get("sideLength") or 150
+        self.orientation = orientation or 0
+        self.panel_ids = array("l", (panel["panelId"] for panel in positions))
+        self.x = array("d", (panel["x"] for panel in positions))
+        self.y = array("d", (panel["y"] for panel in positions))
+        self.o = array("d", (panel.get("o", 0) for panel in positions))
+        self.index = {panel_id: i for i, panel_id in enumerate(self.panel_ids)}
+        self._source = (layout, orientation)
+
+        count = len(self.panel_ids)
+        center_x = (min(self.x) + max(self.x)) / 2 if count else 0.0
+        center_y = (min(self.y) + max(self.y)) / 2 if count else 0.0
+        angle = math.radians(self.orientation)
+        cos, sin = math.cos(angle), math.sin(angle)
+        self.rotated_x = array("d", (center_x + (x - center_x) * cos - (y - center_y) * sin
+                                     for x, y in zip(self.x, self.y)))
+        self.rotated_y = array("d", (center_y + (x - center_x) * sin + (y - center_y) * cos
+                                     for x, y in zip(self.x, self.y)))
+
+        # Uniform grid over the rotated coordinates, one side length per cell
+        self._cell = float(self.side_length)
+        self._grid = {}
+        for i in range(count):
+            self._grid.setdefault(self.__cell_of(self.rotated_x[i], self.rotated_y[i]), []).append(i)
+        columns = [cell[0] for cell in self._grid] or [0]
+        rows = [cell[1] for cell in self._grid] or [0]
+        self._extent = (min(columns), min(rows), max(columns), max(rows))
+
+        # Rotation doesn't change distances, so neighbors come straight from the grid
+        limit = self.side_length * _NEIGHBOR_DISTANCE * _NEIGHBOR_TOLERANCE
+        self._neighbors = tuple(tuple(j for j in self.__candidates(i, 1) if j != i and self.__distance(i, j) <= limit)
+                                for i in range(count))
+
+        self._order_x = tuple(sorted(range(count), key=lambda i: (self.rotated_x[i], self.rotated_y[i])))
+        self._order_y = tuple(sorted(range(count), key=lambda i: (self.rotated_y[i], self.rotated_x[i])))
+
+    @classmethod
+    def from_panel_layout(cls, panel_layout: dict) -> "PanelLayout":
+        """Builds a layout from the device's panelLayout dict (layout and globalOrientation)"""
+        return cls(panel_layout.get("layout") or {}, (panel_layout.get("globalOrientation") or {}).get("value", 0))
+
+    def __repr__(self):
+        return "<PanelLayout(" + str(len(self)) + " panels)>"
+
+    def __len__(self):
+        return len(self.panel_ids)
+
+    def __iter__(self):
+        return iter(self.panel_ids)
+
+    def __contains__(self, panel_id):
+        return panel_id in self.index
+
+    def matches(self, layout: dict, orientation: float = 0) -> bool:
+        """Returns True if this object was built from the given layout and orientation"""
+        return self._source == (layout, orientation)
+
+    def __cell_of(self, x: float, y: float) -> tuple:
+        return int(math.floor(x / self._cell)), int(math.floor(y / self._cell))
+
+    def __scan(self, min_x: float, min_y: float, max_x: float, max_y: float):
+        # Only the occupied part of the grid is visited, however large the area asked for
+        low_column, low_row = self.__cell_of(min_x, min_y)
+        high_column, high_row = self.__cell_of(max_x, max_y)
+        for column in range(max(low_column, self._extent[0]), min(high_column, self._extent[2]) + 1):
+            for row in range(max(low_row, self._extent[1]), min(high_row, self._extent[3]) + 1):
+                yield from self._grid.get((column, row), ())
+
+    def __candidates(self, i: int, radius: int):
+        column, row = self.__cell_of(self.rotated_x[i], self.rotated_y[i])
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                yield from self._grid.get((column + dx, row + dy), ())
+
+    def __distance(self, i: int, j: int) -> float:
+        return math.hypot(self.rotated_x[i] - self.rotated_x[j], self.rotated_y[i] - self.rotated_y[j])
+
+    ###########################################
+    # Panel queries
+    ###########################################
+
+    def position(self, panel_id: int) -> tuple:
+        """Returns the rotated (x, y) of the panel"""
+        i = self.index[panel_id]
+        return self.rotated_x[i], self.rotated_y[i]
+
+    def neighbors(self, panel_id: int) -> list:
+        """Returns the ids of the panels sharing an edge with the panel"""
+        return [self.panel_ids[j] for j in self._neighbors[self.index[panel_id]]]
+
+    def left_to_right(self) -> list:
+        """Returns every panel id ordered by rotated x, for horizontal sweeps"""
+        return [self.panel_ids[i] for i in self._order_x]
+
+    def bottom_to_top(self) -> list:
+        """Returns every panel id ordered by rotated y, for vertical sweeps"""
+        return [self.panel_ids[i] for i in self._order_y]
+
+    @property
+    def bounds(self) -> tuple:
+        """Returns the (min x, min y, max x, max y) of the rotated panel centers"""
+        if not self.panel_ids:
+            return 0.0, 0.0, 0.0, 0.0
+        return min(self.rotated_x), min(self.rotated_y), max(self.rotated_x), max(self.rotated_y)
+
+    ###########################################
+    # Spatial queries
+    ###########################################
+
+    def nearest(self, x: float, y: float) -> int:
+        """Returns the id of the panel whose center is closest to the rotated point, or None without panels"""
+        if not self.panel_ids:
+            return None
+        column, row = self.__cell_of(x, y)
+        min_column, min_row, max_column, max_row = self._extent
+        max_radius = max(abs(column - min_column), abs(column - max_column), abs(row - min_row), abs(row - max_row))
+        if max_radius * max_radius > len(self.panel_ids):
+            # Far outside the layout, walking empty rings costs more than checking every panel
+            candidates = range(len(self.panel_ids))
+            best = min(candidates, key=lambda i: math.hypot(self.rotated_x[i] - x, self.rotated_y[i] - y))
+            return self.panel_ids[best]
+        best, best_distance = None, float("inf")
+        for radius in range(max_radius + 1):
+            # The point lies inside the center cell, so anything in ring n is over n - 1 cells away
+            if best is not None and best_distance <= (radius - 1) * self._cell:
+                break
+            for dx in range(-radius, radius + 1):
+                for dy in range(-radius, radius + 1):
+                    if max(abs(dx), abs(dy)) != radius:
+                        continue
+                    for i in self._grid.get((column + dx, row + dy), ()):
+                        distance = math.hypot(self.rotated_x[i] - x, self.rotated_y[i] - y)
+                        if distance < best_distance:
+                            best, best_distance = i, distance
+        return self.panel_ids[best]
+
+    def within(self, x: float, y: float, radius: float) -> list:
+        """Returns the ids of the panels whose centers are within radius of the rotated point"""
+        found = [i for i in self.__scan(x - radius, y - radius, x + radius, y + radius)
+                 if math.hypot(self.rotated_x[i] - x, self.rotated_y[i] - y) <= radius]
+        return [self.panel_ids[i] for i in sorted(found)]
+
+    def region(self, min_x: float, min_y: float, max_x: float, max_y: float) -> list:
+        """Returns the ids of the panels whose centers lie inside the rotated rectangle"""
+        found = [i for i in self.__scan(min_x, min_y, max_x, max_y)
+                 if min_x <= self.rotated_x[i] <= max_x and min_y <= self.rotated_y[i] <= max_y]
+        return [self.panel_ids[i] for i in sorted(found)]
@@ -0,0 +1,109 @@
+import bisect
+import collections
+import threading
+
+# Request instrumentation: per-device, per-endpoint counters and latency histograms
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket catches everything else
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestInfo(collections.namedtuple("RequestInfo", "ip_address method endpoint status "
+                                                        "bytes_sent bytes_received duration error")):
+    """Describes one finished request, as passed to after-request hooks.
+
+    status - HTTP status code, or None if the request never got a response
+    duration - Seconds from sending the request to receiving the full response
+    error - The exception raised if the request failed to complete, otherwise None"""
+    __slots__ = ()
+
+
+def _label_value(value) -> str:
+    # Label values are quoted, so backslashes, quotes and newlines must be escaped
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+class _Series(object):
+    __slots__ = ("count", "errors", "bytes_sent", "bytes_received", "total_duration", "buckets", "statuses")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_duration = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.statuses = {}
+
+
+class Metrics(object):
+    """Collects request counters and latency histograms. Use it as an after-request hook:
+
+    metrics = Metrics()
+    my_aurora.add_request_hook(after=metrics)"""
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, info: RequestInfo):
+        self.record(info)
+
+    def record(self, info: RequestInfo):
+        """Adds one finished request to the counters"""
+        key = (info.ip_address, info.method, info.endpoint)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.count += 1
+            if info.error is not None or info.status is None or info.status >= 400:
+                series.errors += 1
+            series.bytes_sent += info.bytes_sent
+            series.bytes_received += info.bytes_received
+            series.total_duration += info.duration
+            series.buckets[bisect.bisect_left(LATENCY_BUCKETS, info.duration)] += 1
+            series.statuses[info.status] = series.statuses.get(info.status, 0) + 1
+
+    def reset(self):
+        """Clears every counter"""
+        with self._lock:
+            self._series = {}
+
+    def snapshot(self) -> dict:
+        """Returns the counters as {ip_address: {"METHOD endpoint": {...}}}"""
+        result = {}
+        with self._lock:
+            for (ip_address, method, endpoint), series in self._series.items():
+                result.setdefault(ip_address, {})[method + " " + endpoint] = {
+                    "count": series.count,
+                    "errors": series.errors,
+                    "bytes_sent": series.bytes_sent,
+                    "bytes_received": series.bytes_received,
+                    "mean_duration": series.total_duration / series.count,
+                    "statuses": dict(series.statuses),
+                    "latency_buckets": dict(zip(LATENCY_BUCKETS + (float("inf"),), series.buckets))}
+        return result
+
+    def prometheus(self, prefix: str = "nanoleaf") -> str:
+        """Returns the counters in the Prometheus text exposition format"""
+        lines = ["# TYPE " + prefix + "_requests_total counter",
+                 "# TYPE " + prefix + "_request_errors_total counter",
+                 "# TYPE " + prefix + "_request_duration_seconds histogram"]
+        with self._lock:
+            for (ip_address, method, endpoint), series in sorted(self._series.items()):
+                labels = ("device=" + _label_value(ip_address) + ",method=" + _label_value(method)
+                          + ",endpoint=" + _label_value(endpoint))
+                lines.append(prefix + "_requests_total{" + labels + "} " + str(series.count))
+                lines.append(prefix + "_request_errors_total{" + labels + "} " + str(series.errors))
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), series.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(prefix + "_request_duration_seconds_bucket{" + labels + ',le="' + le + '"} '
+                                 + str(cumulative))
+                lines.append(prefix + "_request_duration_seconds_sum{" + labels + "} " + repr(series.total_duration))
+                lines.append(prefix + "_request_duration_seconds_count{" + labels + "} " + str(series.count))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,189 @@
+import random
+import threading
+import time
+from .exceptions import AuroraConnectionError, CircuitOpenError
+from .transport import TransportError
+
+# Retry and circuit-breaker policies for flaky devices
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+# Seconds to wait for (connecting, reading) before a request is given up on
+DEFAULT_TIMEOUT = (5, 10)
+
+
+class RetryPolicy(object):
+    def __init__(self, retries: int = 2, backoff: float = 0.1, max_backoff: float = 2.0,
+                 retry_statuses=(500,)):
+        """Decides which failed requests are sent again, and how long to wait first.
+
+        Only requests that are safe to repeat are retried: GETs, and state PUTs that set
+        values rather than increments.
+        retries - Most extra attempts per request
+        backoff - Base delay in seconds; attempt n waits a random time up to backoff * 2^n
+        max_backoff - Longest delay between attempts
+        retry_statuses - Error statuses worth retrying, besides timeouts and connection failures"""
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = tuple(retry_statuses)
+
+    def __repr__(self):
+        return "<RetryPolicy(" + str(self.retries) + " retries)>"
+
+    @staticmethod
+    def is_idempotent(method: str, endpoint: str, data: dict = None) -> bool:
+        """Returns True if sending the request twice has the same effect as sending it once"""
+        if method == "GET":
+            return True
+        if method == "PUT" and endpoint == "state" and isinstance(data, dict):
+            return not any(isinstance(change, dict) and "increment" in change for change in data.values())
+        return False
+
+    def should_retry(self, method: str, endpoint: str, data: dict, attempt: int, status_code: int = None) -> bool:
+        """Returns True if a request that failed on the given attempt (0 = first) should be sent again.
+
+        status_code - The error status the device answered with, or None if it didn't answer"""
+        if attempt >= self.retries or not self.is_idempotent(method, endpoint, data):
+            return False
+        return status_code is None or status_code in self.retry_statuses
+
+    def delay(self, attempt: int) -> float:
+        """Returns the seconds to wait before the next attempt, with full jitter"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class CircuitBreaker(object):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 10):
+        """Stops sending requests to a device that keeps failing, and probes it for recovery.
+
+        failure_threshold - Consecutive failures that open the circuit
+        recovery_time - Seconds to fail fast before letting a single probe request through"""
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<CircuitBreaker(" + self.state + ")>"
+
+    @property
+    def is_open(self) -> bool:
+        """Returns True while requests are being refused"""
+        return self.state == self.OPEN
+
+    def allow(self) -> bool:
+        """Returns True if a request may be sent now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self._opened_at + self.recovery_time:
+                # Let exactly one probe through; everything else keeps failing fast until it's back
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        """Closes the circuit after a request got a healthy answer"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        """Counts a failed request, opening the circuit once there have been too many in a row"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def reset(self):
+        """Closes the circuit and forgets past failures"""
+        self.record_success()
+
+
+class _Attempt(object):
+    def __init__(self, retry: RetryPolicy, circuit_breaker: CircuitBreaker, ip_address: str,
+                 method: str, endpoint: str, data: dict, number: int):
+        """One try at sending a request, reporting how it went to the circuit breaker when the block exits.
+
+        After the block, delay is the seconds to wait before trying again, or None if the request is done."""
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.ip_address = ip_address
+        self.method = method
+        self.endpoint = endpoint
+        self.data = data
+        self.number = number
+        self.response = None
+        self.error = None
+        self.delay = None
+
+    def __enter__(self):
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError("Not sending " + self.method + " " + self.endpoint + ": too many recent failures ("
+                                   + self.ip_address + ")", self.ip_address)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Runs however the attempt ended, even if it was cancelled or a hook raised,
+        # so a half-open breaker always hears back from its probe
+        if self.response is not None and self.response.status_code < 500:
+            self.circuit_breaker.record_success()
+            return False
+        self.circuit_breaker.record_failure()
+        if exc_type is not None or self.circuit_breaker.is_open:
+            return False
+        status_code = None if self.response is None else self.response.status_code
+        if self.retry.should_retry(self.method, self.endpoint, self.data, self.number, status_code):
+            self.delay = self.retry.delay(self.number)
+        return False
+
+    def result(self):
+        """Returns the device's answer, or raises AuroraConnectionError if there wasn't one"""
+        if self.error is not None:
+            raise AuroraConnectionError(str(self.error), self.ip_address) from self.error
+        return self.response
+
+
+def send_request(send, retry: RetryPolicy, circuit_breaker: CircuitBreaker, ip_address: str,
+                 method: str, endpoint: str = "", data: dict = None):
+    """Calls send() until the request gets an answer, retrying and failing fast as the policies say.
+
+    send - Called with no arguments for each attempt; returns a transport.Response or raises TransportError
+    Returns the last Response. Raises CircuitOpenError while the circuit is open,
+    or AuroraConnectionError if the device didn't answer."""
+    number = 0
+    while True:
+        with _Attempt(retry, circuit_breaker, ip_address, method, endpoint, data, number) as attempt:
+            try:
+                attempt.response = send()
+            except TransportError as e:
+                attempt.error = e
+        if attempt.delay is None:
+            return attempt.result()
+        time.sleep(attempt.delay)
+        number += 1
+
+
+async def send_request_async(send, retry: RetryPolicy, circuit_breaker: CircuitBreaker, ip_address: str,
+                             method: str, endpoint: str = "", data: dict = None):
+    """Awaitable version of send_request, where send() is a coroutine function"""
+    import asyncio
+    number = 0
+    while True:
+        with _Attempt(retry, circuit_breaker, ip_address, method, endpoint, data, number) as attempt:
+            try:
+                attempt.response = await send()
+            except TransportError as e:
+                attempt.error = e
+        if attempt.delay is None:
+            return attempt.result()
+        await asyncio.sleep(attempt.delay)
+        number += 1
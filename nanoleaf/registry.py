@@ -0,0 +1,171 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import discovery
+from .aurora import Aurora
+from .transport import HTTPTransport, TransportError
+
+# On-disk registry of known Auroras, so startup doesn't need a full discovery
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".nanoleaf", "devices.json")
+
+
+class DeviceRegistry(object):
+    def __init__(self, path: str = DEFAULT_PATH):
+        """Loads the registry stored at the given path, or starts an empty one if it doesn't exist yet.
+
+        Each device is a dict with device_id, ip_address, port, auth_token, last_seen and firmware."""
+        self.path = path
+        self.devices = {}
+        self.load()
+
+    def __repr__(self):
+        return "<DeviceRegistry(" + self.path + ", " + str(len(self.devices)) + " devices)>"
+
+    def __iter__(self):
+        return iter(self.devices.values())
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __contains__(self, device_id):
+        return device_id in self.devices
+
+    def load(self):
+        """Reloads the registry from disk.
+
+        Raises ValueError if the file is corrupt, rather than starting over and losing the stored auth tokens."""
+        try:
+            with open(self.path, "r") as f:
+                self.devices = {device["device_id"]: device for device in json.load(f)}
+        except FileNotFoundError:
+            self.devices = {}
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError("The device registry at " + self.path + " is corrupt (" + str(e)
+                             + "). Fix or delete the file, then run discovery again.") from e
+
+    def save(self):
+        """Writes the registry to disk"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves a half-written registry
+        temporary = self.path + ".tmp"
+        try:
+            # A leftover file would keep its old permissions
+            os.unlink(temporary)
+        except FileNotFoundError:
+            pass
+        # The registry holds auth tokens, so only the owner may read it
+        with os.fdopen(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+            json.dump(list(self.devices.values()), f, indent=2)
+        os.replace(temporary, self.path)
+
+    ###########################################
+    # Device methods
+    ###########################################
+
+    def get(self, device_id: str) -> dict:
+        """Returns the stored device with the given nl-deviceid, or None"""
+        return self.devices.get(device_id)
+
+    def add(self, device_id: str, ip_address: str, auth_token: str = None, firmware: str = None,
+            port: int = 16021) -> dict:
+        """Adds a device or updates what is known about it, and marks it as seen now"""
+        device = self.devices.setdefault(device_id, {"device_id": device_id, "ip_address": None, "port": port,
+                                                     "auth_token": None, "last_seen": None, "firmware": None})
+        device["ip_address"] = ip_address
+        device["port"] = port
+        if auth_token is not None:
+            device["auth_token"] = auth_token
+        if firmware is not None:
+            device["firmware"] = firmware
+        device["last_seen"] = time.time()
+        return device
+
+    def remove(self, device_id: str):
+        """Forgets the device with the given nl-deviceid"""
+        self.devices.pop(device_id, None)
+
+    def aurora(self, device_id: str, **kwargs) -> Aurora:
+        """Returns an Aurora for the stored device. Keyword arguments are passed on to Aurora."""
+        device = self.devices[device_id]
+        return Aurora(device["ip_address"], device["auth_token"], port=device.get("port", 16021), **kwargs)
+
+    ###########################################
+    # Revalidation methods
+    ###########################################
+
+    @staticmethod
+    def probe(device: dict, timeout: float = 1) -> bool:
+        """Checks that the device still answers at its stored IP address with one cheap request.
+
+        Devices with an auth token must accept it, which also confirms it is the same device.
+        Fills in the firmware version when the token is accepted."""
+        if not device.get("ip_address"):
+            return False
+        transport = HTTPTransport(device["ip_address"], device.get("port", 16021))
+        try:
+            if device.get("auth_token"):
+                path = "/api/v1/" + device["auth_token"] + "/firmwareVersion"
+                r = transport.request("GET", path, timeout=timeout)
+                if r.status_code != 200:
+                    return False
+                device["firmware"] = json.loads(r.text)
+                return True
+            transport.request("GET", "/api/v1/", timeout=timeout)
+            return True
+        except (TransportError, ValueError):
+            return False
+        finally:
+            transport.close()
+
+    def revalidate(self, timeout: float = 1, seek_time: float = 10, max_workers: int = 16, **kwargs) -> list:
+        """Probes every stored device in parallel and runs discovery only for the ones that didn't answer.
+
+        Saves the registry and returns the devices that are reachable.
+        Any other keyword arguments are passed on to discovery.discover()."""
+        devices = list(self.devices.values())
+        if not devices:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(devices)))) as executor:
+            answered = list(executor.map(lambda device: self.probe(device, timeout), devices))
+        now = time.time()
+        reachable = []
+        missing = {}
+        for device, ok in zip(devices, answered):
+            if ok:
+                device["last_seen"] = now
+                reachable.append(device)
+            else:
+                missing[device["device_id"]] = device
+
+        if missing:
+            for found in discovery.discover(seek_time, device_ids=list(missing), **kwargs):
+                device = missing.pop(found.device_id, None)
+                if device is None or found.ip_address is None:
+                    continue
+                device["ip_address"] = found.ip_address
+                device["port"] = found.port
+                # Found on the network isn't enough: the token must still work at the new address
+                if self.probe(device, timeout):
+                    device["last_seen"] = time.time()
+                    reachable.append(device)
+
+        self.save()
+        return reachable
+
+    def update_from_discovery(self, seek_time: float = 30, expected_count: int = None, **kwargs) -> list:
+        """Runs a full discovery and records every Aurora found. Returns the devices found.
+
+        Any other keyword arguments are passed on to discovery.discover()."""
+        found = []
+        for aurora in discovery.discover(seek_time, expected_count=expected_count, **kwargs):
+            if aurora.ip_address is None or aurora.device_id is None:
+                continue
+            found.append(self.add(aurora.device_id, aurora.ip_address, port=aurora.port))
+        self.save()
+        return found
@@ -0,0 +1,241 @@
+import collections
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from .stream import ExtControlStream, frame_size, pack_frame
+
+# Renders computed visuals onto many Auroras using worker processes and shared memory
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+# Everything a worker needs to render one device, sent once when the worker starts
+_Device = collections.namedtuple("_Device", "version panel_ids x y offsets")
+
+# What a worker keeps for one renderer: its own handle on the shared memory and the render settings
+_Worker = collections.namedtuple("_Worker", "memory devices source transition barrier")
+
+# Worker state, keyed by shared memory name so renderers sharing a process (processes=0) never mix
+_workers = {}
+
+# Seconds a worker waits for the others while they all release their shared memory
+_CLOSE_TIMEOUT = 5
+
+
+def _init_worker(memory_name: str, devices: list, source, transition: int, barrier=None):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    _workers[memory_name] = _Worker(memory, devices, source, transition, barrier)
+
+
+def _close_worker(memory_name: str):
+    """Releases this worker's handle on the shared memory"""
+    worker = _workers.pop(memory_name, None)
+    if worker is None:
+        return
+    worker.memory.close()
+    if worker.barrier is not None:
+        # Hold this process until every other worker has taken its own close task
+        try:
+            worker.barrier.wait(_CLOSE_TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass
+
+
+def _render(memory_name: str, indexes: list, slot: int, t: float):
+    """Computes and encodes one frame for each of the given devices, straight into shared memory"""
+    worker = _workers[memory_name]
+    buffer = worker.memory.buf
+    for index in indexes:
+        device = worker.devices[index]
+        colors = [worker.source(t, x, y) for x, y in zip(device.x, device.y)]
+        pack_frame(buffer, device.offsets[slot], device.version, device.panel_ids, colors, worker.transition)
+
+
+class FrameRenderer(object):
+    def __init__(self, auroras, source, fps: float = 30, processes: int = None, version: str = "v1",
+                 transition: int = 1):
+        """Maps a source onto the panels of many Auroras and streams the frames over extControl.
+
+        auroras - The Auroras to drive
+        source - Called as source(t, x, y) for every panel and returns its (R, G, B) color (0-255).
+                 t is seconds since the start, x and y are the panel's orientation-corrected coordinates
+                 from Aurora.layout. It runs in worker processes, so it must be a module-level function.
+        fps - Frames per second. Frames that can't be rendered in time are skipped, so the output stays in sync
+        processes - Worker processes, defaulting to the CPU count. 0 renders on a thread in this process instead.
+        version - The extControl protocol version, "v1" (Aurora) or "v2" (newer firmware)
+        transition - Fade time into each frame in tenths of a second"""
+        self.auroras = list(auroras)
+        self.source = source
+        self.fps = fps
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        self.version = version
+        self.transition = transition
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.last_error = None
+        self._streams = []
+        self._devices = []
+        self._views = []
+        self._memory = None
+        self._executor = None
+        self._workers = 0
+        self._chunks = []
+        self._thread = None
+        self._running = False
+        self._wake = threading.Event()
+
+    def __repr__(self):
+        return "<FrameRenderer(" + str(len(self.auroras)) + " Auroras, " + str(self.fps) + " fps)>"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    ###########################################
+    # Setup methods
+    ###########################################
+
+    def __prepare(self):
+        if self._executor is not None:
+            return
+        layouts = [aurora.layout for aurora in self.auroras]
+        # Two slots per device: one is sent while the next frame is rendered into the other
+        offsets = []
+        total = 0
+        for layout in layouts:
+            size = frame_size(self.version, len(layout))
+            offsets.append((total, total + size, size))
+            total += 2 * size
+        self._memory = shared_memory.SharedMemory(create=True, size=max(1, total))
+        try:
+            self._devices = [_Device(self.version, list(layout.panel_ids), layout.rotated_x, layout.rotated_y,
+                                     (first, second))
+                             for layout, (first, second, size) in zip(layouts, offsets)]
+            self._views = [(self._memory.buf[first:first + size], self._memory.buf[second:second + size])
+                           for first, second, size in offsets]
+
+            self._streams = []
+            for aurora, device in zip(self.auroras, self._devices):
+                stream = ExtControlStream(aurora, self.version, device.panel_ids)
+                self._streams.append(stream)
+                stream.start()
+
+            self._workers = max(1, self.processes)
+            if self.processes == 0:
+                initargs = (self._memory.name, self._devices, self.source, self.transition)
+                self._executor = ThreadPoolExecutor(1, initializer=_init_worker, initargs=initargs)
+            else:
+                barrier = multiprocessing.Barrier(self._workers)
+                initargs = (self._memory.name, self._devices, self.source, self.transition, barrier)
+                self._executor = ProcessPoolExecutor(self._workers, initializer=_init_worker, initargs=initargs)
+        except BaseException:
+            # Don't leave the shared memory segment behind if a stream or the workers couldn't start
+            self.__release()
+            raise
+        indexes = list(range(len(self._devices)))
+        self._chunks = [indexes[i::self._workers] for i in range(min(self._workers, len(indexes)))]
+
+    def __release(self):
+        if self._executor is not None:
+            # One close task per worker; in processes, a barrier makes sure each worker takes exactly one
+            try:
+                closing = [self._executor.submit(_close_worker, self._memory.name) for _ in range(self._workers)]
+            except BrokenExecutor:
+                closing = []
+            for future in closing:
+                future.exception()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        for stream in self._streams:
+            stream.close()
+        self._streams = []
+        for first, second in self._views:
+            first.release()
+            second.release()
+        self._views = []
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    ###########################################
+    # Rendering methods
+    ###########################################
+
+    def __submit(self, slot: int, t: float) -> list:
+        return [self._executor.submit(_render, self._memory.name, chunk, slot, t) for chunk in self._chunks]
+
+    def __loop(self, duration: float = None):
+        period = 1.0 / self.fps
+        start = time.monotonic()
+        frame, slot = 0, 0
+        pending = self.__submit(slot, 0.0)
+        try:
+            while self._running:
+                for future in pending:
+                    future.result()
+                pending = []
+                if duration is not None and frame * period >= duration:
+                    break
+                # Render the next frame while this one waits for its turn, skipping any that are already late
+                next_frame = max(frame + 1, int((time.monotonic() - start) / period) + 1)
+                self.frames_skipped += next_frame - frame - 1
+                pending = self.__submit(1 - slot, next_frame * period)
+                delay = start + frame * period - time.monotonic()
+                if delay > 0:
+                    self._wake.wait(delay)
+                    if not self._running:
+                        break
+                for stream, views in zip(self._streams, self._views):
+                    stream.send_packet(views[slot])
+                self.frames_sent += 1
+                frame, slot = next_frame, 1 - slot
+        finally:
+            # Shared memory must not be released while a worker is still writing to it
+            for future in pending:
+                future.exception()
+
+    def run(self, duration: float = None):
+        """Renders and sends frames on this thread until duration seconds have passed or stop() is called"""
+        self.__prepare()
+        self._running = True
+        self._wake.clear()
+        try:
+            self.__loop(duration)
+        finally:
+            self._running = False
+            if self._thread is None:
+                self.__release()
+
+    def start(self):
+        """Starts rendering and sending frames on a background thread"""
+        if self._thread is not None:
+            return
+        self.__prepare()
+        self._running = True
+        self._wake.clear()
+        self._thread = threading.Thread(target=self.__run_background, name="nanoleaf-renderer", daemon=True)
+        self._thread.start()
+
+    def __run_background(self):
+        try:
+            self.__loop()
+        except Exception as e:
+            # Keep the error for the caller instead of losing it with the thread
+            self.last_error = e
+        finally:
+            self._running = False
+
+    def stop(self):
+        """Stops rendering, shuts the worker processes down and releases the shared memory"""
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.__release()
@@ -0,0 +1,123 @@
+import threading
+import time
+from .state import merge_state
+
+# Coalesces rapid state writes into rate-limited requests
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+DEFAULT_RATE = 10
+
+
+class StateScheduler(object):
+    def __init__(self, send, max_rate: float = DEFAULT_RATE):
+        """Collects state changes and sends them with send(data) at most max_rate times per second.
+
+        Changes made while waiting are merged into one payload, so superseded values are never sent.
+        Sending happens on a background thread, always in order."""
+        self.send = send
+        self.max_rate = max_rate
+        self.last_error = None
+        self._pending = {}
+        self._ramps = {}
+        self._last_sent = 0.0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = threading.Thread(target=self.__run, name="nanoleaf-scheduler", daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return "<StateScheduler(" + str(self.max_rate) + " Hz)>"
+
+    @property
+    def pending(self) -> dict:
+        """Returns a copy of the state changes waiting to be sent"""
+        with self._condition:
+            return dict(self._pending)
+
+    def submit(self, data: dict):
+        """Queues a state payload, merging it with anything not sent yet.
+
+        Setting an attribute directly cancels any ramp running on it."""
+        with self._condition:
+            for key in data:
+                self._ramps.pop(key, None)
+            merge_state(self._pending, data)
+            self._condition.notify()
+
+    def ramp(self, attribute: str, start, target, duration: float):
+        """Moves a state attribute (e.g. "hue") from start to target over duration seconds.
+
+        Intermediate values are sent at max_rate."""
+        with self._condition:
+            self._ramps[attribute] = (start, target, time.monotonic(), duration)
+            self._condition.notify()
+
+    def cancel(self, attributes):
+        """Stops the ramps on the given attributes and drops their pending values.
+
+        Waits for a send that is already in flight, so a write made afterwards is never overtaken by a ramp step."""
+        with self._send_lock:
+            with self._condition:
+                for attribute in attributes:
+                    self._ramps.pop(attribute, None)
+                    self._pending.pop(attribute, None)
+
+    def raise_error(self):
+        """Raises the error from the last failed background send, once"""
+        error, self.last_error = self.last_error, None
+        if error is not None:
+            raise error
+
+    def flush(self):
+        """Sends any pending changes right away, in the calling thread"""
+        with self._send_lock:
+            with self._condition:
+                data = self._take()
+            if data:
+                self.send(data)
+
+    def close(self):
+        """Sends any pending changes and stops the background thread"""
+        with self._condition:
+            self._closed = True
+            self._ramps.clear()
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _take(self) -> dict:
+        # Must be called with the condition held
+        now = time.monotonic()
+        for attribute, (start, target, started, duration) in list(self._ramps.items()):
+            progress = 1.0 if duration <= 0 else min((now - started) / duration, 1.0)
+            merge_state(self._pending, {attribute: {"value": int(round(start + (target - start) * progress))}})
+            if progress >= 1.0:
+                del self._ramps[attribute]
+        data = self._pending
+        self._pending = {}
+        return data
+
+    def __run(self):
+        interval = 1.0 / self.max_rate
+        while True:
+            with self._condition:
+                while not self._closed and not self._pending and not self._ramps:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                # Wait out the rate limit; changes arriving meanwhile are merged into this send
+                delay = self._last_sent + interval - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+            with self._send_lock:
+                with self._condition:
+                    data = self._take()
+                self._last_sent = time.monotonic()
+                if data:
+                    try:
+                        self.send(data)
+                    except Exception as e:
+                        self.last_error = e
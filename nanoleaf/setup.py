@@ -1,83 +1,42 @@
-import requests
+import json
 import socket
-import select
 import time
+from . import discovery
+from .policy import DEFAULT_TIMEOUT
+from .transport import HTTPTransport, TransportError
 
 # Setup functions for discovering and authenticating your Auroras
 # For instructions or bug reports, please visit
 # https://github.com/software-2/nanoleaf
 
 
-def find_auroras(seek_time: float = 30):
+def find_auroras(seek_time: float = 30, expected_count: int = None):
     """
     Returns a list of the IP addresses of all Auroras found on the network
     
     Discovery will take about 30 seconds by default.
     If your Auroras are not found, try increasing the seek time to 90 seconds.
+    If you know how many Auroras you have, pass expected_count to return as soon as they are all found.
     """
-    SSDP_IP = "239.255.255.250"
-    SSDP_PORT = 1900
-    SSDP_MX = 3
-    SSDP_ST = "nanoleaf_aurora:light"
-
-    req = ['M-SEARCH * HTTP/1.1',
-           'HOST: ' + SSDP_IP + ':' + str(SSDP_PORT),
-           'MAN: "ssdp:discover"',
-           'ST: ' + SSDP_ST,
-           'MX: ' + str(SSDP_MX)]
-    req = '\r\n'.join(req).encode('utf-8')
-
     aurora_locations = []
-    broken_auroras = []
 
-    def get_deviceid(r):
-        for line in r.split("\n"):
-            if "deviceid:" in line:
-                return line.replace("nl-deviceid:", "").strip()
-    
-    def check_if_new_aurora(r):
-        if SSDP_ST not in r:
-            return
-        for line in r.split("\n"):
-            if "Location:" in line:
-                new_location = line.replace("Location:", "").strip() \
-                                  .replace("http://", "") \
-                                  .replace(":16021", "")
-                if new_location not in aurora_locations:
-                    # BUG: As of firmware 2.1.0, the Aurora's Location may not include an IP address.
-                    if new_location == "":
-                        broken = get_deviceid(r)
-                        if broken not in broken_auroras:
-                            broken_auroras.append(broken)
-                            print("New Aurora found (deviceid: " + broken + "). But the device does not have an IP address.")
-                        return
-                    aurora_locations.append(new_location)
-                    print("New Aurora found at " + new_location + " - deviceid:" + get_deviceid(r))
-                return
-
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, SSDP_MX)
-    sock.bind((socket.gethostname(), 9090))
-    sock.sendto(req, (SSDP_IP, SSDP_PORT))
-    sock.setblocking(False)
-
-    timeout = time.time() + seek_time
-    print("Starting discovery. This will continue for " + str(seek_time) + " seconds.")
-    while time.time() < timeout:
-        try:
-            ready = select.select([sock], [], [], 5)
-            if ready[0]:
-                response = sock.recv(1024).decode("utf-8")
-                check_if_new_aurora(response)
-        except socket.error as err:
-            print("Socket error while discovering SSDP devices!")
-            print(err)
-            print("If you are sure your network connection is working, "
-                  "please post an issue on the GitHub page: https://github.com/software-2/nanoleaf/issues")
-            print("Please include as much information as possible, including your OS, "
-                  "how your computer is connected to your network, etc.")
-            sock.close()
-            break
+    print("Starting discovery. This will continue for up to " + str(seek_time) + " seconds.")
+    try:
+        for aurora in discovery.discover(seek_time, expected_count=expected_count):
+            # BUG: As of firmware 2.1.0, the Aurora's Location may not include an IP address.
+            if aurora.ip_address is None:
+                print("New Aurora found (deviceid: " + str(aurora.device_id) + "). "
+                      "But the device does not have an IP address.")
+                continue
+            aurora_locations.append(aurora.ip_address)
+            print("New Aurora found at " + aurora.ip_address + " - deviceid:" + str(aurora.device_id))
+    except socket.error as err:
+        print("Socket error while discovering SSDP devices!")
+        print(err)
+        print("If you are sure your network connection is working, "
+              "please post an issue on the GitHub page: https://github.com/software-2/nanoleaf/issues")
+        print("Please include as much information as possible, including your OS, "
+              "how your computer is connected to your network, etc.")
 
     if len(aurora_locations) == 0:
         print("Discovery complete, but no Auroras found!")
@@ -86,18 +45,24 @@ def find_auroras(seek_time: float = 30):
     return aurora_locations
 
 
-def generate_auth_token(ip_address: str):
+def generate_auth_token(ip_address: str, port: int = 16021, timeout=DEFAULT_TIMEOUT):
     """
     Generates an auth token for the Aurora at the given IP address. 
     
     You must first press and hold the power button on the Aurora for about 5-7 seconds, 
     until the white LED flashes briefly.
     """
-    url = "http://" + ip_address + ":16021/api/v1/new"
-    r = requests.post(url)
+    transport = HTTPTransport(ip_address, port)
+    try:
+        r = transport.request("POST", "/api/v1/new", timeout=timeout)
+    except TransportError as e:
+        print("Could not reach the Aurora at " + ip_address + ": " + str(e))
+        return None
+    finally:
+        transport.close()
     if r.status_code == 200:
-        print("Auth token for " + ip_address + " successfully generated!  " + str(r.json()))
-        return r.json()['auth_token']
+        print("Auth token for " + ip_address + " successfully generated!  " + r.text)
+        return json.loads(r.text)['auth_token']
     if r.status_code == 401:
         print("Not Authorized! I don't even know how this happens. "
               "Please post an issue on the GitHub page: https://github.com/software-2/nanoleaf/issues")
@@ -106,3 +71,78 @@ def generate_auth_token(ip_address: str):
     if r.status_code == 422:
         print("Unprocessable Entity! I'm blaming your network on this one.")
     return None
+
+
+def _format_address(address: tuple) -> str:
+    return address[0] + ":" + str(address[1])
+
+
+def generate_auth_tokens(auroras, deadline: float = 120, interval: float = 1, timeout: float = 2,
+                         max_workers: int = 32) -> dict:
+    """
+    Generates auth tokens for many Auroras at once. Returns a dict of {(ip_address, port): auth_token}.
+
+    auroras - IP addresses, (ip_address, port) pairs or discovery.DiscoveredAurora objects
+    deadline - Seconds to keep trying before giving up on the devices that haven't paired
+    interval - Seconds between requests to each device
+    timeout - Seconds to wait for each request
+
+    Every device is asked for a token concurrently, over and over, so you can walk from one Aurora to the next
+    holding down the power buttons. Devices pair as soon as their pairing window opens.
+    Devices are told apart by address and port, so several can share one IP address.
+    The result can be passed straight to AuroraGroup(tokens.items()). For single Auroras, unpack each address:
+    [Aurora(ip_address, token, port=port) for (ip_address, port), token in tokens.items()]
+    """
+    pending = []
+    for aurora in auroras:
+        if isinstance(aurora, discovery.DiscoveredAurora):
+            if aurora.ip_address is not None:
+                pending.append((aurora.ip_address, aurora.port))
+        elif isinstance(aurora, (tuple, list)):
+            pending.append((aurora[0], aurora[1]))
+        else:
+            pending.append((aurora, 16021))
+    pending = dict.fromkeys(pending)
+    tokens = {}
+    if not pending:
+        return tokens
+
+    from concurrent.futures import ThreadPoolExecutor
+    workers = max(1, min(max_workers, len(pending)))
+    # One keep-alive connection per device, reused by every poll
+    transports = {address: HTTPTransport(*address) for address in pending}
+
+    def request_token(address: tuple):
+        try:
+            # Never wait past the deadline for a device that isn't answering
+            r = transports[address].request("POST", "/api/v1/new",
+                                               timeout=max(0.1, min(timeout, end - time.monotonic())))
+            # 403 means the pairing window isn't open yet
+            return json.loads(r.text)["auth_token"] if r.status_code == 200 else None
+        except (TransportError, ValueError, KeyError):
+            return None
+
+    print("Hold the power button on each Aurora for 5-7 seconds. Waiting up to " + str(deadline) + " seconds for "
+          + str(len(pending)) + " Auroras.")
+    end = time.monotonic() + deadline
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending and time.monotonic() < end:
+                started = time.monotonic()
+                addresses = list(pending)
+                for address, token in zip(addresses, executor.map(request_token, addresses)):
+                    if token is not None:
+                        tokens[address] = token
+                        del pending[address]
+                        print("Auth token for " + _format_address(address) + " successfully generated! ("
+                              + str(len(tokens)) + " done, " + str(len(pending)) + " to go)")
+                if pending:
+                    time.sleep(max(0, min(interval - (time.monotonic() - started), end - time.monotonic())))
+    finally:
+        # Also when interrupted with Ctrl+C while waiting for the devices
+        for transport in transports.values():
+            transport.close()
+    if pending:
+        print("Gave up on " + str(len(pending)) + " Auroras that never opened their pairing window: "
+              + ", ".join(_format_address(address) for address in pending))
+    return tokens
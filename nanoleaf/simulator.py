@@ -0,0 +1,552 @@
+import argparse
+import copy
+import json
+import queue
+import random
+import secrets
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from . import discovery
+from .state import STATE_RANGES
+
+# Local stand-in for Aurora devices, for benchmarks and offline testing
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+#
+# Run a few devices from the command line with:
+#     python -m nanoleaf.simulator --devices 3 --panels 12
+
+_RESERVED_EFFECTS = ["*Static*", "*Dynamic*", "*Solid*"]
+
+# State event attribute ids, matching the events endpoint
+_STATE_EVENT_IDS = {"on": 1, "brightness": 2, "hue": 3, "sat": 4, "ct": 5}
+
+
+def _panel_layout(panel_count: int, side_length: int = 150) -> list:
+    """Lays out triangular panels in rows of 10, alternating up and down like a real Aurora strip"""
+    positions = []
+    height = int(round(side_length * 3 ** 0.5 / 2))
+    for i in range(panel_count):
+        row, column = divmod(i, 10)
+        upside_down = (column + row) % 2 == 1
+        positions.append({"panelId": i + 1,
+                          "x": column * side_length // 2,
+                          "y": row * height + (height // 3 if upside_down else 0),
+                          "o": 60 if upside_down else 0})
+    return positions
+
+
+def _ranged(value: int, key: str) -> dict:
+    low, high = STATE_RANGES[key]
+    return {"value": value, "max": high, "min": low}
+
+
+def _default_effect(name: str) -> dict:
+    return {"animName": name, "animType": "random", "colorType": "HSB", "animData": None,
+            "palette": [{"hue": random.randint(0, 360), "saturation": 100, "brightness": 100}
+                        for _ in range(3)],
+            "brightnessRange": {"minValue": 25, "maxValue": 100},
+            "transTime": {"minValue": 25, "maxValue": 100},
+            "delayTime": {"minValue": 25, "maxValue": 100},
+            "loop": True}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AuroraSimulator"
+    # Headers and body are written separately; without this, Nagle's algorithm delays every body by ~40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body=None):
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request (e.g. it timed out), which is not an error here
+            self.close_connection = True
+
+    def _handle(self, method: str):
+        device = self.server.device
+        # Always consume the body so the connection can be reused, even for requests that fail
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        status, body = device._before_request()
+        if status is not None:
+            self._reply(status, body)
+            return
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts[:2] != ["api", "v1"]:
+            self._reply(404)
+            return
+        parts = parts[2:]
+        if parts == ["new"] and method == "POST":
+            self._reply(*device._new_token())
+            return
+        if not parts or parts[0] not in device.tokens:
+            self._reply(401)
+            return
+        token, path = parts[0], parts[1:]
+        if method == "GET" and path == ["events"]:
+            self._stream_events(self.path.partition("id=")[2])
+            return
+        try:
+            data = json.loads(raw.decode("utf-8")) if raw else {}
+        except ValueError:
+            self._reply(400)
+            return
+        self._reply(*device._dispatch(method, token, path, data))
+
+    def _stream_events(self, ids: str):
+        wanted = {int(i) for i in ids.split(",") if i.strip().isdigit()}
+        subscriber = self.server.device._subscribe()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while self.server.device.running:
+                try:
+                    event_type, events = subscriber.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if event_type not in wanted:
+                    continue
+                message = "id: " + str(event_type) + "\ndata: " + json.dumps({"events": events}) + "\n\n"
+                self.wfile.write(message.encode("utf-8"))
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.server.device._unsubscribe(subscriber)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class SimulatedAurora(object):
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, panel_count: int = 9, auth_token: str = None,
+                 latency: float = 0, jitter: float = 0, error_rate: float = 0, error_codes=(500,),
+                 device_id: str = None, effect_count: int = 5, firmware: str = "2.2.0"):
+        """A fake Aurora that serves the OpenAPI over HTTP on the given host and port.
+
+        port - 0 picks a free port; read the chosen one from the port attribute
+        panel_count - Number of panels in the simulated layout
+        auth_token - Token accepted by the API. One is generated if not given
+        latency - Seconds added to every request, plus up to jitter seconds more
+        error_rate - Chance (0-1) that a request fails with one of error_codes instead"""
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.device_id = device_id or ":".join("%02X" % random.randint(0, 255) for _ in range(6))
+        self.tokens = {auth_token or secrets.token_hex(16)}
+        self.pairing = False
+        self.request_count = 0
+        self.frames_received = 0
+        self.running = False
+        self._forced_errors = []
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._stream_sock = None
+        self._effects = {name: _default_effect(name)
+                         for name in ["Effect " + str(i + 1) for i in range(effect_count)]}
+        first_effect = next(iter(self._effects), "*Solid*")
+        self.info = {
+            "name": "Simulated Aurora",
+            "serialNo": "S" + self.device_id.replace(":", ""),
+            "manufacturer": "Nanoleaf",
+            "firmwareVersion": firmware,
+            "model": "NL22",
+            "state": {"on": {"value": True},
+                      "brightness": _ranged(100, "brightness"),
+                      "hue": _ranged(0, "hue"),
+                      "sat": _ranged(0, "sat"),
+                      "ct": _ranged(4000, "ct"),
+                      "colorMode": "effect"},
+            "effects": {"select": first_effect, "effectsList": list(self._effects)},
+            "panelLayout": {"layout": {"numPanels": panel_count, "sideLength": 150,
+                                       "positionData": _panel_layout(panel_count)},
+                            "globalOrientation": {"value": 0, "max": 360, "min": 0}},
+            "rhythm": {"rhythmConnected": False}
+        }
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.device = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def __repr__(self):
+        return "<SimulatedAurora(" + self.host + ":" + str(self.port) + ")>"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def auth_token(self) -> str:
+        """Returns one of the auth tokens the device accepts"""
+        return next(iter(self.tokens))
+
+    def start(self):
+        """Starts serving on a background thread"""
+        self.running = True
+        # A short poll interval lets stop() return right away instead of after up to half a second
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="nanoleaf-simulator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops serving and closes every socket"""
+        self.running = False
+        self._server.shutdown()
+        self._server.server_close()
+        if self._stream_sock is not None:
+            self._stream_sock.close()
+            self._stream_sock = None
+
+    def aurora(self, **kwargs):
+        """Returns an Aurora connected to this device. Keyword arguments are passed on to Aurora."""
+        from .aurora import Aurora
+        return Aurora(self.host, self.auth_token, port=self.port, **kwargs)
+
+    def fail_next(self, status: int, count: int = 1):
+        """Makes the next count requests fail with the given status code"""
+        with self._lock:
+            self._forced_errors.extend([status] * count)
+
+    ###########################################
+    # Request handling
+    ###########################################
+
+    def _before_request(self):
+        with self._lock:
+            self.request_count += 1
+            forced = self._forced_errors.pop(0) if self._forced_errors else None
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if forced is not None:
+            return forced, None
+        if self.error_rate and random.random() < self.error_rate:
+            return random.choice(self.error_codes), None
+        return None, None
+
+    def _new_token(self):
+        if not self.pairing:
+            return 403, None
+        token = secrets.token_hex(16)
+        with self._lock:
+            self.tokens.add(token)
+        return 200, {"auth_token": token}
+
+    def _dispatch(self, method: str, token: str, path: list, data):
+        with self._lock:
+            if method == "DELETE" and not path:
+                self.tokens.discard(token)
+                return 204, None
+            if method == "GET":
+                node = self.info
+                for key in path:
+                    if not isinstance(node, dict) or key not in node:
+                        return 404, None
+                    node = node[key]
+                return 200, copy.deepcopy(node)
+            if method == "PUT" and path == ["state"]:
+                return self._put_state(data)
+            if method == "PUT" and path == ["effects"]:
+                return self._put_effects(data)
+            if method == "PUT" and path == ["identify"]:
+                return 204, None
+            if method == "PUT" and path == ["panelLayout"]:
+                return self._put_layout(data)
+        return 404, None
+
+    def _put_state(self, data: dict):
+        if not isinstance(data, dict):
+            return 400, None
+        state = self.info["state"]
+        changes = []
+        for key, change in data.items():
+            if key == "on":
+                value = change.get("value") if isinstance(change, dict) else change
+                if not isinstance(value, bool):
+                    return 422, None
+                state["on"]["value"] = value
+            elif key in STATE_RANGES and isinstance(change, dict):
+                low, high = STATE_RANGES[key]
+                if "value" in change:
+                    value = change["value"]
+                    if not isinstance(value, (int, float)) or not low <= value <= high:
+                        return 422, None
+                elif "increment" in change:
+                    value = min(max(state[key]["value"] + change["increment"], low), high)
+                else:
+                    return 422, None
+                state[key]["value"] = value
+                if key in ("hue", "sat"):
+                    state["colorMode"] = "hs"
+                elif key == "ct":
+                    state["colorMode"] = "ct"
+            else:
+                return 400, None
+            changes.append({"attr": _STATE_EVENT_IDS[key], "value": state[key]["value"]})
+        self._publish(1, changes)
+        return 204, None
+
+    def _put_layout(self, data: dict):
+        orientation = data.get("globalOrientation") if isinstance(data, dict) else None
+        if not isinstance(orientation, dict) or not 0 <= orientation.get("value", -1) <= 360:
+            return 422, None
+        self.info["panelLayout"]["globalOrientation"]["value"] = orientation["value"]
+        self._publish(2, [{"attr": 2, "value": orientation["value"]}])
+        return 204, None
+
+    def _select(self, name: str):
+        self.info["effects"]["select"] = name
+        self.info["state"]["colorMode"] = "effect"
+        self._publish(3, [{"attr": 1, "value": name}])
+
+    def _put_effects(self, data: dict):
+        if not isinstance(data, dict):
+            return 400, None
+        if "select" in data:
+            if data["select"] not in self._effects and data["select"] not in _RESERVED_EFFECTS:
+                return 404, None
+            self._select(data["select"])
+            return 204, None
+        write = data.get("write")
+        if not isinstance(write, dict):
+            return 400, None
+        command = write.get("command")
+        name = write.get("animName")
+        if command == "request":
+            if name not in self._effects:
+                return 404, None
+            return 200, copy.deepcopy(self._effects[name])
+        if command == "requestAll":
+            return 200, {"animations": copy.deepcopy(list(self._effects.values()))}
+        if command == "delete":
+            if self._effects.pop(name, None) is None:
+                return 404, None
+            self.info["effects"]["effectsList"].remove(name)
+            return 204, None
+        if command == "rename":
+            if name not in self._effects or not write.get("newName"):
+                return 404, None
+            effect = self._effects.pop(name)
+            effect["animName"] = write["newName"]
+            self._effects[write["newName"]] = effect
+            self.info["effects"]["effectsList"] = list(self._effects)
+            if self.info["effects"]["select"] == name:
+                self.info["effects"]["select"] = write["newName"]
+            return 204, None
+        if command in ("add", "display"):
+            if write.get("animType") == "extControl":
+                return self._start_stream(write.get("extControlVersion", "v1"))
+            if not name or "animType" not in write:
+                return 422, None
+            if command == "add":
+                effect = {key: value for key, value in write.items() if key != "command"}
+                self._effects[name] = effect
+                self.info["effects"]["effectsList"] = list(self._effects)
+            self._select(name)
+            return 204, None
+        return 400, None
+
+    def _start_stream(self, version: str):
+        if self._stream_sock is None:
+            self._stream_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._stream_sock.bind((self.host, 0))
+            threading.Thread(target=self.__receive_frames, args=(self._stream_sock,),
+                             name="nanoleaf-simulator-stream", daemon=True).start()
+        self.info["state"]["colorMode"] = "effect"
+        self.info["effects"]["select"] = "*ExtControl*"
+        if version == "v1":
+            return 200, {"streamControlIpAddr": self.host,
+                         "streamControlPort": self._stream_sock.getsockname()[1],
+                         "streamControlProtocol": "udp"}
+        return 204, None
+
+    def __receive_frames(self, sock: socket.socket):
+        while True:
+            try:
+                sock.recv(65535)
+            except OSError:
+                return
+            with self._lock:
+                self.frames_received += 1
+
+    ###########################################
+    # Event subscriptions
+    ###########################################
+
+    def _subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def _unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _publish(self, event_type: int, events: list):
+        # Called with the lock held
+        if events:
+            for subscriber in self._subscribers:
+                subscriber.put((event_type, events))
+
+
+class SSDPResponder(object):
+    def __init__(self, devices: list, host: str = "127.0.0.1", port: int = 0):
+        """Answers SSDP M-SEARCH requests on behalf of simulated devices.
+
+        Bind to ("", 1900) to answer real multicast searches, or leave the defaults and pass
+        ssdp_address=responder.address to discovery.discover() to search it directly."""
+        self.devices = list(devices)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        if port == discovery.SSDP_PORT:
+            membership = socket.inet_aton(discovery.SSDP_IP) + socket.inet_aton("0.0.0.0")
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        self.address = self._sock.getsockname()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Starts answering on a background thread"""
+        self._thread = threading.Thread(target=self.__run, name="nanoleaf-ssdp", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops answering and closes the socket"""
+        self._sock.close()
+
+    def __run(self):
+        while True:
+            try:
+                data, address = self._sock.recvfrom(4096)
+            except OSError:
+                return
+            if b"M-SEARCH" not in data or discovery.SSDP_ST.encode("utf-8") not in data:
+                continue
+            for device in self.devices:
+                response = ["HTTP/1.1 200 OK",
+                            "Cache-Control: max-age=60",
+                            "Ext:",
+                            "ST: " + discovery.SSDP_ST,
+                            "Location: http://" + device.host + ":" + str(device.port),
+                            "nl-deviceid: " + device.device_id,
+                            "nl-devicename: " + device.info["name"]]
+                try:
+                    self._sock.sendto(("\r\n".join(response) + "\r\n\r\n").encode("utf-8"), address)
+                except OSError:
+                    return
+
+
+class SimulatedFleet(object):
+    def __init__(self, count: int, host: str = "127.0.0.1", ssdp: bool = True, **kwargs):
+        """Runs many SimulatedAuroras, each on its own port, plus an SSDP responder for all of them.
+
+        Any other keyword arguments are passed on to every SimulatedAurora."""
+        self.devices = [SimulatedAurora(host=host, **kwargs) for _ in range(count)]
+        self.ssdp = SSDPResponder(self.devices, host=host) if ssdp else None
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Starts every device and the SSDP responder"""
+        for device in self.devices:
+            device.start()
+        if self.ssdp is not None:
+            self.ssdp.start()
+
+    def stop(self):
+        """Stops every device and the SSDP responder"""
+        if self.ssdp is not None:
+            self.ssdp.stop()
+        for device in self.devices:
+            device.stop()
+
+    def auroras(self, **kwargs) -> list:
+        """Returns an Aurora for every device. Keyword arguments are passed on to Aurora."""
+        return [device.aurora(**kwargs) for device in self.devices]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run simulated Nanoleaf Aurora devices.")
+    parser.add_argument("--devices", type=int, default=1, help="number of devices to simulate")
+    parser.add_argument("--panels", type=int, default=9, help="number of panels per device")
+    parser.add_argument("--host", default="127.0.0.1", help="address to serve on")
+    parser.add_argument("--port", type=int, default=0, help="port of the first device (0 picks free ports)")
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0, help="chance (0-1) that a request fails")
+    parser.add_argument("--pairing", action="store_true", help="accept new auth token requests")
+    args = parser.parse_args()
+
+    devices = []
+    for i in range(args.devices):
+        port = args.port + i if args.port else 0
+        device = SimulatedAurora(args.host, port, panel_count=args.panels, latency=args.latency,
+                                 error_rate=args.error_rate)
+        device.pairing = args.pairing
+        device.start()
+        devices.append(device)
+        print(device.host + ":" + str(device.port) + " deviceid=" + device.device_id
+              + " token=" + device.auth_token)
+    responder = SSDPResponder(devices, args.host)
+    responder.start()
+    print("SSDP responder at " + responder.address[0] + ":" + str(responder.address[1]))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    responder.stop()
+    for device in devices:
+        device.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import copy
+import time
+
+# Local snapshot of an Aurora's state, used to answer reads without a request
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+# Endpoints whose values can be served from the snapshot returned by the root info request
+CACHED_PREFIXES = ("state", "panelLayout", "effects")
+
+# Attributes of the state endpoint that change the color mode when written
+_COLOR_MODES = {"hue": "hs", "sat": "hs", "ct": "ct"}
+
+# Event type ids used by the events endpoint
+STATE_EVENT = 1
+LAYOUT_EVENT = 2
+EFFECTS_EVENT = 3
+TOUCH_EVENT = 4
+
+# State event attribute ids and the state attribute each one updates
+_STATE_EVENT_ATTRIBUTES = {1: "on", 2: "brightness", 3: "hue", 4: "sat", 5: "ct"}
+
+# Valid range of each numeric state attribute
+STATE_RANGES = {"brightness": (0, 100), "hue": (0, 360), "sat": (0, 100), "ct": (1200, 6500)}
+
+
+def merge_state(pending: dict, change: dict) -> dict:
+    """Merges a state payload into a pending one so both can be sent as a single request.
+
+    Later values replace earlier ones, increments add up, and an increment after a value
+    is folded into that value. Returns pending, which is modified in place."""
+    for key, update in change.items():
+        current = pending.get(key)
+        if not isinstance(update, dict) or not isinstance(current, dict) or "value" in update:
+            pending[key] = dict(update) if isinstance(update, dict) else update
+            continue
+        merged = dict(current)
+        if "increment" in update:
+            if "value" in merged:
+                low, high = STATE_RANGES.get(key, (float("-inf"), float("inf")))
+                merged["value"] = min(max(merged["value"] + update["increment"], low), high)
+            else:
+                merged["increment"] = merged.get("increment", 0) + update["increment"]
+        if "duration" in update:
+            merged["duration"] = update["duration"]
+        pending[key] = merged
+    return pending
+
+
+def build_state(on: bool = None, brightness=None, hue=None, saturation=None, color_temperature=None,
+                brightness_increment=None, hue_increment=None, saturation_increment=None,
+                color_temperature_increment=None, duration=None) -> dict:
+    """Validates any combination of state values and increments and returns them as one state payload.
+
+    Raises ValueError for out of range values, or a value and an increment for the same attribute."""
+    data = {}
+    if on is not None:
+        data["on"] = {"value": bool(on)}
+    fields = (("brightness", brightness, brightness_increment),
+              ("hue", hue, hue_increment),
+              ("sat", saturation, saturation_increment),
+              ("ct", color_temperature, color_temperature_increment))
+    for key, value, increment in fields:
+        if value is not None and increment is not None:
+            raise ValueError("Can't set both a value and an increment for " + key)
+        if value is not None:
+            low, high = STATE_RANGES[key]
+            if not low <= value <= high:
+                raise ValueError(key + " value out of range! (" + str(low) + "-" + str(high) + ")")
+            data[key] = {"value": value}
+        elif increment is not None:
+            data[key] = {"increment": increment}
+    if duration is not None:
+        if "brightness" not in data:
+            raise ValueError("A duration can only be used with a brightness change")
+        data["brightness"]["duration"] = duration
+    return data
+
+
+class StateCache(object):
+    """Holds the last full info dump of a device for a limited time.
+
+    ttl - Seconds a snapshot stays valid. 0 disables caching."""
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+        self._info = None
+        self._expires = 0.0
+
+    @property
+    def fresh(self) -> bool:
+        """Returns True if a snapshot is held and it has not expired yet"""
+        return self._info is not None and time.monotonic() < self._expires
+
+    @property
+    def snapshot(self) -> dict:
+        """Returns the raw snapshot, or None if nothing is held"""
+        return self._info
+
+    def store(self, info: dict):
+        """Replaces the snapshot with a copy of a new info dump and restarts the TTL.
+
+        The caller keeps the original, so writes applied to the snapshot later never change it."""
+        if self.ttl <= 0 or not isinstance(info, dict):
+            return
+        self._info = copy.deepcopy(info)
+        self._expires = time.monotonic() + self.ttl
+
+    def invalidate(self):
+        """Drops the snapshot so the next read goes to the device"""
+        self._info = None
+        self._expires = 0.0
+
+    def lookup(self, endpoint: str):
+        """Resolves an endpoint path (e.g. "state/hue/value") against the snapshot.
+
+        Returns a (found, value) tuple. Lists and dicts are copied so callers can't corrupt the snapshot."""
+        if not self.fresh or not endpoint.startswith(CACHED_PREFIXES):
+            return False, None
+        node = self._info
+        for key in endpoint.strip("/").split("/"):
+            if not isinstance(node, dict) or key not in node:
+                return False, None
+            node = node[key]
+        if isinstance(node, (dict, list)):
+            node = copy.deepcopy(node)
+        return True, node
+
+    def apply(self, endpoint: str, data: dict):
+        """Writes a successful PUT through to the snapshot.
+
+        Anything that can't be applied exactly (increments, effect writes) drops the snapshot instead."""
+        if self.ttl <= 0 or self._info is None or not isinstance(data, dict):
+            return
+        if endpoint == "state":
+            self._apply_state(data)
+        elif endpoint == "effects":
+            self._apply_effects(data)
+
+    def _apply_state(self, data: dict):
+        state = self._info.get("state")
+        if not isinstance(state, dict):
+            self.invalidate()
+            return
+        for key, change in data.items():
+            if key == "on":
+                # The on attribute accepts both {"on": True} and {"on": {"value": True}}
+                if isinstance(change, dict):
+                    change = change.get("value")
+                state.setdefault("on", {})["value"] = change
+                continue
+            if not isinstance(change, dict) or "value" not in change:
+                self.invalidate()
+                return
+            state.setdefault(key, {})["value"] = change["value"]
+            if key in _COLOR_MODES:
+                state["colorMode"] = _COLOR_MODES[key]
+
+    def _apply_effects(self, data: dict):
+        effects = self._info.get("effects")
+        if "select" in data and isinstance(effects, dict):
+            effects["select"] = data["select"]
+            state = self._info.get("state")
+            if isinstance(state, dict):
+                state["colorMode"] = "effect"
+        if "write" in data and data["write"].get("command") not in ("request", "requestAll"):
+            self.invalidate()
+
+    def apply_event(self, event_type: int, events: list):
+        """Applies the attribute changes pushed by the events endpoint to the snapshot"""
+        if self._info is None:
+            return
+        for event in events:
+            attribute = event.get("attr")
+            value = event.get("value")
+            if event_type == STATE_EVENT:
+                state = self._info.setdefault("state", {})
+                if attribute in _STATE_EVENT_ATTRIBUTES:
+                    state.setdefault(_STATE_EVENT_ATTRIBUTES[attribute], {})["value"] = value
+                elif attribute == 6:
+                    state["colorMode"] = value
+            elif event_type == LAYOUT_EVENT:
+                layout = self._info.setdefault("panelLayout", {})
+                if attribute == 1:
+                    layout["layout"] = value
+                elif attribute == 2:
+                    layout.setdefault("globalOrientation", {})["value"] = value
+            elif event_type == EFFECTS_EVENT and attribute == 1:
+                self._info.setdefault("effects", {})["select"] = value
@@ -0,0 +1,188 @@
+import functools
+import operator
+import socket
+import struct
+
+# Real-time per-panel control over the External Control (extControl) UDP stream
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+STREAM_PORTS = {"v1": 60221, "v2": 60222}
+
+# Frame layouts: (header format, per-panel format) for each protocol version
+# v1: nPanels, then panelId, nFrames (always 1), R, G, B, W, transitionTime - one byte each
+# v2: nPanels and panelId are 2 bytes, transitionTime is 2 bytes, all big-endian
+_FORMATS = {"v1": (struct.Struct("B"), struct.Struct("BBBBBBB")),
+            "v2": (struct.Struct(">H"), struct.Struct(">HBBBBH"))}
+
+
+@functools.lru_cache(maxsize=64)
+def _frame_struct(version: str, panel_count: int) -> struct.Struct:
+    # One struct for the whole frame, so encoding it is a single pack_into call
+    header, panel = _FORMATS[version]
+    byte_order = ">" if header.format.startswith(">") else ""
+    return struct.Struct(byte_order + header.format.lstrip(">") + panel.format.lstrip(">") * panel_count)
+
+
+def frame_size(version: str, panel_count: int) -> int:
+    """Returns the size in bytes of a frame for the given number of panels"""
+    return _frame_struct(version, panel_count).size
+
+
+def _whole(value, high: int) -> bool:
+    try:
+        return 0 <= operator.index(value) <= high
+    except TypeError:
+        return False
+
+
+def _invalid_frame(version: str, panel_ids: list, colors, transition, error: struct.error) -> ValueError:
+    """Returns a ValueError explaining why a frame couldn't be encoded"""
+    wide = 255 if version == "v1" else 65535
+    colors = list(colors)
+    if len(colors) < len(panel_ids):
+        return ValueError("Got " + str(len(colors)) + " colors for " + str(len(panel_ids)) + " panels")
+    if not _whole(transition, wide):
+        return ValueError("Transition must be a whole number from 0 to " + str(wide) + ", not " + repr(transition))
+    for panel_id, color in zip(panel_ids, colors):
+        if not _whole(panel_id, wide):
+            return ValueError("Panel id " + repr(panel_id) + " doesn't fit in a " + version + " frame")
+        for name, value in zip(("red", "green", "blue", "white"), color):
+            if not _whole(value, 255):
+                return ValueError("Panel " + str(panel_id) + " has an invalid " + name + " value " + repr(value)
+                                  + ": colors must be whole numbers from 0 to 255")
+    return ValueError("Couldn't encode the frame: " + str(error))
+
+
+def pack_frame(buffer, offset: int, version: str, panel_ids: list, colors, transition: int = 1):
+    """Encodes a whole frame into a writable buffer in one call, ready for ExtControlStream.send_packet().
+
+    colors - A sequence of (R, G, B) values (whole numbers from 0 to 255) in panel_ids order
+    Raises ValueError naming the panel if a value can't be encoded."""
+    values = [len(panel_ids)]
+    if version == "v1":
+        for panel_id, color in zip(panel_ids, colors):
+            values += (panel_id, 1, color[0], color[1], color[2], 0, transition)
+    else:
+        for panel_id, color in zip(panel_ids, colors):
+            values += (panel_id, color[0], color[1], color[2], 0, transition)
+    try:
+        _frame_struct(version, len(panel_ids)).pack_into(buffer, offset, *values)
+    except struct.error as e:
+        # Values are only checked once packing fails, so valid frames cost nothing extra
+        raise _invalid_frame(version, panel_ids, colors, transition, e) from None
+
+
+class ExtControlStream(object):
+    def __init__(self, aurora, version: str = "v1", panel_ids: list = None):
+        """Streams per-panel colors to an Aurora over UDP.
+
+        aurora - The Aurora to stream to
+        version - The extControl protocol version, "v1" (Aurora) or "v2" (newer firmware)
+        panel_ids - The panels to drive. Defaults to every panel in aurora.panel_positions"""
+        if version not in _FORMATS:
+            raise ValueError("Unknown extControl version: " + str(version))
+        self.aurora = aurora
+        self.version = version
+        if panel_ids is None:
+            panel_ids = [panel["panelId"] for panel in aurora.panel_positions or []]
+        self.panel_ids = list(panel_ids)
+        self.panel_index = {panel_id: i for i, panel_id in enumerate(self.panel_ids)}
+        self.address = None
+        self._sock = None
+
+        header, panel = _FORMATS[version]
+        self._panel = panel
+        self._buffer = bytearray(header.size + panel.size * len(self.panel_ids))
+        self._offsets = [header.size + panel.size * i for i in range(len(self.panel_ids))]
+        header.pack_into(self._buffer, 0, len(self.panel_ids))
+        for index in range(len(self.panel_ids)):
+            self.set_index(index, 0, 0, 0)
+
+    def __repr__(self):
+        return "<ExtControlStream(" + self.aurora.ip_address + ", " + self.version + ")>"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """Switches the device into extControl mode and opens the UDP socket"""
+        command = {"command": "display", "animType": "extControl"}
+        if self.version != "v1":
+            command["extControlVersion"] = self.version
+        response = self.aurora.effect_set_raw(command)
+        host = self.aurora.ip_address
+        port = STREAM_PORTS[self.version]
+        # v1 devices reply with the address to stream to, v2 always listens on a fixed port
+        if isinstance(response, dict):
+            host = response.get("streamControlIpAddr", host)
+            port = response.get("streamControlPort", port)
+        self.address = (host, port)
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.connect(self.address)
+
+    def close(self):
+        """Closes the UDP socket. The device stays on the last frame sent."""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    ###########################################
+    # Frame methods
+    ###########################################
+
+    @property
+    def frame(self) -> bytes:
+        """Returns a copy of the frame that the next send() will transmit"""
+        return bytes(self._buffer)
+
+    def set_index(self, index: int, red: int, green: int, blue: int, white: int = 0, transition: int = 1):
+        """Sets the color of the panel at the given position in panel_ids.
+
+        transition - Fade time in tenths of a second
+        Raises ValueError naming the panel if a value can't be encoded."""
+        try:
+            if self.version == "v1":
+                self._panel.pack_into(self._buffer, self._offsets[index], self.panel_ids[index], 1,
+                                      red, green, blue, white, transition)
+            else:
+                self._panel.pack_into(self._buffer, self._offsets[index], self.panel_ids[index],
+                                      red, green, blue, white, transition)
+        except struct.error as e:
+            raise _invalid_frame(self.version, [self.panel_ids[index]], [(red, green, blue, white)],
+                                 transition, e) from None
+
+    def set_panel(self, panel_id: int, red: int, green: int, blue: int, white: int = 0, transition: int = 1):
+        """Sets the color of the panel with the given panelId.
+
+        transition - Fade time in tenths of a second"""
+        self.set_index(self.panel_index[panel_id], red, green, blue, white, transition)
+
+    def set_frame(self, colors, transition: int = 1):
+        """Sets the color of every panel from a sequence of (R, G, B) or (R, G, B, W) values in panel_ids order"""
+        for index, color in enumerate(colors):
+            white = color[3] if len(color) > 3 else 0
+            self.set_index(index, color[0], color[1], color[2], white, transition)
+
+    def set_all(self, red: int, green: int, blue: int, white: int = 0, transition: int = 1):
+        """Sets every panel to the same color"""
+        for index in range(len(self.panel_ids)):
+            self.set_index(index, red, green, blue, white, transition)
+
+    def send(self):
+        """Sends the current frame to the device"""
+        if self._sock is None:
+            self.start()
+        self._sock.send(self._buffer)
+
+    def send_packet(self, packet):
+        """Sends a frame that was already encoded, e.g. by pack_frame(), instead of the current frame"""
+        if self._sock is None:
+            self.start()
+        self._sock.send(packet)
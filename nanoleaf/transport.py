@@ -0,0 +1,170 @@
+import http.client
+import json
+import select
+import socket
+import threading
+
+# HTTP transports used by Aurora to talk to the device
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+# Errors meaning a kept-alive connection was closed by the device while it sat idle
+_STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+# Methods that are safe to send again when a kept-alive connection fails part way through
+_REPEATABLE_METHODS = ("GET", "HEAD")
+
+
+class TransportError(Exception):
+    """The request didn't get an answer from the device"""
+
+
+class Response(object):
+    __slots__ = ("status_code", "content", "bytes_sent")
+
+    def __init__(self, status_code: int, content: bytes, bytes_sent: int = 0):
+        """The answer to one request: its status code, raw body and the size of the request body sent"""
+        self.status_code = status_code
+        self.content = content
+        self.bytes_sent = bytes_sent
+
+    def __repr__(self):
+        return "<Response(" + str(self.status_code) + ")>"
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+
+def _dropped(connection: http.client.HTTPConnection) -> bool:
+    """Returns True if an idle connection was closed by the device (its socket is readable: at EOF)"""
+    if connection.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([connection.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+def _split_timeout(timeout) -> tuple:
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+class HTTPTransport(object):
+    def __init__(self, host: str, port: int, pool_size: int = 1):
+        """Sends requests with the standard library's http.client over keep-alive connections.
+
+        Much cheaper to import than requests, and all the device's JSON API needs.
+        pool_size - Number of idle connections kept open to the device"""
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<HTTPTransport(" + self.host + ":" + str(self.port) + ")>"
+
+    def __connect(self, timeout) -> http.client.HTTPConnection:
+        connect_timeout, read_timeout = _split_timeout(timeout)
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=connect_timeout)
+        connection.connect()
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection.sock.settimeout(read_timeout)
+        return connection
+
+    def __checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection = self._idle.pop()
+            if not _dropped(connection):
+                return connection
+            connection.close()
+
+    def __checkin(self, connection: http.client.HTTPConnection):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, method: str, path: str, data=None, timeout=None) -> Response:
+        """Sends one request, with data encoded as a JSON body, and returns the Response.
+
+        timeout - Seconds to wait for the device, either a single value or a (connect, read) tuple
+        Raises TransportError if the device couldn't be reached or didn't answer in time."""
+        body = None if data is None else json.dumps(data).encode("utf-8")
+        headers = {} if body is None else {"Content-Type": "application/json"}
+        while True:
+            connection = self.__checkout()
+            reused = connection is not None
+            try:
+                if connection is None:
+                    connection = self.__connect(timeout)
+                else:
+                    connection.sock.settimeout(_split_timeout(timeout)[1])
+                connection.request(method, path, body=body, headers=headers)
+                r = connection.getresponse()
+                content = r.read()
+            except (http.client.HTTPException, OSError) as e:
+                if connection is not None:
+                    connection.close()
+                if reused and isinstance(e, _STALE_ERRORS) and method in _REPEATABLE_METHODS:
+                    # The device may have closed the connection just as it was reused. Other requests
+                    # might have reached it already, so those are left to the caller's RetryPolicy.
+                    continue
+                raise TransportError(repr(e) + " (" + self.host + ")") from e
+            if r.will_close:
+                connection.close()
+            else:
+                self.__checkin(connection)
+            return Response(r.status, content, len(body) if body else 0)
+
+    def close(self):
+        """Closes every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class RequestsTransport(object):
+    def __init__(self, host: str, port: int, pool_size: int = 1):
+        """Sends requests through a requests.Session, for setups that rely on requests (e.g. its proxy support).
+
+        pool_size - Number of keep-alive connections held open to the device
+        Requires the requests package (pip install nanoleaf[requests])."""
+        try:
+            import requests
+            from requests.adapters import HTTPAdapter
+        except ImportError:
+            raise ImportError("RequestsTransport requires requests. Install it with: pip install nanoleaf[requests]")
+        self._requests = requests
+        self.base_url = "http://" + host + ":" + str(port)
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def __repr__(self):
+        return "<RequestsTransport(" + self.base_url + ")>"
+
+    def request(self, method: str, path: str, data=None, timeout=None) -> Response:
+        """Sends one request, with data encoded as a JSON body, and returns the Response.
+
+        Raises TransportError if the device couldn't be reached or didn't answer in time."""
+        try:
+            r = self._session.request(method, self.base_url + path, json=data, timeout=timeout)
+        except self._requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        return Response(r.status_code, r.content, len(r.request.body or b""))
+
+    def close(self):
+        """Closes the connections held open to the device"""
+        self._session.close()
+
+
+TRANSPORTS = {"http": HTTPTransport, "requests": RequestsTransport}
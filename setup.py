@@ -19,5 +19,11 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Programming Language :: Python :: 3'
     ],
-    install_requires=['requests']
+    extras_require={
+        'async': ['aiohttp'],
+        'requests': ['requests']
+    },
+    entry_points={
+        'console_scripts': ['nanoleaf=nanoleaf.cli:main']
+    }
 )
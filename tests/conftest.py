@@ -0,0 +1,23 @@
+import pytest
+from nanoleaf.simulator import SimulatedAurora, SimulatedFleet
+
+
+@pytest.fixture
+def device():
+    """A simulated Aurora serving on a free local port"""
+    with SimulatedAurora(panel_count=12) as device:
+        yield device
+
+
+@pytest.fixture
+def aurora(device):
+    """An Aurora connected to the simulated device"""
+    with device.aurora() as aurora:
+        yield aurora
+
+
+@pytest.fixture
+def fleet():
+    """Three simulated Auroras with an SSDP responder"""
+    with SimulatedFleet(3, panel_count=6) as fleet:
+        yield fleet
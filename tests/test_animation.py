@@ -0,0 +1,9 @@
+from nanoleaf.animation import CustomEffect
+
+
+def test_anim_data_format():
+    effect = CustomEffect("Two", panel_ids=[1, 2])
+    effect.set_frames(1, [(1, 2, 3), (4, 5, 6)], transitions=[10, 20])
+    effect.add_frame(2, (7, 8, 9), transition=5)
+    assert effect.anim_data() == "2 1 2 1 2 3 0 10 4 5 6 0 20 2 1 7 8 9 0 5"
+    assert effect.to_dict()["animType"] == "custom"
@@ -0,0 +1,14 @@
+import asyncio
+from nanoleaf.async_aurora import AsyncAurora
+
+
+def test_async_aurora(fleet):
+    async def main():
+        auroras = [AsyncAurora(device.host, device.auth_token, port=device.port) for device in fleet]
+        try:
+            await asyncio.gather(*(aurora.set_brightness(64) for aurora in auroras))
+            return await asyncio.gather(*(aurora.brightness() for aurora in auroras))
+        finally:
+            for aurora in auroras:
+                await aurora.close()
+    assert asyncio.run(main()) == [64, 64, 64]
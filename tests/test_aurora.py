@@ -0,0 +1,34 @@
+def test_state_round_trip(aurora):
+    aurora.on = False
+    aurora.brightness = 42
+    aurora.hue = 200
+    aurora.saturation = 70
+    assert aurora.on is False
+    assert aurora.brightness == 42
+    assert aurora.hue == 200
+    assert aurora.saturation == 70
+    assert aurora.color_mode == "hs"
+
+
+def test_increments_are_applied_once(aurora):
+    aurora.brightness = 50
+    aurora.brightness_raise(10)
+    aurora.brightness_lower(5)
+    assert aurora.brightness == 55
+
+
+def test_rgb(aurora):
+    aurora.rgb = "FF0000"
+    assert aurora.rgb == [255, 0, 0]
+
+
+def test_effects(device, aurora):
+    names = aurora.effects_list
+    assert names == list(device._effects)
+    aurora.effect = names[1]
+    assert aurora.effect == names[1]
+    assert aurora.effect_random() in names
+    aurora.effect_rename(names[0], "Renamed")
+    assert "Renamed" in aurora.effects_list
+    aurora.effect_delete("Renamed")
+    assert "Renamed" not in aurora.effects_list
@@ -0,0 +1,131 @@
+import json
+import socket
+import threading
+import pytest
+from nanoleaf import cli
+from nanoleaf.daemon import FleetDaemon, send
+from nanoleaf.fleet import Fleet
+from nanoleaf.registry import DeviceRegistry
+
+
+@pytest.fixture
+def registry(tmp_path, fleet):
+    path = str(tmp_path / "devices.json")
+    registry = DeviceRegistry(path)
+    for device in fleet:
+        registry.add(device.device_id, device.host, device.auth_token, port=device.port)
+    registry.save()
+    return path
+
+
+@pytest.fixture
+def daemon(tmp_path, registry):
+    path = str(tmp_path / "daemon.sock")
+    with Fleet(registry) as fleet:
+        server = FleetDaemon(fleet, path)
+        server.start()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.stop()
+        thread.join(5)
+
+
+def _run(capsys, registry, socket, *argv):
+    code = cli.main(["--registry", registry, "--socket", socket] + list(argv))
+    out, err = capsys.readouterr()
+    return code, json.loads(out) if out.strip() else None, err
+
+
+@pytest.mark.parametrize("use_daemon", [False, True])
+def test_commands(request, tmp_path, capsys, fleet, registry, use_daemon):
+    socket = request.getfixturevalue("daemon").path if use_daemon else str(tmp_path / "none.sock")
+    first = fleet.devices[0]
+
+    code, result, _ = _run(capsys, registry, socket, "set", "--on", "--brightness", "40")
+    assert code == 0 and all(device.info["state"]["brightness"]["value"] == 40 for device in fleet)
+    code, result, _ = _run(capsys, registry, socket, "set", "--brightness", "+5", "-d", first.device_id)
+    assert code == 0 and first.info["state"]["brightness"]["value"] == 45
+
+    code, result, _ = _run(capsys, registry, socket, "get", "brightness", "-d", first.device_id)
+    assert result == {first.device_id: {"brightness": 45}}
+
+    effect = list(first._effects)[2]
+    code, result, _ = _run(capsys, registry, socket, "effects", "--select", effect, "-d", first.device_id)
+    assert result == {first.device_id: effect}
+
+    code, result, err = _run(capsys, registry, socket, "effects", "--select", "Nope")
+    assert code == 1 and result is None and err.count("Error 404") == 3
+
+    scene = tmp_path / "scene.json"
+    code, _, _ = _run(capsys, registry, socket, "scene", "save", str(scene))
+    assert json.loads(scene.read_text())[first.device_id]["effect"] == effect
+    scene.write_text(json.dumps({"*": {"on": False}, first.device_id: {"on": True}}))
+    code, _, _ = _run(capsys, registry, socket, "scene", "apply", str(scene))
+    assert [device.info["state"]["on"]["value"] for device in fleet] == [True, False, False]
+
+    code, _, err = _run(capsys, registry, socket, "get", "-d", "unknown")
+    assert code == 1 and "Unknown Aurora" in err
+
+
+def test_daemon_keeps_connections(daemon, fleet):
+    for _ in range(3):
+        assert send({"command": "get", "attributes": ["on"]}, daemon.path)["ok"]
+    assert send({"command": "ping"}, daemon.path)["ok"]
+    with pytest.raises(RuntimeError):
+        FleetDaemon(None, daemon.path).start()
+
+
+def test_no_daemon(tmp_path):
+    assert send({"command": "ping"}, str(tmp_path / "missing.sock")) is None
+
+
+def test_pair_stores_each_devices_token(tmp_path, fleet):
+    registry = DeviceRegistry(str(tmp_path / "devices.json"))
+    for device in fleet:
+        device.pairing = True
+        registry.add(device.device_id, device.host, None, port=device.port)
+    registry.save()
+    with Fleet(registry.path) as manager:
+        assert sorted(manager.pair(deadline=5)["result"]) == sorted(device.device_id for device in fleet)
+    paired = {device["device_id"]: device["auth_token"] for device in DeviceRegistry(registry.path)}
+    assert all(paired[device.device_id] in device.tokens for device in fleet)
+
+
+def test_daemon_reports_errors_instead_of_running_twice(daemon, registry, capsys, monkeypatch):
+    calls = []
+
+    def broken(**arguments):
+        calls.append(arguments)
+        raise IndexError("Cannot choose from an empty sequence")
+
+    monkeypatch.setitem(daemon.fleet._commands, "effects", broken)
+    code, result, err = _run(capsys, registry, daemon.path, "effects", "--random")
+    assert code == 1 and len(calls) == 1
+    assert "Cannot choose from an empty sequence" in err
+    assert send([1, 2], daemon.path) == {"ok": False, "error": "Requests must be one JSON object per line"}
+
+
+def test_one_device_failing_is_reported(tmp_path, capsys, fleet, registry):
+    only = fleet.devices[0]
+    for name in list(only._effects)[1:]:
+        del only._effects[name]
+    only.info["effects"]["effectsList"] = list(only._effects)
+    only.info["effects"]["select"] = list(only._effects)[0]
+    code, result, err = _run(capsys, registry, str(tmp_path / "none.sock"), "effects", "--random")
+    assert code == 1
+    assert set(result) == {device.device_id for device in fleet.devices[1:]}
+    assert err.startswith(only.device_id + ": ")
+
+
+def test_daemon_hanging_up_is_an_error(tmp_path):
+    path = str(tmp_path / "silent.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    try:
+        threading.Thread(target=lambda: server.accept()[0].close(), daemon=True).start()
+        with pytest.raises(ConnectionError):
+            send({"command": "ping"}, path, timeout=5)
+    finally:
+        server.close()
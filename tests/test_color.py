@@ -0,0 +1,37 @@
+import pytest
+from nanoleaf import color
+
+
+COLORS = ["FF0000", "00ff00", "0000FF", "808080", "000000", "FFFFFF", "123456", "ABCDEF"] * 3
+
+
+def _plain(values):
+    return [list(map(int, value)) for value in values]
+
+
+def test_hex_to_rgb_paths_agree():
+    small = color.hex_to_rgb(COLORS[:4])
+    large = color.hex_to_rgb(COLORS)
+    assert small == [(255, 0, 0), (0, 255, 0), (0, 0, 255), (128, 128, 128)]
+    assert _plain(large)[:4] == _plain(small)
+
+
+def test_rgb_to_hsb_paths_agree():
+    rgb = color.hex_to_rgb(COLORS[:8])
+    one_by_one = color.rgb_to_hsb(rgb)
+    batched = color.rgb_to_hsb(rgb * 3)
+    for small, large in zip(one_by_one, batched):
+        assert list(small) == list(map(int, large))[:8]
+
+
+@pytest.mark.parametrize("count", [1, 20])
+@pytest.mark.parametrize("bad", ["XYZXYZ", "FF00", None, 5, b"FF0000", " FF000"])
+def test_invalid_hex_raises_value_error(count, bad):
+    with pytest.raises(ValueError):
+        color.hex_to_rgb(["FF0000"] * (count - 1) + [bad])
+
+
+def test_out_of_range_rgb_raises_value_error():
+    for count in (1, 20):
+        with pytest.raises(ValueError):
+            color.rgb_to_hsb([(0, 0, 0)] * (count - 1) + [(256, 0, 0)])
@@ -0,0 +1,14 @@
+from nanoleaf import discovery
+
+
+def test_discover_finds_every_device(fleet):
+    found = list(discovery.discover(3, expected_count=3, interfaces=["127.0.0.1"], ssdp_address=fleet.ssdp.address))
+    assert {aurora.device_id for aurora in found} == {device.device_id for device in fleet}
+    assert {aurora.port for aurora in found} == {device.port for device in fleet}
+
+
+def test_parse_response():
+    response = (b"HTTP/1.1 200 OK\r\nST: nanoleaf_aurora:light\r\nLocation: http://10.0.0.5:16021\r\n"
+                b"nl-deviceid: AA:BB\r\n\r\n")
+    aurora = discovery.parse_response(response)
+    assert (aurora.ip_address, aurora.port, aurora.device_id) == ("10.0.0.5", 16021, "AA:BB")
@@ -0,0 +1,77 @@
+import json
+import time
+from nanoleaf.animation import CustomEffect
+from nanoleaf.effects import EffectLibrary, effect_hash
+
+
+def test_hash_ignores_order_and_command():
+    assert effect_hash({"a": 1, "b": 2, "command": "add"}) == effect_hash({"b": 2, "a": 1})
+    assert effect_hash({"a": 1}) != effect_hash({"a": 2})
+
+
+def test_details_are_cached(device):
+    library = EffectLibrary()
+    with device.aurora(effect_library=library) as aurora:
+        names = aurora.effects_list
+        aurora.effect_details_all()
+        assert len(library) == len(names)
+        before = device.request_count
+        assert aurora.effect_details(names[0])["animName"] == names[0]
+        assert device.request_count == before
+
+
+def test_unchanged_add_only_selects(device):
+    effect = CustomEffect("Mine", static=True)
+    effect.set_frames(1, [(255, 0, 0)])
+    with device.aurora(effect_library=EffectLibrary()) as aurora:
+        aurora.effect_set_raw(effect.to_dict())
+        aurora.effect = aurora.effects_list[0]
+        before = device.request_count
+        aurora.effect_set_raw(effect.to_dict())
+        assert device.request_count == before + 1
+        assert aurora.effect == "Mine"
+
+
+def test_library_survives_restarts(tmp_path, device):
+    path = str(tmp_path / "effects.json")
+    with device.aurora(effect_library=EffectLibrary(path)) as aurora:
+        aurora.effect_details_all()
+    assert len(EffectLibrary(path)) == len(device._effects)
+
+
+def test_old_definitions_are_fetched_again(device):
+    library = EffectLibrary(max_age=0.1)
+    with device.aurora(effect_library=library) as aurora:
+        name = aurora.effects_list[0]
+        original = aurora.effect_details(name)
+        assert library.holds(original)
+        # Edited from another app under the same name
+        device._effects[name]["palette"] = [{"hue": 1, "saturation": 2, "brightness": 3}]
+        assert aurora.effect_details(name) == original
+        time.sleep(0.15)
+        assert not library.holds(original)
+        assert aurora.effect_details(name)["palette"] == [{"hue": 1, "saturation": 2, "brightness": 3}]
+        assert aurora.effect_details_all()["animations"] == list(device._effects.values())
+
+
+def test_details_all_saves_once(tmp_path, device, monkeypatch):
+    library = EffectLibrary(str(tmp_path / "effects.json"))
+    saves = []
+    save = library.save
+    monkeypatch.setattr(library, "save", lambda: saves.append(1) or save())
+    with device.aurora(effect_library=library) as aurora:
+        names = aurora.effects_list
+        for name in names[:3]:
+            aurora.effect_details(name)
+        del saves[:]
+        aurora.effect_details_all()
+    assert len(saves) == 1
+    assert len(EffectLibrary(library.path)) == len(names)
+
+
+def test_loads_libraries_without_check_times(tmp_path):
+    path = tmp_path / "effects.json"
+    path.write_text(json.dumps([{"animName": "Old", "animType": "random"}]))
+    library = EffectLibrary(str(path))
+    assert "Old" in library and library.get("Old") is None
+    assert library.sync(["Old"]) == ["Old"]
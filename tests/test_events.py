@@ -0,0 +1,58 @@
+import asyncio
+import queue
+import time
+from nanoleaf.events import EventParser, EventStream
+from nanoleaf.state import STATE_EVENT
+
+
+def _wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_parser_handles_split_chunks():
+    parser = EventParser()
+    assert parser.feed(b'id: 1\ndata: {"events": [{"attr": 2, ') == []
+    events = parser.feed(b'"value": 40}]}\n\nid: 3\r\ndata: {"events": []}\r\n\r\n')
+    assert [event.type for event in events] == [1, 3]
+    assert events[0].events == [{"attr": 2, "value": 40}]
+
+
+def test_parser_skips_malformed_events():
+    parser = EventParser()
+    assert parser.feed(b"data: no id\n\nid: x\ndata: {}\n\nid: 1\ndata: not json\n\n") == []
+
+
+def test_stream_updates_the_mirror(device, aurora):
+    received = queue.Queue()
+    with EventStream(aurora, event_types=[STATE_EVENT], callback=received.put) as stream:
+        _wait_for(lambda: device._subscribers)
+        aurora.brightness = 17
+        event = received.get(timeout=5)
+        assert event.type == STATE_EVENT
+        assert stream.get("state/brightness/value") == 17
+
+
+def test_silent_stream_reconnects(device, aurora):
+    with EventStream(aurora, read_timeout=0.2, retry_delay=0.05):
+        _wait_for(lambda: len(device._subscribers) >= 2)
+
+
+def test_async_stream_rejects_error_status(device, aurora, capsys):
+    stream = EventStream(aurora, retry_delay=0.05)
+    stream.url = stream.url.replace(aurora.auth_token, "not-a-token")
+
+    async def main():
+        events = stream.listen_async()
+        try:
+            await asyncio.wait_for(events.__anext__(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            stream.stop()
+            await events.aclose()
+
+    asyncio.run(main())
+    assert "Error 401 opening the event stream" in capsys.readouterr().out
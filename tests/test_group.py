@@ -0,0 +1,14 @@
+from nanoleaf.group import AuroraGroup
+
+
+def test_group_fans_out(fleet):
+    auroras = [device.aurora() for device in fleet]
+    with AuroraGroup(auroras) as group:
+        assert group.set_brightness(25).ok
+        assert set(group.get("brightness").values()) == {25}
+    fleet.devices[1].fail_next(422)
+    with AuroraGroup(auroras) as group:
+        result = group.set_brightness(30)
+        assert not result.ok
+        assert list(result.errors) == [auroras[1]]
+        assert len(result) == 2
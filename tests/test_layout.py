@@ -0,0 +1,49 @@
+from nanoleaf.layout import PanelLayout
+from nanoleaf.simulator import _panel_layout
+
+
+def _layout(count: int = 30, orientation: float = 0) -> PanelLayout:
+    return PanelLayout({"numPanels": count, "sideLength": 150, "positionData": _panel_layout(count)}, orientation)
+
+
+def test_neighbors_are_adjacent_triangles():
+    layout = _layout()
+    assert layout.neighbors(1) == [2]
+    # Panel 12 sits in the next row, sharing its bottom edge with panel 2
+    assert sorted(layout.neighbors(2)) == [1, 3, 12]
+    assert all(panel_id in layout.neighbors(neighbor) for panel_id in layout for neighbor in layout.neighbors(panel_id))
+
+
+def test_spatial_queries_match_brute_force():
+    layout = _layout()
+    points = [(x, y) for x in range(-200, 1000, 73) for y in range(-200, 600, 61)]
+    for x, y in points:
+        distances = {panel_id: (layout.position(panel_id)[0] - x) ** 2 + (layout.position(panel_id)[1] - y) ** 2
+                     for panel_id in layout}
+        assert distances[layout.nearest(x, y)] == min(distances.values())
+        assert sorted(layout.within(x, y, 120)) == sorted(p for p, d in distances.items() if d <= 120 ** 2)
+
+
+def test_region_and_ordering():
+    layout = _layout()
+    min_x, min_y, max_x, max_y = layout.bounds
+    assert sorted(layout.region(min_x, min_y, max_x, max_y)) == sorted(layout)
+    xs = [layout.position(panel_id)[0] for panel_id in layout.left_to_right()]
+    assert xs == sorted(xs)
+
+
+def test_orientation_rotates_about_the_center():
+    upright, turned = _layout(orientation=0), _layout(orientation=180)
+    sums = {(round(upright.position(p)[0] + turned.position(p)[0], 6),
+             round(upright.position(p)[1] + turned.position(p)[1], 6)) for p in upright}
+    assert len(sums) == 1
+    layout = {"numPanels": 30, "sideLength": 150, "positionData": _panel_layout(30)}
+    assert turned.matches(layout, 180)
+    assert not turned.matches(layout, 0)
+
+
+def test_layout(aurora):
+    layout = aurora.layout
+    assert len(layout) == 12
+    assert aurora.layout is layout
+    assert layout.neighbors(1)
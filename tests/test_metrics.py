@@ -0,0 +1,20 @@
+from nanoleaf.metrics import Metrics, RequestInfo
+
+
+def test_metrics_hook(aurora):
+    metrics = Metrics()
+    aurora.add_request_hook(after=metrics)
+    aurora.brightness
+    aurora.brightness = 10
+    snapshot = metrics.snapshot()[aurora.ip_address]
+    assert snapshot["GET state/brightness/value"]["count"] == 1
+    assert snapshot["PUT state"]["statuses"] == {204: 1}
+    assert "nanoleaf_requests_total" in metrics.prometheus()
+
+
+def test_prometheus_escapes_label_values():
+    metrics = Metrics()
+    metrics.record(RequestInfo("10.0.0.2", "GET", 'effects/"Back\\slash"\nNext', 200, 0, 2, 0.01, None))
+    line = metrics.prometheus().splitlines()[3]
+    assert line == ('nanoleaf_requests_total{device="10.0.0.2",method="GET",'
+                    'endpoint="effects/\\"Back\\\\slash\\"\\nNext"} 1')
@@ -0,0 +1,107 @@
+import asyncio
+import time
+import pytest
+from nanoleaf.async_aurora import AsyncAurora
+from nanoleaf.exceptions import (AuroraConnectionError, CircuitOpenError, InternalServerError, ResourceNotFound,
+                                 Unauthorized, UnprocessableEntity)
+from nanoleaf.policy import CircuitBreaker, RetryPolicy
+
+
+def test_idempotent_requests():
+    assert RetryPolicy.is_idempotent("GET", "state/on/value")
+    assert RetryPolicy.is_idempotent("PUT", "state", {"brightness": {"value": 10}})
+    assert not RetryPolicy.is_idempotent("PUT", "state", {"brightness": {"increment": 10}})
+    assert not RetryPolicy.is_idempotent("PUT", "effects", {"write": {"command": "add"}})
+    assert not RetryPolicy.is_idempotent("POST", "new")
+
+
+def test_backoff_is_capped():
+    policy = RetryPolicy(retries=10, backoff=1, max_backoff=3)
+    assert all(0 <= policy.delay(attempt) <= 3 for attempt in range(10))
+
+
+def test_server_errors_are_retried(device):
+    with device.aurora(retry=RetryPolicy(retries=2, backoff=0)) as aurora:
+        device.fail_next(500, 2)
+        aurora.brightness = 33
+        assert aurora.brightness == 33
+
+
+def test_increments_are_not_retried(device):
+    with device.aurora(retry=RetryPolicy(retries=2, backoff=0)) as aurora:
+        aurora.brightness = 50
+        device.fail_next(500)
+        with pytest.raises(InternalServerError):
+            aurora.brightness_raise(10)
+        assert aurora.brightness == 50
+
+
+def test_breaker_opens_and_recovers(device):
+    breaker = CircuitBreaker(failure_threshold=2, recovery_time=0.1)
+    with device.aurora(retry=RetryPolicy(retries=0), circuit_breaker=breaker) as aurora:
+        device.fail_next(500, 2)
+        for _ in range(2):
+            with pytest.raises(InternalServerError):
+                aurora.brightness
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            aurora.brightness
+        time.sleep(0.15)
+        assert aurora.brightness == 100
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unreachable_device(device):
+    device.stop()
+    with device.aurora(timeout=0.5, retry=RetryPolicy(retries=0)) as aurora:
+        with pytest.raises(AuroraConnectionError):
+            aurora.brightness
+
+
+def test_cancelled_probe_reopens_the_breaker(device):
+    async def probe():
+        aurora = AsyncAurora(device.host, device.auth_token, port=device.port,
+                             retry=RetryPolicy(retries=0), circuit_breaker=breaker)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(aurora.brightness(), 0.05)
+            assert breaker.state == CircuitBreaker.OPEN
+            device.latency = 0
+            await asyncio.sleep(0.15)
+            return await aurora.brightness()
+        finally:
+            await aurora.close()
+
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.1)
+    breaker.record_failure()
+    time.sleep(0.15)
+    device.latency = 0.3
+    assert asyncio.run(probe()) == 100
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_hook_reopens_the_breaker(device):
+    def broken(aurora, method, endpoint, data):
+        raise RuntimeError("hook failed")
+
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.1)
+    with device.aurora(circuit_breaker=breaker) as aurora:
+        breaker.record_failure()
+        time.sleep(0.15)
+        aurora.add_request_hook(before=broken)
+        with pytest.raises(RuntimeError):
+            aurora.brightness
+        assert breaker.state == CircuitBreaker.OPEN
+        aurora.remove_request_hook(broken)
+        time.sleep(0.15)
+        assert aurora.brightness == 100
+
+
+def test_errors_are_structured(device, aurora):
+    with pytest.raises(ResourceNotFound):
+        aurora.effect = "Not An Effect"
+    with pytest.raises(UnprocessableEntity):
+        aurora.brightness = 500
+    device.tokens.clear()
+    with pytest.raises(Unauthorized):
+        aurora.brightness = 10
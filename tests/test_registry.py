@@ -0,0 +1,57 @@
+import os
+import pytest
+from nanoleaf.registry import DeviceRegistry
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "devices.json")
+    registry = DeviceRegistry(path)
+    registry.add("AA:BB", "192.168.1.2", auth_token="token")
+    registry.save()
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    loaded = DeviceRegistry(path)
+    assert loaded.get("AA:BB")["auth_token"] == "token"
+    assert "AA:BB" in loaded and len(loaded) == 1
+
+
+def test_probe(device):
+    stored = {"ip_address": device.host, "port": device.port, "auth_token": device.auth_token}
+    assert DeviceRegistry.probe(stored)
+    assert stored["firmware"] == device.info["firmwareVersion"]
+    assert not DeviceRegistry.probe(dict(stored, auth_token="wrong"))
+    assert not DeviceRegistry.probe({"ip_address": None})
+
+
+def test_revalidate_rediscovers_moved_devices(tmp_path, fleet):
+    registry = DeviceRegistry(str(tmp_path / "devices.json"))
+    for device in fleet:
+        registry.add(device.device_id, device.host, device.auth_token, port=device.port)
+    moved = fleet.devices[0]
+    registry.get(moved.device_id)["port"] = 1
+    reachable = registry.revalidate(timeout=0.5, seek_time=3, interfaces=["127.0.0.1"],
+                                    ssdp_address=fleet.ssdp.address)
+    assert len(reachable) == 3
+    assert registry.get(moved.device_id)["port"] == moved.port
+    assert registry.aurora(moved.device_id).brightness == 100
+
+
+def test_rediscovered_devices_must_answer(tmp_path, fleet):
+    registry = DeviceRegistry(str(tmp_path / "devices.json"))
+    for device in fleet:
+        registry.add(device.device_id, device.host, device.auth_token, port=device.port)
+    stale = fleet.devices[0]
+    registry.get(stale.device_id).update(port=1, auth_token="revoked", last_seen=0)
+    reachable = registry.revalidate(timeout=0.5, seek_time=3, interfaces=["127.0.0.1"],
+                                    ssdp_address=fleet.ssdp.address)
+    assert sorted(device["device_id"] for device in reachable) == sorted(d.device_id for d in fleet.devices[1:])
+    assert registry.get(stale.device_id)["port"] == stale.port
+    assert registry.get(stale.device_id)["last_seen"] == 0
+
+
+@pytest.mark.parametrize("content", ['[{"device_id": "AA", "ip_addr', '{"not": "a list"}', '[{"ip_address": "x"}]'])
+def test_corrupt_registry_is_reported(tmp_path, content):
+    path = tmp_path / "devices.json"
+    path.write_text(content)
+    with pytest.raises(ValueError, match="corrupt"):
+        DeviceRegistry(str(path))
+    assert path.read_text() == content
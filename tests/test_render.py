@@ -0,0 +1,65 @@
+import math
+import os
+import time
+import pytest
+from nanoleaf import render
+from nanoleaf.render import FrameRenderer
+from nanoleaf.stream import ExtControlStream
+
+
+def waves(t, x, y):
+    level = int(127.5 + 127.5 * math.sin(x / 100 + t * 2))
+    return level, 0, 255 - level
+
+
+def too_bright(t, x, y):
+    return 300, 0, 0
+
+
+def _wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("processes", [0, 1])
+def test_renderer_sends_every_frame(fleet, processes):
+    auroras = [device.aurora() for device in fleet]
+    renderer = FrameRenderer(auroras, waves, fps=20, processes=processes)
+    renderer.run(duration=0.5)
+    assert renderer.frames_sent + renderer.frames_skipped == 10
+    _wait_for(lambda: all(device.frames_received == renderer.frames_sent for device in fleet))
+
+
+def test_renderer_reports_source_errors(aurora):
+    with pytest.raises(Exception):
+        FrameRenderer([aurora], too_bright, processes=0).run(duration=0.2)
+    renderer = FrameRenderer([aurora], too_bright, processes=0)
+    renderer.start()
+    _wait_for(lambda: renderer.last_error is not None)
+    renderer.stop()
+
+
+def test_renderers_in_one_process_keep_their_own_workers(fleet):
+    first = FrameRenderer([fleet.devices[0].aurora()], waves, fps=20, processes=0)
+    second = FrameRenderer([device.aurora() for device in fleet.devices[1:]], waves, fps=20, processes=0)
+    first.start()
+    second.run(duration=0.5)
+    first.stop()
+    assert first.last_error is None
+    assert render._workers == {}
+    _wait_for(lambda: fleet.devices[0].frames_received == first.frames_sent)
+    _wait_for(lambda: all(device.frames_received == second.frames_sent for device in fleet.devices[1:]))
+
+
+def test_failed_start_releases_shared_memory(fleet, monkeypatch):
+    def refuse(stream):
+        raise OSError("no stream")
+
+    before = set(os.listdir("/dev/shm"))
+    monkeypatch.setattr(ExtControlStream, "start", refuse)
+    renderer = FrameRenderer([device.aurora() for device in fleet], waves, processes=0)
+    with pytest.raises(OSError):
+        renderer.start()
+    assert set(os.listdir("/dev/shm")) == before
@@ -0,0 +1,64 @@
+import time
+import pytest
+from nanoleaf.exceptions import UnprocessableEntity
+
+
+def test_rapid_writes_are_coalesced(device):
+    with device.aurora(max_rate=20) as aurora:
+        before = device.request_count
+        for level in range(50):
+            aurora.brightness = level
+        aurora.flush()
+        assert device.request_count - before < 10
+        assert device.info["state"]["brightness"]["value"] == 49
+
+
+def test_flush_raises_background_errors(device):
+    with device.aurora(max_rate=20) as aurora:
+        device.fail_next(422)
+        aurora.brightness = 10
+        time.sleep(0.1)
+        with pytest.raises(UnprocessableEntity):
+            aurora.flush()
+        aurora.flush()
+
+
+def test_fade_reaches_target(aurora):
+    aurora.hue = 0
+    aurora.hue_fade(300, 0.3)
+    time.sleep(0.5)
+    assert aurora.hue == 300
+
+
+def test_setters_still_raise_after_a_fade(device, aurora):
+    aurora.hue_fade(100, 0.3)
+    device.fail_next(422)
+    with pytest.raises(UnprocessableEntity):
+        aurora.brightness = 20
+
+
+def test_setting_a_value_cancels_its_fade(aurora):
+    aurora.saturation = 0
+    aurora.saturation_fade(100, 0.3)
+    time.sleep(0.1)
+    aurora.saturation = 5
+    time.sleep(0.4)
+    assert aurora.saturation == 5
+
+
+def test_close_still_closes_the_transport_when_the_last_flush_fails(device, monkeypatch):
+    aurora = device.aurora(max_rate=20)
+    aurora.brightness = 10
+    scheduler, closed = aurora._scheduler, []
+    stop = scheduler.close
+
+    def failing_close():
+        stop()
+        raise UnprocessableEntity("Rejected")
+
+    monkeypatch.setattr(scheduler, "close", failing_close)
+    monkeypatch.setattr(aurora._transport, "close", lambda: closed.append(True))
+    with pytest.raises(UnprocessableEntity):
+        aurora.close()
+    assert closed == [True]
+    assert aurora._scheduler is None and aurora._ramps is None
@@ -0,0 +1,15 @@
+def test_set_state_is_one_request(device, aurora):
+    before = device.request_count
+    aurora.set_state(on=True, brightness=80, hue=120, saturation=100)
+    assert device.request_count == before + 1
+    assert (aurora.brightness, aurora.hue, aurora.saturation) == (80, 120, 100)
+
+
+def test_batch_is_one_request(device, aurora):
+    before = device.request_count
+    with aurora.batch():
+        aurora.on = True
+        aurora.brightness = 30
+        aurora.hue = 10
+    assert device.request_count == before + 1
+    assert aurora.brightness == 30
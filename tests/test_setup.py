@@ -0,0 +1,36 @@
+import time
+import types
+import pytest
+from nanoleaf import setup
+from nanoleaf.group import AuroraGroup
+
+
+def test_generate_auth_token(device):
+    assert setup.generate_auth_token(device.host, device.port) is None
+    device.pairing = True
+    token = setup.generate_auth_token(device.host, device.port)
+    assert token in device.tokens
+
+
+def test_generate_auth_tokens_tells_ports_apart(fleet):
+    for device in fleet:
+        device.pairing = True
+    tokens = setup.generate_auth_tokens([(device.host, device.port) for device in fleet], deadline=5)
+    assert set(tokens) == {(device.host, device.port) for device in fleet}
+    assert all(tokens[device.host, device.port] in device.tokens for device in fleet)
+    with AuroraGroup(tokens.items()) as group:
+        assert group.set_brightness(12).ok
+    assert {device.info["state"]["brightness"]["value"] for device in fleet} == {12}
+
+
+def test_generate_auth_tokens_closes_connections_when_interrupted(fleet, monkeypatch):
+    closed = []
+    monkeypatch.setattr(setup.HTTPTransport, "close", lambda transport: closed.append(transport))
+
+    def interrupt(seconds):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(setup, "time", types.SimpleNamespace(monotonic=time.monotonic, sleep=interrupt))
+    with pytest.raises(KeyboardInterrupt):
+        setup.generate_auth_tokens([(device.host, device.port) for device in fleet], deadline=5)
+    assert len(closed) == len(fleet.devices)
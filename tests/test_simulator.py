@@ -0,0 +1,29 @@
+import socket
+import pytest
+from nanoleaf.exceptions import InternalServerError
+from nanoleaf.policy import RetryPolicy
+
+
+def test_color_temperature_range(aurora):
+    assert aurora.color_temperature_min == 1200
+    assert aurora.color_temperature_max == 6500
+    aurora.color_temperature = 2700
+    assert aurora.color_temperature == 2700
+
+
+def test_client_hanging_up_is_ignored(device, aurora):
+    for _ in range(3):
+        with socket.create_connection((device.host, device.port)) as sock:
+            sock.sendall(b"GET /api/v1/" + device.auth_token.encode() + b"/ HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert aurora.brightness == 100
+
+
+def test_fail_next(device):
+    with device.aurora(retry=RetryPolicy(retries=0)) as aurora:
+        device.fail_next(500, 2)
+        before = device.request_count
+        for _ in range(2):
+            with pytest.raises(InternalServerError):
+                aurora.brightness = 10
+        aurora.brightness = 10
+        assert device.request_count == before + 3
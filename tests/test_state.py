@@ -0,0 +1,52 @@
+import pytest
+from nanoleaf.state import StateCache
+
+
+def test_cached_reads_share_one_request(device):
+    with device.aurora(cache_ttl=10) as aurora:
+        before = device.request_count
+        aurora.on, aurora.brightness, aurora.effect, aurora.panel_positions
+        assert device.request_count == before + 1
+        # Writes update the cached copy instead of invalidating it
+        aurora.brightness = 12
+        assert aurora.brightness == 12
+        assert device.request_count == before + 2
+
+
+@pytest.mark.parametrize("ttl", [0, 10])
+def test_info_is_never_changed_by_later_writes(device, ttl):
+    with device.aurora(cache_ttl=ttl) as aurora:
+        info = aurora.info
+        names = info["effects"]["effectsList"]
+        aurora.brightness = 5
+        aurora.hue = 123
+        aurora.effect = names[1]
+        assert info["state"]["brightness"]["value"] == 100
+        assert info["state"]["hue"]["value"] != 123
+        assert info["effects"]["select"] != names[1]
+        assert aurora.brightness == 5
+
+
+def test_endpoints_outside_the_snapshot_skip_the_refresh(device):
+    with device.aurora(cache_ttl=10) as aurora:
+        before = device.request_count
+        assert aurora.firmware == device.info["firmwareVersion"]
+        assert device.request_count == before + 1
+        assert not aurora._state.fresh
+
+
+def test_no_snapshot_without_a_ttl(device, aurora):
+    aurora.info
+    assert aurora._state.snapshot is None
+    before = device.request_count
+    aurora.brightness, aurora.brightness
+    assert device.request_count == before + 2
+
+
+def test_mirror_copies_what_it_stores():
+    cache = StateCache(10)
+    info = {"state": {"brightness": {"value": 50}}}
+    cache.store(info)
+    cache.apply("state", {"brightness": {"value": 20}})
+    assert cache.lookup("state/brightness/value") == (True, 20)
+    assert info["state"]["brightness"]["value"] == 50
@@ -0,0 +1,44 @@
+import time
+import pytest
+from nanoleaf.stream import ExtControlStream, frame_size, pack_frame
+
+
+def _wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("version", ["v1", "v2"])
+def test_pack_frame_matches_stream(aurora, version):
+    stream = ExtControlStream(aurora, version, [1, 2, 3])
+    colors = [(10, 20, 30), (40, 50, 60), (70, 80, 90)]
+    stream.set_frame(colors, transition=2)
+    buffer = bytearray(frame_size(version, 3) + 4)
+    pack_frame(buffer, 4, version, [1, 2, 3], colors, 2)
+    assert bytes(buffer[4:]) == stream.frame
+
+
+def test_stream_sends_frames(device, aurora):
+    with ExtControlStream(aurora) as stream:
+        stream.set_all(255, 0, 0)
+        stream.send()
+        stream.send()
+    _wait_for(lambda: device.frames_received == 2)
+
+
+@pytest.mark.parametrize("version", ["v1", "v2"])
+@pytest.mark.parametrize("bad, message", [(256, "red value 256"), (-1, "red value -1"), (12.5, "red value 12.5")])
+def test_invalid_colors_name_the_panel(version, bad, message):
+    buffer = bytearray(frame_size(version, 2))
+    with pytest.raises(ValueError, match="Panel 7 has an invalid " + message):
+        pack_frame(buffer, 0, version, [3, 7], [(1, 2, 3), (bad, 0, 0)])
+    with pytest.raises(ValueError, match="2 panels"):
+        pack_frame(buffer, 0, version, [3, 7], [(1, 2, 3)])
+
+
+def test_stream_rejects_invalid_colors(aurora):
+    stream = ExtControlStream(aurora, "v1", [4, 5])
+    with pytest.raises(ValueError, match="Panel 5 has an invalid blue value 300"):
+        stream.set_panel(5, 0, 0, 300)
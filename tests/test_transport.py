@@ -0,0 +1,79 @@
+import socket
+import socketserver
+import threading
+import time
+import pytest
+from nanoleaf.transport import HTTPTransport, TransportError
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # Answers the first request on each connection, then drops the connection without answering the second,
+        # like a device that times out an idle keep-alive connection just as it is reused
+        for number in range(2):
+            request_line = self.rfile.readline()
+            if not request_line:
+                return
+            length = 0
+            while True:
+                line = self.rfile.readline().strip()
+                if not line:
+                    break
+                name, _, value = line.partition(b":")
+                if name.lower() == b"content-length":
+                    length = int(value)
+            self.server.received.append(request_line.split()[0].decode() + " " + self.rfile.read(length).decode())
+            if number == 0:
+                self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+                self.wfile.flush()
+                if self.server.close_idle:
+                    time.sleep(0.05)
+                    return
+
+
+@pytest.fixture
+def server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.received = []
+    server.close_idle = False
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_reused_gets_are_sent_again(server):
+    transport = HTTPTransport(*server.server_address)
+    assert transport.request("GET", "/a").status_code == 200
+    assert transport.request("GET", "/b").status_code == 200
+    assert server.received == ["GET ", "GET ", "GET "]
+    transport.close()
+
+
+def test_reused_writes_are_not_sent_again(server):
+    transport = HTTPTransport(*server.server_address)
+    transport.request("PUT", "/state", {"brightness": {"increment": 10}})
+    with pytest.raises(TransportError):
+        transport.request("PUT", "/state", {"brightness": {"increment": 10}})
+    assert len(server.received) == 2
+    transport.close()
+
+
+def test_connections_closed_while_idle_are_replaced(server):
+    server.close_idle = True
+    transport = HTTPTransport(*server.server_address)
+    transport.request("PUT", "/state", {"on": {"value": True}})
+    time.sleep(0.2)
+    assert transport.request("PUT", "/state", {"on": {"value": False}}).status_code == 200
+    assert server.received == ['PUT {"on": {"value": true}}', 'PUT {"on": {"value": false}}']
+    transport.close()
+
+
+def test_unreachable_host():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    with pytest.raises(TransportError):
+        HTTPTransport("127.0.0.1", port).request("GET", "/", timeout=1)
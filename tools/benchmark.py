@@ -0,0 +1,232 @@
+"""
+Benchmarks the client's hot paths against simulated Auroras.
+
+Reports p50/p99 latency and operations per second for each case, and writes
+the results as JSON so runs can be compared across releases.
+
+    python tools/benchmark.py --iterations 200 --devices 16 --output benchmark.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nanoleaf import AuroraGroup, discovery  # noqa: E402
+from nanoleaf.simulator import SimulatedAurora, SimulatedFleet  # noqa: E402
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Returns the given percentile (0-1) of already sorted samples, by nearest rank"""
+    index = min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))
+    return samples[index]
+
+
+def summarize(samples: list, operations: int = 1) -> dict:
+    """Turns a list of per-iteration durations (seconds) into latency and throughput figures"""
+    samples = sorted(samples)
+    total = sum(samples)
+    return {"iterations": len(samples),
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+            "mean_ms": statistics.mean(samples) * 1000,
+            "ops_per_sec": (len(samples) * operations) / total if total > 0 else None}
+
+
+def measure(function, iterations: int, warmup: int = 5) -> list:
+    """Calls function repeatedly and returns the duration of each call"""
+    for _ in range(warmup):
+        function()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+###########################################
+# Benchmark cases
+###########################################
+
+def single_device_cases(device: SimulatedAurora, iterations: int) -> dict:
+    results = {}
+    aurora = device.aurora()
+    cached = device.aurora(cache_ttl=60)
+
+    def set_rgb():
+        aurora.rgb = "FF8000"
+
+    def set_brightness():
+        aurora.brightness = 50
+
+    def set_separately():
+        aurora.on = True
+        aurora.brightness = 80
+        aurora.hue = 240
+        aurora.saturation = 100
+
+    def set_batched():
+        aurora.set_state(on=True, brightness=80, hue=240, saturation=100)
+
+    def dashboard_read():
+        return aurora.on, aurora.brightness, aurora.hue, aurora.saturation, aurora.effect, aurora.panel_count
+
+    def dashboard_read_cached():
+        cached.invalidate()
+        return cached.on, cached.brightness, cached.hue, cached.saturation, cached.effect, cached.panel_count
+
+    cases = {"get_hue": lambda: aurora.hue,
+             "get_rgb": lambda: aurora.rgb,
+             "set_brightness": set_brightness,
+             "set_rgb": set_rgb,
+             "state_update_separate_setters": set_separately,
+             "state_update_set_state": set_batched,
+             "dashboard_read_6_attributes": dashboard_read,
+             "dashboard_read_6_attributes_cached": dashboard_read_cached,
+             "effects_list": lambda: aurora.effects_list,
+             "effect_details": lambda: aurora.effect_details("Effect 1"),
+             "effect_details_all": lambda: aurora.effect_details_all()}
+    for name, function in cases.items():
+        results[name] = summarize(measure(function, iterations))
+    aurora.close()
+    cached.close()
+    return results
+
+
+def discovery_cases(device_count: int, iterations: int) -> dict:
+    with SimulatedFleet(device_count) as fleet:
+        kwargs = {"interfaces": ["127.0.0.1"], "ssdp_address": fleet.ssdp.address}
+
+        def first_device():
+            next(iter(discovery.discover(5, expected_count=1, **kwargs)))
+
+        def all_devices():
+            list(discovery.discover(5, expected_count=device_count, **kwargs))
+
+        return {"discovery_time_to_first_device": summarize(measure(first_device, iterations, warmup=1)),
+                "discovery_time_to_all_devices": summarize(measure(all_devices, iterations, warmup=1))}
+
+
+def fan_out_cases(device_count: int, iterations: int, latency: float) -> dict:
+    results = {}
+    with SimulatedFleet(device_count, latency=latency, ssdp=False) as fleet:
+        auroras = fleet.auroras()
+
+        def sequential():
+            for aurora in auroras:
+                aurora.brightness = 50
+
+        results["fan_out_sequential"] = summarize(measure(sequential, iterations), device_count)
+        with AuroraGroup(auroras, max_workers=device_count) as group:
+            results["fan_out_group"] = summarize(measure(lambda: group.set_brightness(50), iterations),
+                                                 device_count)
+        for aurora in auroras:
+            aurora.close()
+
+        try:
+            # AsyncAurora raises ImportError without aiohttp
+            results["fan_out_async"] = summarize(_measure_async_fan_out(fleet, iterations), device_count)
+        except ImportError:
+            pass
+    return results
+
+
+# Imports timed in a fresh interpreter each time, with the slow dependencies each one pulled in
+IMPORT_STATEMENTS = {"import_nanoleaf": "import nanoleaf",
+                     "import_aurora": "from nanoleaf import Aurora",
+                     "import_discovery": "from nanoleaf import discovery",
+                     "import_stream": "from nanoleaf import ExtControlStream",
+                     "import_async_aurora": "from nanoleaf import AsyncAurora"}
+HEAVY_MODULES = ("requests", "aiohttp", "numpy", "asyncio")
+
+_IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+{statement}
+duration = time.perf_counter() - start
+print(duration, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def import_cases(iterations: int) -> dict:
+    results = {}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    for name, statement in IMPORT_STATEMENTS.items():
+        script = _IMPORT_SCRIPT.format(statement=statement, heavy=HEAVY_MODULES)
+        samples = []
+        loaded = ""
+        for _ in range(iterations):
+            output = subprocess.run([sys.executable, "-c", script], env=environment, check=True,
+                                    stdout=subprocess.PIPE, universal_newlines=True).stdout.split()
+            samples.append(float(output[0]))
+            loaded = output[1] if len(output) > 1 else ""
+        results[name] = summarize(samples)
+        results[name]["heavy_modules"] = loaded.split(",") if loaded else []
+    return results
+
+
+def _measure_async_fan_out(fleet: SimulatedFleet, iterations: int) -> list:
+    from nanoleaf import AsyncAurora
+
+    async def run():
+        auroras = [AsyncAurora(device.host, device.auth_token, port=device.port) for device in fleet]
+        samples = []
+        for i in range(iterations + 5):
+            start = time.perf_counter()
+            await asyncio.gather(*(aurora.set_brightness(50) for aurora in auroras))
+            if i >= 5:
+                samples.append(time.perf_counter() - start)
+        for aurora in auroras:
+            await aurora.close()
+        return samples
+
+    return asyncio.run(run())
+
+
+###########################################
+# Entry point
+###########################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the nanoleaf client against simulated Auroras.")
+    parser.add_argument("--iterations", type=int, default=200, help="timed iterations per case")
+    parser.add_argument("--devices", type=int, default=16, help="devices for fan-out and discovery cases")
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="simulated device latency in seconds for fan-out cases")
+    parser.add_argument("--output", default="benchmark.json", help="file to write the JSON results to")
+    args = parser.parse_args()
+
+    results = import_cases(max(3, args.iterations // 20))
+    with SimulatedAurora(panel_count=30, effect_count=20) as device:
+        results.update(single_device_cases(device, args.iterations))
+    results.update(discovery_cases(args.devices, max(1, args.iterations // 20)))
+    results.update(fan_out_cases(args.devices, max(1, args.iterations // 4), args.latency))
+
+    report = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "iterations": args.iterations,
+                       "devices": args.devices,
+                       "latency": args.latency},
+              "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    width = max(len(name) for name in results)
+    print("case".ljust(width) + "   p50 ms    p99 ms      ops/s")
+    for name, result in results.items():
+        print(name.ljust(width) + " %8.3f  %8.3f  %9.1f" % (result["p50_ms"], result["p99_ms"],
+                                                           result["ops_per_sec"] or 0))
+    print("Results written to " + args.output)
+
+
+if __name__ == "__main__":
+    main()